@@ -1,3 +1,5 @@
+import argparse
+import base64
 import os
 import pandas as pd
 from jinja2 import Environment, FileSystemLoader
@@ -5,21 +7,48 @@ import webbrowser
 from datetime import datetime
 import plotly.graph_objects as go
 import plotly.express as px
+from plotly.offline import get_plotlyjs
 import json
 import numpy as np
+from sales_pipeline.context import get_context
+from sales_pipeline.instrument import instrumented
+from sales_pipeline.rollup import rollup_series
+from sales_pipeline.whatif import DEFAULT_DISCOUNTS, DEFAULT_ELASTICITIES, evaluate_scenarios, scenario_grid
+
+def sales_metrics(ctx):
+    """Total sales, distinct orders and average order line value"""
+    if ctx.stream_aggregates:
+        summary = ctx.aggregates.summary()
+        return summary['total_sales'], summary['total_orders'], summary['avg_order_value']
+    sales_df = ctx.sales
+    return sales_df['TotalPrice'].sum(), sales_df['OrderID'].nunique(), sales_df['TotalPrice'].mean()
+
+def category_sales(ctx):
+    """Total sales per product category"""
+    if ctx.stream_aggregates:
+        return ctx.aggregates.groups['category']['Revenue'].rename('TotalPrice')
+    return ctx.fact.groupby('Category', observed=True)['TotalPrice'].sum()
+
+def product_sales(ctx):
+    """Total sales and quantity per product name"""
+    if ctx.stream_aggregates:
+        products = ctx.aggregates.totals('product').rename(columns={'Revenue': 'TotalPrice'})
+        return products.groupby('ProductName', observed=True)[['TotalPrice', 'Quantity']].sum()
+    return ctx.fact.groupby('ProductName', observed=True).agg({
+        'TotalPrice': 'sum',
+        'Quantity': 'sum'
+    })
 
 # Add Plotly for interactive charts
-def create_interactive_charts():
+def create_interactive_charts(ctx=None):
     """Create interactive charts using Plotly"""
     # Load data
-    sales_df = pd.read_csv('data/processed/processed_sales.csv')
-    products_df = pd.read_csv('data/processed/processed_products.csv')
-    segments_df = pd.read_csv('data/processed/customer_segments.csv')
-    marketing_segments = pd.read_csv('results/extended/customer_segments_marketing.csv')
+    ctx = ctx or get_context()
+    marketing_segments = ctx.marketing_segments
     
-    # Create sales trend chart
+    # Create sales trend chart from the daily rollup
     sales_trend = px.line(
-        sales_df.groupby('OrderDate')['TotalPrice'].sum().reset_index(),
+        rollup_series(ctx.rollup, 'day').rename('TotalPrice').rename_axis('OrderDate').reset_index(),
         x='OrderDate',
         y='TotalPrice',
         title='Sales Trend Over Time',
@@ -30,9 +59,7 @@ def create_interactive_charts():
     
     # Create product category distribution
     product_dist = px.pie(
-        pd.merge(sales_df, products_df, on='ProductID')
-        .groupby('Category')['TotalPrice'].sum()
-        .reset_index(),
+        category_sales(ctx).reset_index(),
         values='TotalPrice',
         names='Category',
         title='Product Category Distribution',
@@ -57,40 +84,113 @@ def create_interactive_charts():
     
     return charts
 
-def generate_html_report():
-    """Generate an HTML report combining all analysis results"""
+# Trend resolution by the span of the data: (max days, rollup grain, label)
+TREND_RESOLUTIONS = [
+    (92, 'day', 'Daily'),
+    (730, 'week', 'Weekly'),
+    (None, 'month', 'Monthly')
+]
+
+def choose_resolution(dates):
+    """Pick the trend resolution to display from the span of the order dates"""
+    span = (dates.max() - dates.min()).days
+    for max_days, grain, label in TREND_RESOLUTIONS:
+        if max_days is None or span <= max_days:
+            return grain, label
+
+def typed_array(values, dtype='f8'):
+    """Encode values as a base64 little-endian typed-array payload"""
+    data = np.ascontiguousarray(values, dtype='<' + dtype).tobytes()
+    return {'dtype': dtype, 'bdata': base64.b64encode(data).decode('ascii')}
+
+def _figure_spec(fig, **arrays):
+    """Serialize a figure's layout without its template and replace its trace data with compact payloads"""
+    spec = json.loads(fig.to_json())
+    spec['layout'].pop('template', None)
+    spec['data'][0].update(arrays)
+    return spec
+
+def create_static_charts(ctx=None):
+    """Create pre-aggregated chart specs with typed-array data for the static report"""
+    ctx = ctx or get_context()
+    marketing_segments = ctx.marketing_segments
+    
+    # Read the trend from the rollup at the display resolution; dates become epoch milliseconds
+    grain, label = choose_resolution(ctx.rollup['Period'])
+    trend = rollup_series(ctx.rollup, grain)
+    sales_trend = go.Figure(
+        go.Scatter(mode='lines', line=dict(width=2)),
+        layout=dict(title=f'{label} Sales Trend', template='plotly_dark',
+                    xaxis=dict(type='date', title='Date'), yaxis=dict(title='Sales Amount'))
+    )
+    dates_ms = trend.index.values.astype('datetime64[ms]').astype('int64')
+    
+    category_totals = category_sales(ctx)
+    product_dist = go.Figure(
+        go.Pie(labels=category_totals.index.astype(str).tolist()),
+        layout=dict(title='Product Category Distribution', template='plotly_dark')
+    )
+    
+    segment_counts = marketing_segments.groupby('MarketingSegment').size()
+    segment_dist = go.Figure(
+        go.Bar(x=segment_counts.index.astype(str).tolist()),
+        layout=dict(title='Customer Segment Distribution', template='plotly_dark',
+                    xaxis=dict(title='MarketingSegment'), yaxis=dict(title='count'))
+    )
+    
+    return {
+        'sales_trend': _figure_spec(sales_trend, x=typed_array(dates_ms), y=typed_array(trend.values)),
+        'product_dist': _figure_spec(product_dist, values=typed_array(category_totals.values)),
+        'segment_dist': _figure_spec(segment_dist, y=typed_array(segment_counts.values, 'i4')),
+        # All charts share the dark theme, so its template is sent once rather than with every figure
+        'template': json.loads(sales_trend.to_json())['layout']['template']
+    }
+
+def _inline_image(path):
+    """Embed a PNG as a data URI so the static report has no external files"""
+    with open(path, 'rb') as f:
+        return 'data:image/png;base64,' + base64.b64encode(f.read()).decode('ascii')
+
+@instrumented('html_report')
+def generate_html_report(static=False):
+    """Generate an HTML report combining all analysis results
+    
+    With static=True the trend is pre-aggregated, chart data is sent as
+    typed arrays and plotly.js, styles and images are inlined so the
+    report opens offline.
+    """
     # Create HTML directory
     os.makedirs('results/html', exist_ok=True)
     
     # Load template environment
     env = Environment(loader=FileSystemLoader('.'))
     
-    # Load all data
-    sales_df = pd.read_csv('data/processed/processed_sales.csv')
-    products_df = pd.read_csv('data/processed/processed_products.csv')
-    segments_df = pd.read_csv('data/processed/customer_segments.csv')
-    marketing_segments = pd.read_csv('results/extended/customer_segments_marketing.csv')
+    # Load all data once and share it with the chart builders
+    ctx = get_context()
+    segments_df = ctx.segments
+    marketing_segments = ctx.marketing_segments
     
     # Create interactive charts
-    charts = create_interactive_charts()
+    charts = create_static_charts(ctx) if static else create_interactive_charts(ctx)
     
     # Calculate key metrics
-    total_sales = sales_df['TotalPrice'].sum()
-    total_orders = sales_df['OrderID'].nunique()
-    avg_order_value = sales_df['TotalPrice'].mean()
+    total_sales, total_orders, avg_order_value = sales_metrics(ctx)
     total_customers = segments_df['CustomerID'].nunique()
     churn_rate = segments_df['Churn'].mean()
     
     # Calculate product metrics
-    product_metrics = pd.merge(sales_df, products_df, on='ProductID')
-    top_products = product_metrics.groupby('ProductName').agg({
-        'TotalPrice': 'sum',
-        'Quantity': 'sum'
-    }).sort_values('TotalPrice', ascending=False).head(5)
+    top_products = product_sales(ctx).sort_values('TotalPrice', ascending=False).head(5)
     
     # Calculate marketing segment distribution
     segment_dist = marketing_segments['MarketingSegment'].value_counts().to_dict()
     
+    # Evaluate store-wide discount scenarios
+    scenarios = scenario_grid(DEFAULT_DISCOUNTS, DEFAULT_ELASTICITIES)
+    if ctx.stream_aggregates:
+        what_if = evaluate_scenarios(None, scenarios, ctx.aggregates.what_if_cells())
+    else:
+        what_if = evaluate_scenarios(ctx.fact, scenarios)
+    
     # Create template data
     template_data = {
         'title': 'Sales and Customer Analysis Report',
@@ -105,12 +205,23 @@ def generate_html_report():
         },
         'top_products': top_products.to_dict('records'),
         'segment_distribution': segment_dist,
+        'what_if': what_if.to_dict('records'),
         'visualizations': {
             'correlation_heatmap': '../extended/correlation_heatmap.png',
             'customer_ltv': '../extended/customer_ltv.png'
-        }
+        },
+        'static': static
     }
     
+    if static:
+        # Inline the pinned local plotly.js and the chart images
+        template_data['plotly_js'] = get_plotlyjs()
+        template_data['visualizations'] = {
+            name: _inline_image(os.path.join('results/html', path))
+            for name, path in template_data['visualizations'].items()
+            if os.path.exists(os.path.join('results/html', path))
+        }
+    
     # Create template
     template = env.from_string("""
     <!DOCTYPE html>
@@ -119,10 +230,12 @@ def generate_html_report():
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>{{ title }}</title>
+        {% if not static %}
         <!-- Bootstrap CSS -->
         <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
         <!-- Font Awesome -->
         <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
+        {% endif %}
         <!-- Custom Styles -->
         <style>
             :root {
@@ -250,6 +363,29 @@ def generate_html_report():
                 margin-bottom: 0.5rem;
             }
             
+            {% if static %}
+            /* Minimal grid in place of Bootstrap for the offline report */
+            .row {
+                display: flex;
+                flex-wrap: wrap;
+                gap: 2rem;
+            }
+            
+            .col-md-6 {
+                flex: 1 1 calc(50% - 1rem);
+                min-width: 300px;
+            }
+            
+            .img-fluid {
+                max-width: 100%;
+                height: auto;
+            }
+            
+            .text-muted {
+                color: #6c757d;
+            }
+            {% endif %}
+            
             /* Responsive Design */
             @media (max-width: 768px) {
                 .metrics-grid {
@@ -280,7 +416,9 @@ def generate_html_report():
                     <div class="metric-card">
                         <div class="metric-value">{{ value }}</div>
                         <p class="text-muted">{{ metric }}</p>
+                        {% if not static %}
                         <i class="fas fa-arrow-up text-success"></i>
+                        {% endif %}
                     </div>
                     {% endfor %}
                 </div>
@@ -348,29 +486,94 @@ def generate_html_report():
                 </div>
             </div>
 
+            <div class="section">
+                <h2 class="section-header">What-If Discount Scenarios</h2>
+                <table class="table">
+                    <thead>
+                        <tr>
+                            <th>Scenario</th>
+                            <th>Projected Sales</th>
+                            <th>Change</th>
+                            <th>Projected Profit</th>
+                            <th>Profit Change</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                        {% for scenario in what_if %}
+                        <tr>
+                            <td>{{ scenario.Scenario }}</td>
+                            <td>${{ '{:,.2f}'.format(scenario.Revenue) }}</td>
+                            <td>{{ '{:+.1%}'.format(scenario.RevenueChangePct) }}</td>
+                            <td>${{ '{:,.2f}'.format(scenario.Profit) }}</td>
+                            <td>{{ '{:+,.2f}'.format(scenario.ProfitChange) }}</td>
+                        </tr>
+                        {% endfor %}
+                    </tbody>
+                </table>
+            </div>
+
             <div class="section">
                 <h2 class="section-header">Additional Visual Analysis</h2>
                 <div class="row">
                     <div class="col-md-6">
                         <div class="visualization">
                             <h3>Correlation Analysis</h3>
+                            {% if visualizations.correlation_heatmap %}
                             <img src="{{ visualizations.correlation_heatmap }}" 
                                  class="img-fluid" 
                                  alt="Correlation Heatmap">
+                            {% endif %}
                         </div>
                     </div>
                     <div class="col-md-6">
                         <div class="visualization">
                             <h3>Customer Lifetime Value</h3>
+                            {% if visualizations.customer_ltv %}
                             <img src="{{ visualizations.customer_ltv }}" 
                                  class="img-fluid" 
                                  alt="Customer Lifetime Value">
+                            {% endif %}
                         </div>
                     </div>
                 </div>
             </div>
         </div>
 
+        {% if static %}
+        <!-- Plotly.js (pinned local copy) -->
+        <script type="text/javascript">{{ plotly_js|safe }}</script>
+        <script>
+            // Chart specs with base64 typed-array data
+            const charts = {{ charts|tojson }};
+            const TYPED_ARRAYS = {f8: Float64Array, i4: Int32Array};
+            
+            function decode(value) {
+                if (Array.isArray(value)) {
+                    return value.map(decode);
+                }
+                if (value && typeof value === 'object') {
+                    if (value.bdata !== undefined) {
+                        const bytes = Uint8Array.from(atob(value.bdata), c => c.charCodeAt(0));
+                        return Array.from(new TYPED_ARRAYS[value.dtype](bytes.buffer));
+                    }
+                    for (const key in value) {
+                        value[key] = decode(value[key]);
+                    }
+                }
+                return value;
+            }
+            
+            function figure(spec) {
+                const fig = decode(spec);
+                fig.layout.template = charts.template;
+                return fig;
+            }
+            
+            Plotly.newPlot('salesTrend', figure(charts.sales_trend));
+            Plotly.newPlot('productDist', figure(charts.product_dist));
+            Plotly.newPlot('segmentDist', figure(charts.segment_dist));
+        </script>
+        {% else %}
         <!-- Plotly.js -->
         <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
         <script>
@@ -386,6 +589,7 @@ def generate_html_report():
             // Segment Distribution
             Plotly.newPlot('segmentDist', JSON.parse(charts.segment_dist));
         </script>
+        {% endif %}
     </body>
     </html>
     """)
@@ -397,11 +601,15 @@ def generate_html_report():
     with open('results/html/report.html', 'w', encoding='utf-8') as f:
         f.write(html)
     
-    print("HTML report generated successfully!")
+    print(f"HTML report generated successfully! ({len(html.encode('utf-8')) / 1024:,.0f} KB)")
     print("Opening report in browser...")
     
     # Open in browser
     webbrowser.open('results/html/report.html')
 
 if __name__ == "__main__":
-    generate_html_report()
+    parser = argparse.ArgumentParser(description='Generate the HTML analysis report.')
+    parser.add_argument('--static', action='store_true',
+                        help='Pre-aggregate chart data and inline plotly.js so the report works offline')
+    args = parser.parse_args()
+    generate_html_report(static=args.static)
@@ -1,7 +1,23 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
 import os
+import shutil
+import time
+
+CATEGORIES = ['Electronics', 'Clothing', 'Home & Kitchen', 'Books', 'Sports', 'Beauty', 'Toys']
+CATEGORY_WEIGHTS = [0.2, 0.15, 0.15, 0.1, 0.1, 0.15, 0.15]
+PRODUCT_NAMES = [
+    'Wireless Earbuds', 'Smart Watch', 'Laptop', 'Smartphone', 'Headphones',
+    'T-Shirt', 'Jeans', 'Dress', 'Sneakers', 'Jacket',
+    'Coffee Maker', 'Air Fryer', 'Blender', 'Knife Set', 'Cookware Set',
+    'Novel', 'Textbook', 'Cookbook', 'Biography', 'Science Fiction',
+    'Yoga Mat', 'Dumbbells', 'Running Shoes', 'Basketball', 'Bicycle'
+]
+REGIONS = ['North', 'South', 'East', 'West']
 
 def generate_sample_data(num_customers=1000, num_products=50, num_orders=5000, start_date='2023-01-01', end_date='2024-12-31'):
     # Create output directory if it doesn't exist
@@ -26,19 +42,10 @@ def generate_sample_data(num_customers=1000, num_products=50, num_orders=5000, s
     })
     
     # Generate product data
-    categories = ['Electronics', 'Clothing', 'Home & Kitchen', 'Books', 'Sports', 'Beauty', 'Toys']
-    product_names = [
-        'Wireless Earbuds', 'Smart Watch', 'Laptop', 'Smartphone', 'Headphones',
-        'T-Shirt', 'Jeans', 'Dress', 'Sneakers', 'Jacket',
-        'Coffee Maker', 'Air Fryer', 'Blender', 'Knife Set', 'Cookware Set',
-        'Novel', 'Textbook', 'Cookbook', 'Biography', 'Science Fiction',
-        'Yoga Mat', 'Dumbbells', 'Running Shoes', 'Basketball', 'Bicycle'
-    ]
-    
     products_df = pd.DataFrame({
         'ProductID': [f'PROD{str(i).zfill(5)}' for i in range(1, num_products + 1)],
-        'Category': np.random.choice(categories, size=num_products, p=[0.2, 0.15, 0.15, 0.1, 0.1, 0.15, 0.15]),
-        'ProductName': np.random.choice(product_names, size=num_products, replace=True),
+        'Category': np.random.choice(CATEGORIES, size=num_products, p=CATEGORY_WEIGHTS),
+        'ProductName': np.random.choice(PRODUCT_NAMES, size=num_products, replace=True),
         'Cost': np.random.uniform(5, 500, num_products).round(2),
         'Price': np.random.uniform(10, 1000, num_products).round(2)
     })
@@ -46,7 +53,6 @@ def generate_sample_data(num_customers=1000, num_products=50, num_orders=5000, s
     # Generate sales data
     order_ids = [f'ORD{str(i).zfill(6)}' for i in range(1, num_orders + 1)]
     order_dates = [start_date + timedelta(days=np.random.randint(0, date_range.days)) for _ in range(num_orders)]
-    regions = ['North', 'South', 'East', 'West']
     
     sales_data = []
     for order_id, order_date in zip(order_ids, order_dates):
@@ -54,7 +60,7 @@ def generate_sample_data(num_customers=1000, num_products=50, num_orders=5000, s
         product = products_df.sample(1).iloc[0]
         quantity = np.random.randint(1, 5)
         unit_price = product['Price'] * (1 - np.random.uniform(0, 0.3))  # Apply random discount
-        region = np.random.choice(regions)
+        region = np.random.choice(REGIONS)
         
         sales_data.append({
             'OrderID': order_id,
@@ -69,11 +75,227 @@ def generate_sample_data(num_customers=1000, num_products=50, num_orders=5000, s
     sales_df = pd.DataFrame(sales_data)
     
     # Save data to CSV files
+    _remove_shards('data/raw')
     sales_df.to_csv('data/raw/sales_data.csv', index=False)
     customers_df.to_csv('data/raw/customers.csv', index=False)
     products_df.to_csv('data/raw/products.csv', index=False)
     
     print(f"Generated {len(sales_df)} sales records for {len(customers_df)} customers and {len(products_df)} products.")
 
+def _remove_shards(output_dir):
+    """Delete shards left by an earlier sharded run, which readers would prefer over the new CSV."""
+    shutil.rmtree(os.path.join(output_dir, 'sales_shards'), ignore_errors=True)
+
+def _format_ids(prefix, numbers, width):
+    """Format an integer array as zero-padded IDs, e.g. ORD000001."""
+    return np.char.add(prefix, np.char.zfill(numbers.astype(str), width))
+
+def _generate_customers(rng, num_customers, start, num_days, end):
+    """Generate the customer table from block draws."""
+    numbers = np.arange(1, num_customers + 1)
+    join_dates = start + rng.integers(0, num_days, num_customers).astype('timedelta64[D]')
+    days_left = (end - join_dates).astype(int)
+    last_purchase = join_dates + rng.integers(0, days_left).astype('timedelta64[D]')
+    
+    return pd.DataFrame({
+        'CustomerID': _format_ids('CUST', numbers, 5),
+        'Name': np.char.add('Customer ', numbers.astype(str)),
+        'Email': np.char.add(np.char.add('customer', numbers.astype(str)), '@example.com'),
+        'JoinDate': join_dates,
+        'LastPurchaseDate': last_purchase
+    })
+
+def _generate_products(rng, num_products):
+    """Generate the product catalog from block draws."""
+    return pd.DataFrame({
+        'ProductID': _format_ids('PROD', np.arange(1, num_products + 1), 5),
+        'Category': rng.choice(CATEGORIES, size=num_products, p=CATEGORY_WEIGHTS),
+        'ProductName': rng.choice(PRODUCT_NAMES, size=num_products, replace=True),
+        'Cost': rng.uniform(5, 500, num_products).round(2),
+        'Price': rng.uniform(10, 1000, num_products).round(2)
+    })
+
+def _generate_sales_chunk(rng, first_order, size, customer_ids, products_df, start, num_days):
+    """Generate `size` orders numbered from `first_order` as one vectorized block."""
+    customers = rng.integers(0, len(customer_ids), size)
+    products = rng.integers(0, len(products_df), size)
+    quantity = rng.integers(1, 5, size)
+    discount = rng.uniform(0, 0.3, size)
+    regions = rng.integers(0, len(REGIONS), size)
+    order_dates = start + rng.integers(0, num_days, size).astype('timedelta64[D]')
+    prices = products_df['Price'].to_numpy()
+    
+    return pd.DataFrame({
+        'OrderID': _format_ids('ORD', np.arange(first_order, first_order + size), 6),
+        'CustomerID': customer_ids[customers],
+        'OrderDate': order_dates,
+        'ProductID': products_df['ProductID'].to_numpy()[products],
+        'Quantity': quantity,
+        'UnitPrice': (prices[products] * (1 - discount)).round(2),
+        'Region': np.asarray(REGIONS)[regions]
+    })
+
+def generate_sample_data_vectorized(num_customers=1000, num_products=50, num_orders=5000,
+                                    start_date='2023-01-01', end_date='2024-12-31',
+                                    chunk_size=1_000_000, seed=None, output_dir='data/raw'):
+    """Generate the sample dataset with NumPy block draws.
+    
+    Orders are drawn `chunk_size` rows at a time and appended to the sales CSV,
+    so memory stays bounded by the chunk size rather than `num_orders`. Passing
+    a `seed` makes the output reproducible.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    
+    start = np.datetime64(start_date, 'D')
+    end = np.datetime64(end_date, 'D')
+    num_days = int((end - start).astype(int))
+    
+    customers_df = _generate_customers(rng, num_customers, start, num_days, end)
+    products_df = _generate_products(rng, num_products)
+    customers_df.to_csv(os.path.join(output_dir, 'customers.csv'), index=False)
+    products_df.to_csv(os.path.join(output_dir, 'products.csv'), index=False)
+    
+    customer_ids = customers_df['CustomerID'].to_numpy()
+    sales_path = os.path.join(output_dir, 'sales_data.csv')
+    _remove_shards(output_dir)
+    started = time.perf_counter()
+    written = 0
+    
+    for offset in range(0, num_orders, chunk_size):
+        size = min(chunk_size, num_orders - offset)
+        chunk = _generate_sales_chunk(rng, offset + 1, size, customer_ids, products_df, start, num_days)
+        chunk.to_csv(sales_path, mode='w' if offset == 0 else 'a', header=offset == 0, index=False)
+        written += size
+        
+        elapsed = time.perf_counter() - started
+        print(f"  {written:,}/{num_orders:,} orders ({written / max(elapsed, 1e-9):,.0f} rows/sec)")
+    if written == 0:
+        # No chunk was written; replace any earlier file with just the header
+        header = _generate_sales_chunk(rng, 1, 1, customer_ids, products_df, start, num_days).iloc[:0]
+        header.to_csv(sales_path, index=False)
+    
+    elapsed = time.perf_counter() - started
+    rows_per_sec = written / max(elapsed, 1e-9)
+    print(f"Generated {written} sales records for {num_customers} customers and {num_products} products "
+          f"in {elapsed:.2f}s ({rows_per_sec:,.0f} rows/sec).")
+    
+    return {'rows': written, 'seconds': elapsed, 'rows_per_sec': rows_per_sec}
+
+_shard_context = {}
+
+def _init_shard_worker(customer_ids, products_df, start, num_days, shard_dir):
+    """Share the customer/product tables with a worker once instead of per shard."""
+    _shard_context.update(customer_ids=customer_ids, products_df=products_df,
+                          start=start, num_days=num_days, shard_dir=shard_dir)
+
+def _generate_shard(shard):
+    """Generate and write one shard of orders; returns its manifest entry."""
+    shard_index, first_order, size, seed_seq = shard
+    ctx = _shard_context
+    rng = np.random.default_rng(seed_seq)
+    chunk = _generate_sales_chunk(rng, first_order, size, ctx['customer_ids'], ctx['products_df'],
+                                  ctx['start'], ctx['num_days'])
+    
+    file_name = f'part-{shard_index:05d}.csv'
+    chunk.to_csv(os.path.join(ctx['shard_dir'], file_name), index=False)
+    
+    return {
+        'shard': shard_index,
+        'file': file_name,
+        'first_order': first_order,
+        'rows': size,
+        'min_date': str(chunk['OrderDate'].min().date()),
+        'max_date': str(chunk['OrderDate'].max().date())
+    }
+
+def generate_sample_data_sharded(num_customers=1000, num_products=50, num_orders=5000,
+                                 start_date='2023-01-01', end_date='2024-12-31',
+                                 shard_size=1_000_000, num_workers=None, seed=None,
+                                 output_dir='data/raw'):
+    """Generate sales as independent shards on a process pool.
+    
+    The order-ID range is cut into `shard_size` blocks and every shard draws from
+    its own child of one `SeedSequence`, so the output only depends on `seed`
+    and `shard_size`, never on `num_workers`. Shards are written to
+    `<output_dir>/sales_shards/part-NNNNN.csv` next to a `manifest.json`
+    listing each shard's row count and date range.
+    """
+    shard_dir = os.path.join(output_dir, 'sales_shards')
+    os.makedirs(shard_dir, exist_ok=True)
+    
+    start = np.datetime64(start_date, 'D')
+    end = np.datetime64(end_date, 'D')
+    num_days = int((end - start).astype(int))
+    
+    num_shards = -(-num_orders // shard_size)
+    catalog_seq, *shard_seqs = np.random.SeedSequence(seed).spawn(num_shards + 1)
+    rng = np.random.default_rng(catalog_seq)
+    
+    customers_df = _generate_customers(rng, num_customers, start, num_days, end)
+    products_df = _generate_products(rng, num_products)
+    customers_df.to_csv(os.path.join(output_dir, 'customers.csv'), index=False)
+    products_df.to_csv(os.path.join(output_dir, 'products.csv'), index=False)
+    
+    shards = [
+        (i, i * shard_size + 1, min(shard_size, num_orders - i * shard_size), shard_seqs[i])
+        for i in range(num_shards)
+    ]
+    
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_shard_worker,
+                             initargs=(customers_df['CustomerID'].to_numpy(), products_df,
+                                       start, num_days, shard_dir)) as executor:
+        entries = list(executor.map(_generate_shard, shards))
+    elapsed = time.perf_counter() - started
+    
+    manifest = {
+        'seed': seed,
+        'num_orders': num_orders,
+        'shard_size': shard_size,
+        'min_date': min(e['min_date'] for e in entries) if entries else None,
+        'max_date': max(e['max_date'] for e in entries) if entries else None,
+        'shards': entries
+    }
+    with open(os.path.join(shard_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    
+    rows_per_sec = num_orders / max(elapsed, 1e-9)
+    print(f"Generated {num_orders} sales records in {num_shards} shards for {num_customers} customers "
+          f"and {num_products} products in {elapsed:.2f}s ({rows_per_sec:,.0f} rows/sec).")
+    
+    return manifest
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generate sample sales, customer and product data.')
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--start-date', default='2023-01-01')
+    parser.add_argument('--end-date', default='2024-12-31')
+    parser.add_argument('--vectorized', action='store_true',
+                        help='Draw orders in NumPy blocks and stream them to disk in chunks')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--sharded', action='store_true',
+                        help='Write sales as per-shard part files generated on a process pool')
+    parser.add_argument('--shard-size', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    generate_sample_data()
+    args = parse_args()
+    if args.sharded:
+        generate_sample_data_sharded(args.customers, args.products, args.orders,
+                                     args.start_date, args.end_date,
+                                     shard_size=args.shard_size, num_workers=args.workers,
+                                     seed=args.seed)
+    elif args.vectorized:
+        generate_sample_data_vectorized(args.customers, args.products, args.orders,
+                                        args.start_date, args.end_date,
+                                        chunk_size=args.chunk_size, seed=args.seed)
+    else:
+        if args.seed is not None:
+            np.random.seed(args.seed)
+        generate_sample_data(args.customers, args.products, args.orders,
+                             args.start_date, args.end_date)
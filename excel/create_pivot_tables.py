@@ -1,43 +1,64 @@
 import pandas as pd
 import numpy as np
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
+import argparse
 import os
+import sys
 
-def create_pivot_tables():
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sales_pipeline.colstore import has_colstore, read_colstore
+from sales_pipeline.context import STREAM_AGGREGATES
+from sales_pipeline.excel_export import create_workbook, write_frame
+from sales_pipeline.instrument import instrumented
+from sales_pipeline.storage import read_table
+from sales_pipeline.streaming import aggregate_sales
+
+DATA_DIR = '../data/processed'
+
+def sales_pivot_from_aggregates(aggregates):
+    """Region x product totals with an 'All' row, laid out like the pandas pivot table"""
+    pivot = aggregates.totals('region_product').rename(columns={'Revenue': 'TotalPrice'})
+    pivot = pivot.astype({'Region': str})[['Region', 'ProductID', 'Quantity', 'TotalPrice']]
+    margins = pd.DataFrame([{'Region': 'All', 'ProductID': '', 'Quantity': aggregates.quantity,
+                             'TotalPrice': aggregates.revenue}])
+    return pd.concat([pivot, margins], ignore_index=True)
+
+@instrumented('excel_pivots')
+def create_pivot_tables(streaming=False, stream_aggregates=STREAM_AGGREGATES):
     # Create pivot tables directory if it doesn't exist
     os.makedirs('pivot_tables', exist_ok=True)
     
     # Load processed data
-    sales_df = pd.read_csv('../data/processed/processed_sales.csv')
-    customers_df = pd.read_csv('../data/processed/processed_customers.csv')
-    products_df = pd.read_csv('../data/processed/processed_products.csv')
+    customers_df = read_table('processed_customers', DATA_DIR, columns=['CustomerID', 'JoinDate'])
+    products_df = read_table('processed_products', DATA_DIR)
     
-    # Create Excel workbook
-    wb = Workbook()
+    # Create Excel workbook (write-only sheets stream rows to disk when streaming)
+    wb = create_workbook(streaming)
     
     # 1. Sales Analysis by Region and Category
     ws_sales = wb.create_sheet("Sales Analysis")
     
-    # Create pivot table data using pandas
-    sales_pivot = pd.pivot_table(
-        sales_df,
-        values=['TotalPrice', 'Quantity'],
-        index=['Region', 'ProductID'],
-        columns=[],
-        aggfunc={'TotalPrice': np.sum, 'Quantity': np.sum},
-        margins=True
-    ).reset_index()
+    # Create pivot table data, from chunked aggregates when the sales do not fit in memory
+    if stream_aggregates:
+        sales_pivot = sales_pivot_from_aggregates(aggregate_sales(DATA_DIR))
+    else:
+        columns = ['ProductID', 'Quantity', 'Region', 'TotalPrice']
+        if has_colstore(DATA_DIR):
+            # The fact table's column store maps the same rows without parsing them
+            sales_df = read_colstore(DATA_DIR, columns=columns)
+        else:
+            sales_df = read_table('processed_sales', DATA_DIR, columns=columns)
+        sales_pivot = pd.pivot_table(
+            sales_df,
+            values=['TotalPrice', 'Quantity'],
+            index=['Region', 'ProductID'],
+            columns=[],
+            aggfunc={'TotalPrice': np.sum, 'Quantity': np.sum},
+            margins=True,
+            observed=True
+        ).reset_index()
     
-    # Add data to worksheet
-    for r in dataframe_to_rows(sales_pivot, index=False, header=True):
-        ws_sales.append(r)
-    
-    # Format headers
-    for cell in ws_sales[1]:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
+    # Add data to worksheet with a formatted header
+    write_frame(ws_sales, sales_pivot)
     
     # 2. Customer Analysis
     ws_customers = wb.create_sheet("Customer Analysis")
@@ -51,13 +72,8 @@ def create_pivot_tables():
         margins=True
     ).reset_index()
     
-    for r in dataframe_to_rows(customers_pivot, index=False, header=True):
-        ws_customers.append(r)
-    
-    # Format headers
-    for cell in ws_customers[1]:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
+    # Add data to worksheet with a formatted header
+    write_frame(ws_customers, customers_pivot)
     
     # 3. Product Analysis
     ws_products = wb.create_sheet("Product Analysis")
@@ -68,20 +84,22 @@ def create_pivot_tables():
         values=['Price', 'Cost'],
         index=['Category', 'ProductName'],
         aggfunc={'Price': np.mean, 'Cost': np.mean},
-        margins=True
+        margins=True,
+        observed=True
     ).reset_index()
     
-    for r in dataframe_to_rows(product_pivot, index=False, header=True):
-        ws_products.append(r)
-    
-    # Format headers
-    for cell in ws_products[1]:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
+    # Add data to worksheet with a formatted header
+    write_frame(ws_products, product_pivot)
     
     # Save workbook
     wb.save("pivot_tables/retail_pivot_tables.xlsx")
     print("Pivot tables created successfully!")
 
 if __name__ == "__main__":
-    create_pivot_tables()
+    parser = argparse.ArgumentParser(description='Create the retail pivot table workbook.')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Use write-only worksheets so memory stays flat as the tables grow')
+    parser.add_argument('--stream-aggregates', action='store_true', default=STREAM_AGGREGATES,
+                        help='Aggregate sales in chunks instead of loading them (also SALES_STREAM_AGGREGATES=1)')
+    args = parser.parse_args()
+    create_pivot_tables(streaming=args.streaming, stream_aggregates=args.stream_aggregates)
@@ -1,53 +1,47 @@
 import pandas as pd
 import numpy as np
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.chart import BarChart, LineChart, Reference
-from openpyxl.utils.dataframe import dataframe_to_rows
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
 import os
+import sys
+import time
 
-def create_excel_analysis():
-    # Create output directory if it doesn't exist
-    os.makedirs('analysis', exist_ok=True)
-    
-    # Load processed data
-    sales_df = pd.read_csv('../data/processed/processed_sales.csv')
-    customers_df = pd.read_csv('../data/processed/processed_customers.csv')
-    products_df = pd.read_csv('../data/processed/processed_products.csv')
-    segments_df = pd.read_csv('../data/processed/customer_segments.csv')
-    
-    # Create Excel workbook
-    wb = Workbook()
-    
-    # Add summary sheet
-    summary = wb.active
-    summary.title = "Summary"
-    
-    # Add basic statistics
-    summary['A1'] = "Sales Analysis Summary"
-    summary['A1'].font = Font(bold=True, size=14)
-    
-    # Add key metrics
-    metrics = [
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sales_pipeline.context import get_context
+from sales_pipeline.excel_export import HEADER_FONT, TITLE_FONT, create_workbook, styled_cell, write_frame
+from sales_pipeline.instrument import instrumented, stage
+from sales_pipeline.whatif import (DEFAULT_DISCOUNTS, DEFAULT_ELASTICITIES, aggregate_cells,
+                                   evaluate_scenarios, scenario_grid)
+
+DATA_DIR = '../data/processed'
+
+def compute_summary(ctx):
+    """Key metrics for the summary sheet"""
+    sales_df = ctx.fact
+    return [
         ('Total Sales', sales_df['TotalPrice'].sum()),
         ('Total Orders', sales_df['OrderID'].nunique()),
         ('Average Order Value', sales_df['TotalPrice'].mean()),
-        ('Total Customers', customers_df['CustomerID'].nunique()),
-        ('Total Products', products_df['ProductID'].nunique())
+        ('Total Customers', ctx.customers['CustomerID'].nunique()),
+        ('Total Products', ctx.products['ProductID'].nunique())
     ]
+
+def write_summary(ws, metrics):
+    # Add basic statistics
+    ws.append([styled_cell(ws, "Sales Analysis Summary", TITLE_FONT)])
     
-    for i, (metric, value) in enumerate(metrics, start=2):
-        summary[f'A{i}'] = metric
-        summary[f'B{i}'] = value
-        summary[f'A{i}'].font = Font(bold=True)
-    
-    # Add Sales by Category
-    sales_by_category = pd.merge(sales_df, products_df, on='ProductID')\
-        .groupby('Category')['TotalPrice'].sum().reset_index()
-    
-    ws_category = wb.create_sheet("Sales by Category")
-    for r in dataframe_to_rows(sales_by_category, index=False, header=True):
-        ws_category.append(r)
+    # Add key metrics
+    for metric, value in metrics:
+        ws.append([styled_cell(ws, metric, HEADER_FONT), value])
+
+def compute_category_sales(ctx):
+    """Total sales per product category"""
+    return ctx.fact.groupby('Category', observed=True)['TotalPrice'].sum().reset_index()
+
+def write_category_sales(ws, sales_by_category):
+    write_frame(ws, sales_by_category)
     
     # Add chart
     chart = BarChart()
@@ -56,66 +50,141 @@ def create_excel_analysis():
     chart.x_axis.title = 'Category'
     chart.y_axis.title = 'Sales Amount'
     
-    data = Reference(ws_category, min_col=2, min_row=1, max_col=2, max_row=len(sales_by_category)+1)
-    cats = Reference(ws_category, min_col=1, min_row=2, max_row=len(sales_by_category)+1)
+    data = Reference(ws, min_col=2, min_row=1, max_col=2, max_row=len(sales_by_category)+1)
+    cats = Reference(ws, min_col=1, min_row=2, max_row=len(sales_by_category)+1)
     chart.add_data(data, titles_from_data=True)
     chart.set_categories(cats)
-    ws_category.add_chart(chart, "E3")
-    
-    # Add Customer Segmentation
-    segment_summary = segments_df.groupby('Segment').agg({
+    ws.add_chart(chart, "E3")
+
+def compute_segment_summary(ctx):
+    """Customer count and mean RFM values per segment"""
+    return ctx.segments.groupby('Segment').agg({
         'CustomerID': 'count',
         'Recency': 'mean',
         'Frequency': 'mean',
         'Monetary': 'mean'
     }).reset_index()
-    
-    ws_segments = wb.create_sheet("Customer Segments")
-    for r in dataframe_to_rows(segment_summary, index=False, header=True):
-        ws_segments.append(r)
-    
-    # Add what-if analysis sheet
-    what_if = wb.create_sheet("What-If Analysis")
-    what_if['A1'] = "What-If Analysis"
-    what_if['A1'].font = Font(bold=True, size=14)
+
+def write_segment_summary(ws, segment_summary):
+    write_frame(ws, segment_summary)
+
+# Columns of the what-if results shown in the workbook
+WHAT_IF_COLUMNS = {
+    'Scenario': 'Scenario',
+    'Discount': 'Discount',
+    'Elasticity': 'Elasticity',
+    'Revenue': 'Projected Sales',
+    'RevenueChange': 'Change',
+    'Profit': 'Projected Profit',
+    'ProfitChange': 'Profit Change'
+}
+
+def compute_what_if(ctx):
+    """Projected sales and profit for store-wide and per-category discount scenarios"""
+    cells = aggregate_cells(ctx.fact)
+    overall = evaluate_scenarios(ctx.fact, scenario_grid(DEFAULT_DISCOUNTS, DEFAULT_ELASTICITIES), cells)
+    by_category = evaluate_scenarios(
+        ctx.fact,
+        scenario_grid(DEFAULT_DISCOUNTS[1:], DEFAULT_ELASTICITIES, 'Category', cells['Category'].unique()),
+        cells
+    )
+    return overall, by_category
+
+def write_what_if(ws, results):
+    overall, by_category = results
+    ws.append([styled_cell(ws, "What-If Analysis", TITLE_FONT)])
+    ws.append([])
     
     # Add discount impact analysis
-    what_if['A3'] = "Discount Impact Analysis"
-    what_if['A3'].font = Font(bold=True)
-    
-    # Create discount scenarios
-    discount_scenarios = {
-        'Current': 0,
-        '5% Discount': 0.05,
-        '10% Discount': 0.10,
-        '15% Discount': 0.15,
-        '20% Discount': 0.20
-    }
-    
-    # Calculate impact on sales
-    base_sales = sales_df['TotalPrice'].sum()
-    row = 4
-    for name, discount in discount_scenarios.items():
-        what_if[f'A{row}'] = name
-        what_if[f'B{row}'] = f"{discount*100}%"
-        what_if[f'C{row}'] = base_sales * (1 - discount)
-        what_if[f'D{row}'] = f"=C{row}-C3"
-        row += 1
-    
-    # Add headers
-    what_if['A4'] = "Scenario"
-    what_if['B4'] = "Discount"
-    what_if['C4'] = "Projected Sales"
-    what_if['D4'] = "Change"
+    ws.append([styled_cell(ws, "Discount Impact Analysis", HEADER_FONT)])
+    write_frame(ws, overall[list(WHAT_IF_COLUMNS)].rename(columns=WHAT_IF_COLUMNS))
+    ws.append([])
+    
+    # Add discounts scoped to a single category
+    ws.append([styled_cell(ws, "Category Discount Analysis", HEADER_FONT)])
+    columns = {'Category': 'Category', **WHAT_IF_COLUMNS}
+    write_frame(ws, by_category[list(columns)].rename(columns=columns))
+
+# Sheet title, data computation and writer, in workbook order
+SHEETS = [
+    ("Summary", compute_summary, write_summary),
+    ("Sales by Category", compute_category_sales, write_category_sales),
+    ("Customer Segments", compute_segment_summary, write_segment_summary),
+    ("What-If Analysis", compute_what_if, write_what_if)
+]
+
+def _timed(title, func, ctx):
+    started = time.perf_counter()
+    with stage(title, kind='sheet_compute'):
+        result = func(ctx)
+    return result, time.perf_counter() - started
+
+def compute_sheets(ctx, workers=1):
+    """Compute every sheet's data, concurrently when `workers` is not 1.
+    
+    Sheets are computed on a thread pool so they share the tables already
+    loaded in `ctx`; None means one thread per sheet. Returns (data, seconds)
+    per sheet in workbook order.
+    """
+    if workers == 1:
+        return [_timed(title, compute, ctx) for title, compute, _ in SHEETS]
+    
+    with ThreadPoolExecutor(max_workers=workers or len(SHEETS)) as pool:
+        futures = [pool.submit(_timed, title, compute, ctx) for title, compute, _ in SHEETS]
+        return [future.result() for future in futures]
+
+def print_sheet_timings(timings):
+    """Print per-sheet compute and write timings."""
+    print("\nSheet timings:")
+    for timing in timings:
+        print(f"- {timing['sheet']}: compute {timing['compute_seconds']:.3f}s, "
+              f"write {timing['write_seconds']:.3f}s")
+
+@instrumented('excel_analysis')
+def create_excel_analysis(streaming=False, workers=1):
+    # Create output directory if it doesn't exist
+    os.makedirs('analysis', exist_ok=True)
     
-    # Format headers
-    for cell in what_if[4]:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
+    # Load processed data once; the sheet computations share it
+    started = time.perf_counter()
+    ctx = get_context(DATA_DIR)
+    for table in ('fact', 'customers', 'products', 'segments'):
+        getattr(ctx, table)
+    load_seconds = time.perf_counter() - started
+    
+    # Compute every sheet's data before assembling the workbook
+    results = compute_sheets(ctx, workers)
+    
+    # Create Excel workbook; sheets are written top to bottom so they can stream
+    wb = create_workbook(streaming)
+    timings = []
+    for (title, _, write), (data, compute_seconds) in zip(SHEETS, results):
+        started = time.perf_counter()
+        with stage(title, kind='sheet_write'):
+            write(wb.create_sheet(title), data)
+        timings.append({'sheet': title, 'compute_seconds': compute_seconds,
+                        'write_seconds': time.perf_counter() - started})
     
     # Save workbook
+    started = time.perf_counter()
     wb.save("analysis/retail_analysis.xlsx")
+    save_seconds = time.perf_counter() - started
+    
+    # Record timings as a baseline for the Excel stage
+    with open("analysis/sheet_timings.json", 'w') as f:
+        json.dump({'workers': workers, 'streaming': streaming, 'load_seconds': load_seconds,
+                   'save_seconds': save_seconds, 'sheets': timings}, f, indent=2)
+    
     print("Excel analysis file created successfully!")
+    print_sheet_timings(timings)
+    print(f"- load {load_seconds:.3f}s, save {save_seconds:.3f}s")
+    return timings
 
 if __name__ == "__main__":
-    create_excel_analysis()
+    parser = argparse.ArgumentParser(description='Create the retail analysis workbook.')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Use write-only worksheets so memory stays flat as the tables grow')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Compute sheet data on this many threads (0 for one per sheet)')
+    args = parser.parse_args()
+    create_excel_analysis(streaming=args.streaming, workers=args.workers or None)
@@ -2,27 +2,30 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+import argparse
 import os
 from datetime import datetime
 from scipy.stats import pearsonr
 import plotly.express as px
+from sales_pipeline.context import get_context
+from sales_pipeline.instrument import instrumented
+from sales_pipeline.render import print_render_report, render_charts
+from sales_pipeline.rollup import rollup_series, rollup_totals
 
 # Create extended results directory
 os.makedirs('results/extended', exist_ok=True)
 
-def create_heatmap_correlations():
+def create_heatmap_correlations(ctx=None):
     """Create correlation heatmap between key metrics"""
     # Load necessary data
-    sales_df = pd.read_csv('data/processed/processed_sales.csv')
-    products_df = pd.read_csv('data/processed/processed_products.csv')
-    segments_df = pd.read_csv('data/processed/customer_segments.csv')
+    ctx = ctx or get_context()
+    segments_df = ctx.segments[['CustomerID', 'Recency', 'Frequency', 'Monetary', 'Churn']]
     
     # Merge data
-    merged_df = pd.merge(sales_df, products_df, on='ProductID')
-    merged_df = pd.merge(merged_df, segments_df, on='CustomerID')
+    merged_df = pd.merge(ctx.fact, segments_df, on='CustomerID')
     
     # Calculate metrics
-    metrics = merged_df.groupby('CustomerID').agg({
+    metrics = merged_df.groupby('CustomerID', observed=True).agg({
         'TotalPrice': 'sum',
         'Quantity': 'sum',
         'Recency': 'first',
@@ -44,17 +47,13 @@ def create_heatmap_correlations():
     plt.savefig('results/extended/correlation_heatmap.png')
     plt.close()
 
-def create_product_performance_dashboard():
+def create_product_performance_dashboard(ctx=None):
     """Create interactive product performance dashboard"""
-    # Load data
-    sales_df = pd.read_csv('data/processed/processed_sales.csv')
-    products_df = pd.read_csv('data/processed/processed_products.csv')
-    
-    # Merge data
-    product_performance = pd.merge(sales_df, products_df, on='ProductID')
+    # Load merged sales and products data
+    product_performance = (ctx or get_context()).fact
     
     # Calculate metrics
-    product_metrics = product_performance.groupby(['Category', 'ProductName']).agg({
+    product_metrics = product_performance.groupby(['Category', 'ProductName'], observed=True).agg({
         'Quantity': 'sum',
         'TotalPrice': 'sum',
         'UnitPrice': 'mean'
@@ -74,23 +73,25 @@ def create_product_performance_dashboard():
     # Save as HTML
     fig.write_html('results/extended/product_performance.html')
 
-def create_customer_ltv_analysis():
+def create_customer_ltv_analysis(ctx=None):
     """Create customer lifetime value analysis"""
     # Load data
-    sales_df = pd.read_csv('data/processed/processed_sales.csv')
-    customers_df = pd.read_csv('data/processed/processed_customers.csv')
+    ctx = ctx or get_context()
     
     # Calculate customer LTV
-    customer_ltv = sales_df.groupby('CustomerID').agg({
-        'TotalPrice': 'sum',
-        'OrderDate': ['min', 'max']
-    }).reset_index()
-    
-    customer_ltv.columns = ['CustomerID', 'TotalRevenue', 'FirstPurchase', 'LastPurchase']
+    if ctx.stream_aggregates:
+        customer_ltv = ctx.aggregates.customer_ltv()
+    else:
+        sales_df = ctx.sales
+        customer_ltv = sales_df.groupby('CustomerID', observed=True).agg({
+            'TotalPrice': 'sum',
+            'OrderDate': ['min', 'max']
+        }).reset_index()
+        
+        customer_ltv.columns = ['CustomerID', 'TotalRevenue', 'FirstPurchase', 'LastPurchase']
     
     # Calculate purchase period
-    customer_ltv['PurchasePeriod'] = (pd.to_datetime(customer_ltv['LastPurchase']) - 
-                                    pd.to_datetime(customer_ltv['FirstPurchase'])).dt.days
+    customer_ltv['PurchasePeriod'] = (customer_ltv['LastPurchase'] - customer_ltv['FirstPurchase']).dt.days
     
     # Calculate average revenue per day
     customer_ltv['RevenuePerDay'] = customer_ltv['TotalRevenue'] / customer_ltv['PurchasePeriod']
@@ -105,16 +106,11 @@ def create_customer_ltv_analysis():
     plt.savefig('results/extended/customer_ltv.png')
     plt.close()
 
-def create_time_series_forecast():
+def create_time_series_forecast(ctx=None):
     """Create time series forecast for sales"""
-    # Load sales data
-    sales_df = pd.read_csv('data/processed/processed_sales.csv')
-    
-    # Convert to datetime
-    sales_df['OrderDate'] = pd.to_datetime(sales_df['OrderDate'])
-    
-    # Calculate daily sales
-    daily_sales = sales_df.groupby('OrderDate')['TotalPrice'].sum().reset_index()
+    # Daily sales from the precomputed rollup cube
+    daily_sales = rollup_series((ctx or get_context()).rollup, 'day').reset_index()
+    daily_sales.columns = ['OrderDate', 'TotalPrice']
     
     # Create rolling average
     daily_sales['RollingMean'] = daily_sales['TotalPrice'].rolling(window=7, min_periods=1).mean()
@@ -132,10 +128,11 @@ def create_time_series_forecast():
     plt.savefig('results/extended/sales_forecast.png')
     plt.close()
 
-def create_marketing_segmentation():
+def create_marketing_segmentation(ctx=None):
     """Create marketing segmentation analysis"""
     # Load data
-    segments_df = pd.read_csv('data/processed/customer_segments.csv')
+    ctx = ctx or get_context()
+    segments_df = ctx.segments
     
     # Create marketing segments based on RFM
     conditions = [
@@ -162,33 +159,30 @@ def create_marketing_segmentation():
     
     # Save the segmented data
     marketing_segments.to_csv('results/extended/customer_segments_marketing.csv', index=False)
+    ctx.marketing_segments = marketing_segments
     
     return marketing_segments
 
-def create_extended_summary():
+def create_extended_summary(ctx=None):
     """Create extended analysis summary"""
     # Load all data
-    sales_df = pd.read_csv('data/processed/processed_sales.csv')
-    products_df = pd.read_csv('data/processed/processed_products.csv')
-    segments_df = pd.read_csv('data/processed/customer_segments.csv')
+    ctx = ctx or get_context()
     
     # Load marketing segments
-    marketing_segments = pd.read_csv('results/extended/customer_segments_marketing.csv')
+    marketing_segments = ctx.marketing_segments
     
     # Calculate extended metrics
     # Product performance metrics
-    product_metrics = pd.merge(sales_df, products_df, on='ProductID')
-    product_performance = product_metrics.groupby('Category').agg({
-        'TotalPrice': 'sum',
-        'Quantity': 'sum',
-        'UnitPrice': 'mean'
-    }).reset_index()
+    product_performance = rollup_totals(ctx.rollup, 'Category').rename('TotalPrice').reset_index()
     
     # Customer metrics
-    customer_metrics = sales_df.groupby('CustomerID').agg({
-        'TotalPrice': 'sum',
-        'Quantity': 'sum'
-    }).reset_index()
+    if ctx.stream_aggregates:
+        customer_metrics = ctx.aggregates.totals('customer').rename(columns={'Revenue': 'TotalPrice'})
+    else:
+        customer_metrics = ctx.sales.groupby('CustomerID', observed=True).agg({
+            'TotalPrice': 'sum',
+            'Quantity': 'sum'
+        }).reset_index()
     
     # Marketing segment counts
     segment_counts = marketing_segments['MarketingSegment'].value_counts()
@@ -212,16 +206,30 @@ def create_extended_summary():
         for segment, count in segment_counts.items():
             f.write(f"- {segment} Customers: {count}\n")
 
-def main():
+# The summary reads the marketing segments, so it is rendered after the first batch
+CHART_BATCHES = [
+    [
+        create_heatmap_correlations,
+        create_product_performance_dashboard,
+        create_customer_ltv_analysis,
+        create_time_series_forecast,
+        create_marketing_segmentation
+    ],
+    [create_extended_summary]
+]
+
+@instrumented('extended')
+def main(workers=1):
     print("Generating extended analysis...")
     
-    # Create all extended visualizations
-    create_heatmap_correlations()
-    create_product_performance_dashboard()
-    create_customer_ltv_analysis()
-    create_time_series_forecast()
-    create_marketing_segmentation()
-    create_extended_summary()
+    # Create all extended visualizations, sharing one context when rendering serially
+    ctx = get_context() if workers == 1 else None
+    results = []
+    for batch in CHART_BATCHES:
+        results += render_charts(batch, workers=workers, ctx=ctx)
+    print_render_report(results)
+    if any(result['error'] for result in results):
+        raise SystemExit(1)
     
     print("\nExtended analysis completed! New visualizations and insights have been saved to:")
     print("results/extended/")
@@ -234,4 +242,8 @@ def main():
     print("- extended_analysis_summary.txt: Detailed analysis summary")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Generate the extended analysis charts and summary.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Render charts on this many processes (0 for one per CPU)')
+    args = parser.parse_args()
+    main(workers=args.workers or None)
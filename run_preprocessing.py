@@ -1,43 +1,28 @@
-import nbformat
-from nbconvert.preprocessors import ExecutePreprocessor
+import argparse
 import os
+import sys
 
-def run_notebook(notebook_path):
-    """Execute a Jupyter notebook and save the output."""
-    with open(notebook_path, 'r', encoding='utf-8') as f:
-        nb = nbformat.read(f, as_version=4)
-    
-    # Configure the notebook execution
-    ep = ExecutePreprocessor(timeout=600, kernel_name='python3')
-    
-    try:
-        # Execute the notebook
-        ep.preprocess(nb, {'metadata': {'path': os.path.dirname(notebook_path)}})
-        
-        # Save the executed notebook
-        with open(notebook_path, 'w', encoding='utf-8') as f:
-            nbformat.write(nb, f)
-        
-        print(f"Successfully executed {notebook_path}")
-        return True
-    except Exception as e:
-        print(f"Error executing {notebook_path}: {str(e)}")
-        return False
+from sales_pipeline.incremental import run_incremental
+from sales_pipeline.preprocessing import run_preprocessing
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Preprocess the raw sales data.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only process orders that arrived since the last run')
+    args = parser.parse_args()
+    
     # Create the processed data directory if it doesn't exist
     os.makedirs('data/processed', exist_ok=True)
     
-    # Run the preprocessing notebook
-    notebook_path = os.path.join('notebooks', '01_data_preprocessing.ipynb')
-    if os.path.exists(notebook_path):
-        print(f"Running {notebook_path}...")
-        success = run_notebook(notebook_path)
-        
-        if success:
-            print("\nData preprocessing completed successfully!")
-            print("You can now proceed with the advanced analytics notebook.")
+    try:
+        if args.incremental:
+            run_incremental()
         else:
-            print("\nThere was an error during preprocessing. Please check the error messages above.")
-    else:
-        print(f"Error: {notebook_path} not found.")
+            run_preprocessing()
+        
+        print("\nData preprocessing completed successfully!")
+        print("You can now proceed with advanced analytics.")
+    except Exception as e:
+        print(f"Error during preprocessing: {str(e)}")
+        print("\nThere was an error during preprocessing. Please check the error messages above.")
+        sys.exit(1)
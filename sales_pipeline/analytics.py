@@ -0,0 +1,262 @@
+"""Customer segmentation and churn prediction.
+
+`run_advanced_analytics` segments customers with K-means on their scaled
+RFM metrics, trains the churn model and saves `customer_segments` plus the
+segment-enriched sales fact table.
+
+Segmentation has two modes. `exact` fits full K-means models for every k
+of the elbow search. `fast` runs the elbow search on a stratified sample,
+starting each k from the previous k's centers plus one new seed, then fits
+only the final model on all customers, starting from the sample's centers.
+
+The fitted scaler, K-means model and churn model are saved as a versioned
+artifact (see `sales_pipeline.models`) so new customers can be scored
+without retraining.
+
+The churn model is either the default random forest on a 70/30 split or,
+with `churn_mode='tuned'`, the early-stopped cross-validated forest from
+`sales_pipeline.churn`.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import train_test_split
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import adjusted_rand_score, classification_report
+
+from .churn import train_churn_model
+from .colstore import write_colstore
+from .fact import build_sales_fact
+from .instrument import instrumented
+from .models import MODEL_DIR, churn_probability, save_models
+from .rollup import build_rollup
+from .storage import PROCESSED_DIR, read_table, write_table
+
+def load_processed_data(data_dir=PROCESSED_DIR):
+    # Load processed data
+    sales_df = read_table('processed_sales', data_dir)
+    customers_df = read_table('processed_customers', data_dir)
+    products_df = read_table('processed_products', data_dir)
+    rfm_df = read_table('customer_rfm', data_dir)
+    
+    return sales_df, customers_df, products_df, rfm_df
+
+RFM_FEATURES = ['Recency', 'Frequency', 'Monetary']
+N_SEGMENTS = 4
+
+def stratified_sample(rfm_scaled, sample_size, bins=5, random_state=42):
+    """Row indices of a sample stratified by the quantile bins of every RFM feature."""
+    n = len(rfm_scaled)
+    if sample_size >= n:
+        return np.arange(n)
+    
+    # Combine each feature's quantile bin into one stratum code
+    strata = np.zeros(n, dtype='int64')
+    for column in range(rfm_scaled.shape[1]):
+        ranks = pd.Series(rfm_scaled[:, column]).rank(method='first', pct=True).to_numpy()
+        strata = strata * bins + np.minimum((ranks * bins).astype('int64'), bins - 1)
+    
+    # Keep the same share of every stratum, choosing rows at random within it
+    rng = np.random.default_rng(random_state)
+    order = np.lexsort((rng.random(n), strata))
+    sorted_strata = strata[order]
+    starts = np.searchsorted(sorted_strata, sorted_strata, side='left')
+    rank_in_stratum = np.arange(n) - starts
+    stratum_sizes = np.bincount(sorted_strata)[sorted_strata]
+    keep = rank_in_stratum < np.ceil(stratum_sizes * sample_size / n)
+    
+    return np.sort(order[keep])
+
+def warm_started_fits(sample, max_k=10, random_state=42):
+    """K-means fits for k = 1..max_k, each started from the previous k's centers.
+
+    k=1 starts from the mean. Each later k adds one seed drawn k-means++
+    style, with probability proportional to a point's squared distance from
+    its nearest center, so every fit starts close to a solution and
+    converges in a few iterations. Returns (k, inertia, centers) per k,
+    stopping early at the sample's number of distinct points.
+    """
+    rng = np.random.default_rng(random_state)
+    centers = sample.mean(axis=0, keepdims=True)
+    fits = []
+    # Past the number of distinct points there is nothing left to seed a center from
+    max_k = min(max_k, len(np.unique(sample, axis=0)))
+    for k in range(1, max_k + 1):
+        if k > 1:
+            distances = ((sample[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+            seed = sample[rng.choice(len(sample), p=distances / distances.sum())]
+            centers = np.vstack([centers, seed])
+        model = KMeans(n_clusters=k, init=centers, n_init=1, random_state=random_state).fit(sample)
+        centers = model.cluster_centers_
+        fits.append((k, model.inertia_, centers))
+    return fits
+
+def fit_segmentation(rfm_data, mode='exact', sample_size=100_000):
+    """Fit the scaler and the final K-means model, returning them with the elbow SSE curve.
+    
+    In `fast` mode the elbow SSE is measured with warm-started fits on a
+    stratified sample and scaled up to the full row count, and the final model
+    is seeded with the centers of the sample's k=N_SEGMENTS fit.
+    """
+    # Scale the data
+    scaler = StandardScaler()
+    rfm_scaled = scaler.fit_transform(rfm_data)
+    
+    if mode == 'fast':
+        sample = rfm_scaled[stratified_sample(rfm_scaled, sample_size)]
+        fits = warm_started_fits(sample)
+        scale = len(rfm_scaled) / len(sample)
+        sse = {k: inertia * scale for k, inertia, _ in fits}
+        # A sample with few distinct points stops early; larger k keep its last inertia
+        sse.update({k: fits[-1][1] * scale for k in range(len(fits) + 1, 11)})
+        init = next((centers for k, _, centers in fits if k == N_SEGMENTS), 'k-means++')
+        kmeans = KMeans(n_clusters=N_SEGMENTS, init=init, n_init=1, random_state=42).fit(rfm_scaled)
+        return scaler, kmeans, sse
+    
+    # Determine optimal number of clusters using Elbow method
+    sse = {}
+    for k in range(1, 11):
+        kmeans = KMeans(n_clusters=k, random_state=42)
+        kmeans.fit(rfm_scaled)
+        sse[k] = kmeans.inertia_
+    
+    # Apply K-means clustering (assuming 4 clusters based on elbow method)
+    kmeans = KMeans(n_clusters=N_SEGMENTS, random_state=42).fit(rfm_scaled)
+    return scaler, kmeans, sse
+
+@instrumented('segmentation')
+def segment_customers(rfm_df, show_elbow=False, mode='exact', sample_size=100_000):
+    """Segment customers and also return the fitted scaler and K-means model."""
+    # Select RFM metrics for clustering
+    rfm_data = rfm_df[RFM_FEATURES]
+    
+    # Scale the data, run the elbow search and fit the final model
+    scaler, kmeans, sse = fit_segmentation(rfm_data, mode, sample_size)
+    
+    # Plot Elbow curve
+    if show_elbow:
+        plt.figure(figsize=(10, 6))
+        plt.plot(list(sse.keys()), list(sse.values()), 'bx-')
+        plt.xlabel('Number of clusters (k)')
+        plt.ylabel('Sum of Squared Distances')
+        plt.title('Elbow Method For Optimal k')
+        plt.show()
+    
+    rfm_df['Segment'] = kmeans.labels_
+    
+    # Analyze segments
+    segment_analysis = rfm_df.groupby('Segment').agg({
+        'Recency': 'mean',
+        'Frequency': 'mean',
+        'Monetary': 'mean',
+        'CustomerID': 'count'
+    }).rename(columns={'CustomerID': 'Count'})
+    
+    return rfm_df, segment_analysis, scaler, kmeans
+
+def perform_customer_segmentation(rfm_df, show_elbow=False, mode='exact', sample_size=100_000):
+    rfm_df, segment_analysis, _, _ = segment_customers(rfm_df, show_elbow, mode, sample_size)
+    return rfm_df, segment_analysis
+
+def compare_segmentation(rfm_df, sample_size=100_000):
+    """Time the exact and fast segmentation modes and compare their results.
+    
+    Quality is reported as the relative difference in final-model inertia
+    on the full data and the adjusted Rand index between the two labelings.
+    """
+    rfm_data = rfm_df[RFM_FEATURES]
+    results = {}
+    for mode in ('exact', 'fast'):
+        started = time.perf_counter()
+        scaler, kmeans, sse = fit_segmentation(rfm_data, mode, sample_size)
+        results[mode] = {'seconds': time.perf_counter() - started, 'model': kmeans, 'sse': sse}
+    
+    exact, fast = results['exact'], results['fast']
+    return {
+        'customers': len(rfm_df),
+        'exact_seconds': exact['seconds'],
+        'fast_seconds': fast['seconds'],
+        'speedup': exact['seconds'] / max(fast['seconds'], 1e-9),
+        'inertia_change': fast['model'].inertia_ / exact['model'].inertia_ - 1,
+        'adjusted_rand_index': adjusted_rand_score(exact['model'].labels_, fast['model'].labels_),
+        'elbow_sse': pd.DataFrame({'exact': exact['sse'], 'fast': fast['sse']})
+    }
+
+@instrumented('churn')
+def predict_churn(rfm_df, days_threshold=90, mode='default', report_path=None):
+    # Create churn label (1 if customer hasn't purchased in 'days_threshold' days)
+    rfm_df['Churn'] = (rfm_df['Recency'] > days_threshold).astype(int)
+    
+    # Prepare features and target
+    X = rfm_df[['Recency', 'Frequency', 'Monetary']]
+    y = rfm_df['Churn']
+    
+    if mode == 'tuned':
+        # Grow forests on all cores until OOB accuracy plateaus, cross-validated on shared folds
+        model, report = train_churn_model(X, y)
+        print("Training time vs. accuracy:")
+        print(report.to_string(index=False))
+        if report_path:
+            os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+            report.to_csv(report_path, index=False)
+    else:
+        # Split data
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+        
+        # Train model
+        model = RandomForestClassifier(random_state=42)
+        model.fit(X_train, y_train)
+        
+        # Make predictions
+        y_pred = model.predict(X_test)
+        
+        # Evaluate model
+        print(classification_report(y_test, y_pred))
+    
+    # Feature importance
+    feature_importance = pd.DataFrame({
+        'Feature': X.columns,
+        'Importance': model.feature_importances_
+    }).sort_values('Importance', ascending=False)
+    
+    return model, feature_importance
+
+@instrumented('analytics')
+def run_advanced_analytics(data_dir=PROCESSED_DIR, show_elbow=False, segmentation_mode='exact',
+                           model_dir=MODEL_DIR, churn_mode='default'):
+    """Segment customers, train the churn model and save the results and models."""
+    # Load processed data
+    sales_df, customers_df, products_df, rfm_df = load_processed_data(data_dir)
+    
+    # Perform customer segmentation
+    print("Performing customer segmentation...")
+    rfm_df, segment_analysis, scaler, kmeans = segment_customers(rfm_df, show_elbow=show_elbow,
+                                                                 mode=segmentation_mode)
+    print("\nSegment Analysis:")
+    print(segment_analysis)
+    
+    # Predict churn
+    print("\nTraining churn prediction model...")
+    model, feature_importance = predict_churn(rfm_df, mode=churn_mode,
+                                              report_path=os.path.join(model_dir, 'churn_training_report.csv'))
+    print("\nFeature Importance for Churn Prediction:")
+    print(feature_importance)
+    rfm_df['ChurnProbability'] = churn_probability(model, rfm_df[RFM_FEATURES])
+    
+    # Save the fitted models for batch scoring
+    version = save_models(scaler, kmeans, model, model_dir, n_customers=len(rfm_df))
+    print(f"\nSaved models as version {version}")
+    
+    # Save results
+    write_table(rfm_df, 'customer_segments', data_dir)
+    
+    # Refresh the sales fact table and rollup cube with each customer's segment
+    fact_df = build_sales_fact(sales_df, products_df, customers_df, rfm_df)
+    write_table(fact_df, 'sales_fact', data_dir)
+    write_colstore(fact_df, data_dir)
+    write_table(build_rollup(fact_df), 'sales_rollup', data_dir)
@@ -0,0 +1,179 @@
+"""Benchmark the pipeline over synthetic datasets of increasing size.
+
+For each scale a temporary workspace is filled with sample data from
+`data/generate_sample_data.py`, and every stage runs there in its own
+process, one after another: preprocessing (with RFM), analytics
+(segmentation and churn), charts, the HTML report and the Excel workbooks.
+Per-stage wall time, CPU time, peak RSS and throughput are taken from the
+instrumentation run log (see `sales_pipeline.instrument`). The results can
+be saved as a baseline and compared on later runs:
+
+    python -m sales_pipeline bench --scales 5000 1000000 --save-baseline
+    python -m sales_pipeline bench --scales 5000 1000000 --baseline bench/baseline.json
+"""
+from datetime import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from .instrument import ROOT_DIR, read_run_log
+
+DEFAULT_SCALES = [5_000]
+BASELINE_FILE = os.path.join('bench', 'baseline.json')
+REGRESSION_TOLERANCE = 0.2
+
+def _script(path):
+    return os.path.join(ROOT_DIR, path)
+
+# Stage name, command arguments after the interpreter, working directory in the workspace
+STAGES = [
+    ('preprocess', ['-m', 'sales_pipeline', 'preprocess'], '.'),
+    ('analytics', ['-m', 'sales_pipeline', 'analytics'], '.'),
+    ('charts', [_script('visualize_results.py')], '.'),
+    ('extended', [_script('extended_analysis.py')], '.'),
+    ('html_report', [_script('create_html_report.py')], '.'),
+    ('excel_pivots', [_script(os.path.join('excel', 'create_pivot_tables.py')), '--streaming'], 'excel'),
+    ('excel_analysis', [_script(os.path.join('excel', 'generate_excel_analysis.py')), '--streaming'], 'excel')
+]
+
+# Run log records reported per scale: the stages above plus these nested steps
+NESTED_STAGES = ['rfm', 'segmentation', 'churn']
+
+def _environment(workspace, run_id):
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': os.pathsep.join(filter(None, [ROOT_DIR, env.get('PYTHONPATH')])),
+        'SALES_RUN_LOG': os.path.join(workspace, 'run_log.jsonl'),
+        'SALES_RUN_ID': run_id,
+        'MPLBACKEND': 'Agg',
+        # Keep the HTML report from opening a browser
+        'BROWSER': 'true'
+    })
+    return env
+
+def generate_dataset(workspace, num_orders, seed=42):
+    """Generate sample data for `num_orders` orders into the workspace and time it."""
+    command = [sys.executable, _script(os.path.join('data', 'generate_sample_data.py')), '--vectorized',
+               '--orders', str(num_orders), '--customers', str(max(1000, num_orders // 5)),
+               '--seed', str(seed)]
+    started = time.perf_counter()
+    subprocess.run(command, cwd=workspace, check=True, capture_output=True, text=True)
+    return time.perf_counter() - started
+
+def run_scale(num_orders, keep=False, seed=42):
+    """Benchmark every stage on one dataset size; returns per-stage metrics."""
+    workspace = tempfile.mkdtemp(prefix=f'sales-bench-{num_orders}-')
+    run_id = f"bench-{num_orders}-{datetime.now():%Y%m%d-%H%M%S}"
+    env = _environment(workspace, run_id)
+    os.makedirs(os.path.join(workspace, 'excel'))
+    
+    try:
+        print(f"\n{num_orders:,} orders (workspace: {workspace})")
+        generate_seconds = generate_dataset(workspace, num_orders, seed)
+        print(f"- generate: {generate_seconds:.2f}s")
+        metrics = {'generate': {'status': 'ok', 'wall_seconds': generate_seconds,
+                                'orders_per_sec': num_orders / generate_seconds}}
+    
+        for name, args, cwd in STAGES:
+            result = subprocess.run([sys.executable] + args, cwd=os.path.join(workspace, cwd), env=env,
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                metrics[name] = {'status': 'failed', 'error': result.stderr[-2000:]}
+                print(f"- {name}: FAILED")
+                # Later stages read this stage's outputs
+                break
+    
+        # Collect the stage records the subprocesses wrote to the workspace's run log
+        reported = [stage for stage, _, _ in STAGES] + NESTED_STAGES
+        for record in read_run_log(env['SALES_RUN_LOG'], run_id):
+            if record['stage'] not in reported or record['stage'] in metrics:
+                continue
+            metrics[record['stage']] = {
+                'status': record['status'],
+                'wall_seconds': record['wall_seconds'],
+                'cpu_seconds': record['cpu_seconds'],
+                'peak_rss_mb': record['peak_rss_mb'],
+                'rows_in': record['rows_in'],
+                'rows_out': record['rows_out'],
+                'orders_per_sec': num_orders / record['wall_seconds'] if record['wall_seconds'] else None
+            }
+    
+        for stage in reported:
+            m = metrics.get(stage)
+            if m and m['status'] == 'ok':
+                print(f"- {stage}: {m['wall_seconds']:.2f}s, {m['orders_per_sec']:,.0f} orders/s, "
+                      f"peak RSS {m['peak_rss_mb']:.0f} MB")
+        return metrics
+    finally:
+        if not keep:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+def run_benchmark(scales=None, keep=False, seed=42):
+    """Benchmark every scale and return the results with machine details."""
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'cpus': os.cpu_count()},
+        'scales': {str(num_orders): run_scale(num_orders, keep, seed) for num_orders in scales or DEFAULT_SCALES}
+    }
+
+def compare_to_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Compare stage wall times with a baseline; returns one row per stage in both.
+    
+    A stage counts as a regression when it is more than `tolerance` slower
+    than the baseline, or when it failed. Peak RSS is reported alongside.
+    """
+    rows = []
+    for scale, stages in results['scales'].items():
+        for name, metrics in stages.items():
+            base = baseline.get('scales', {}).get(scale, {}).get(name)
+            if not base or base.get('status') != 'ok':
+                continue
+            if metrics.get('status') != 'ok':
+                rows.append({'scale': scale, 'stage': name, 'ratio': None, 'regression': True})
+                continue
+            ratio = metrics['wall_seconds'] / base['wall_seconds'] if base['wall_seconds'] else 1.0
+            rows.append({'scale': scale, 'stage': name, 'ratio': ratio, 'regression': ratio > 1 + tolerance,
+                         'peak_rss_mb': metrics.get('peak_rss_mb'), 'baseline_peak_rss_mb': base.get('peak_rss_mb')})
+    return rows
+
+def print_comparison(rows):
+    """Print the baseline comparison table."""
+    print("\nComparison with baseline (wall time, current / baseline):")
+    for row in rows:
+        if row['ratio'] is None:
+            print(f"- {int(row['scale']):,} orders, {row['stage']}: FAILED")
+            continue
+        verdict = 'SLOWER' if row['regression'] else 'ok'
+        line = f"- {int(row['scale']):,} orders, {row['stage']}: {row['ratio']:.2f}x {verdict}"
+        if row.get('peak_rss_mb') is not None and row.get('baseline_peak_rss_mb') is not None:
+            line += f", peak RSS {row['baseline_peak_rss_mb']:.0f} -> {row['peak_rss_mb']:.0f} MB"
+        print(line)
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+def bench(scales=None, output=os.path.join('bench', 'latest.json'), baseline=None, save_baseline=False,
+          tolerance=REGRESSION_TOLERANCE, keep=False):
+    """Run the benchmark, save it and compare it with `baseline`; returns True if nothing regressed."""
+    results = run_benchmark(scales, keep)
+    save_results(results, output)
+    print(f"\nResults saved to {output}")
+    
+    if save_baseline:
+        save_results(results, BASELINE_FILE)
+        print(f"Baseline saved to {BASELINE_FILE}")
+    if not baseline:
+        return True
+    
+    with open(baseline) as f:
+        rows = compare_to_baseline(results, json.load(f), tolerance)
+    print_comparison(rows)
+    return not any(row['regression'] for row in rows)
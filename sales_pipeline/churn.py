@@ -0,0 +1,91 @@
+"""Parallel, early-stopped churn model training.
+
+Random forests are grown in steps of trees with `warm_start` on all cores
+and stop once the out-of-bag accuracy stops improving. Candidate settings
+are cross-validated on one precomputed fold split, and the report of
+training time against accuracy is used to pick the cheapest model whose
+accuracy is within a tolerance of the best.
+"""
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold
+
+DEFAULT_CANDIDATES = [
+    {'max_depth': None, 'min_samples_leaf': 1},
+    {'max_depth': 16, 'min_samples_leaf': 1},
+    {'max_depth': 8, 'min_samples_leaf': 5},
+    {'max_depth': 4, 'min_samples_leaf': 20}
+]
+
+def make_folds(y, n_splits=5, random_state=42):
+    """Compute one stratified fold split to reuse across every candidate."""
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    return list(splitter.split(np.zeros(len(y)), y))
+
+def grow_forest(X, y, params=None, step=25, max_trees=500, tol=1e-3, patience=2, n_jobs=-1, random_state=42):
+    """Add trees `step` at a time until the OOB accuracy plateaus.
+    
+    Growth stops after `patience` steps without an improvement larger than
+    `tol`, or at `max_trees`. Returns the model and its OOB accuracy per
+    step.
+    """
+    model = RandomForestClassifier(warm_start=True, oob_score=True, n_jobs=n_jobs,
+                                   random_state=random_state, **(params or {}))
+    history = []
+    best = -np.inf
+    stale = 0
+    
+    for n_trees in range(step, max_trees + 1, step):
+        model.set_params(n_estimators=n_trees)
+        with warnings.catch_warnings():
+            # Early steps have too few trees for every sample to be out-of-bag
+            warnings.simplefilter('ignore', UserWarning)
+            model.fit(X, y)
+        history.append((n_trees, model.oob_score_))
+        
+        if model.oob_score_ > best + tol:
+            best = model.oob_score_
+            stale = 0
+        else:
+            stale += 1
+            if stale >= patience:
+                break
+    
+    return model, history
+
+def train_churn_model(X, y, candidates=None, folds=None, accuracy_tolerance=0.005, n_jobs=-1, **grow_kwargs):
+    """Cross-validate early-stopped forests and fit the cheapest acceptable one.
+    
+    Returns the final model (fitted on all rows) and a report with one row per
+    candidate: mean trees grown, mean fit seconds and mean validation
+    accuracy across the shared folds.
+    """
+    candidates = candidates or DEFAULT_CANDIDATES
+    folds = folds or make_folds(y)
+    X_values = np.asarray(X)
+    y_values = np.asarray(y)
+    rows = []
+    
+    for params in candidates:
+        trees, seconds, accuracy = [], [], []
+        for train_idx, test_idx in folds:
+            started = time.perf_counter()
+            model, _ = grow_forest(X_values[train_idx], y_values[train_idx], params, n_jobs=n_jobs, **grow_kwargs)
+            seconds.append(time.perf_counter() - started)
+            trees.append(model.n_estimators)
+            accuracy.append(model.score(X_values[test_idx], y_values[test_idx]))
+        rows.append(dict(params, trees=np.mean(trees), fit_seconds=np.mean(seconds), accuracy=np.mean(accuracy)))
+    
+    report = pd.DataFrame(rows).sort_values('fit_seconds', ignore_index=True)
+    acceptable = report[report['accuracy'] >= report['accuracy'].max() - accuracy_tolerance]
+    chosen = acceptable.iloc[0]
+    report['chosen'] = report.index == chosen.name
+    
+    params = {key: (None if pd.isna(chosen[key]) else int(chosen[key])) for key in candidates[0]}
+    model = RandomForestClassifier(n_estimators=int(round(chosen['trees'])), n_jobs=n_jobs,
+                                   random_state=42, **params).fit(X, y)
+    return model, report
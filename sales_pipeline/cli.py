@@ -0,0 +1,155 @@
+"""Command-line entry point that runs the pipeline stages in-process.
+
+    python -m sales_pipeline preprocess [--incremental]
+    python -m sales_pipeline analytics [--segmentation {exact,fast}] [--churn {default,tuned}]
+    python -m sales_pipeline compare-segmentation
+    python -m sales_pipeline score [--version V] [--batch-size N]
+    python -m sales_pipeline all [--incremental]
+    python -m sales_pipeline bench [--scales N ...] [--baseline PATH] [--save-baseline]
+    python -m sales_pipeline run [--workers N] [--force] [--only STAGE ...]
+    python -m sales_pipeline lookup (--customer ID | --product ID) [--limit N]
+"""
+import argparse
+import time
+
+from .preprocessing import RAW_DIR
+from .storage import PROCESSED_DIR
+
+def preprocess(args):
+    if args.incremental:
+        from .incremental import run_incremental
+        run_incremental(args.raw_dir, args.data_dir, args.model_dir)
+    else:
+        from .preprocessing import run_preprocessing
+        run_preprocessing(args.raw_dir, args.data_dir)
+
+def analytics(args):
+    from .analytics import run_advanced_analytics
+    run_advanced_analytics(args.data_dir, segmentation_mode=args.segmentation, model_dir=args.model_dir,
+                           churn_mode=args.churn)
+
+def segmentation_report(args):
+    from .analytics import compare_segmentation
+    from .storage import read_table
+    result = compare_segmentation(read_table('customer_rfm', args.data_dir), sample_size=args.sample_size)
+    print(f"{result['customers']:,} customers")
+    print(f"- Exact: {result['exact_seconds']:.2f}s")
+    print(f"- Fast:  {result['fast_seconds']:.2f}s ({result['speedup']:.1f}x faster)")
+    print(f"- Final inertia change: {result['inertia_change']:+.2%}")
+    print(f"- Adjusted Rand index vs exact: {result['adjusted_rand_index']:.3f}")
+    print("\nElbow SSE by k:")
+    print(result['elbow_sse'])
+
+def score(args):
+    from .models import run_scoring
+    run_scoring(args.data_dir, args.model_dir, args.version, args.batch_size)
+
+def run_all(args):
+    preprocess(args)
+    analytics(args)
+
+def run_dag(args):
+    from .dag import default_stages, run_pipeline
+    status = run_pipeline(default_stages(args.raw_dir, args.data_dir), workers=args.workers,
+                          force=args.force, only=args.only)
+    if any(value in ('failed', 'blocked') for value in status.values()):
+        raise SystemExit(1)
+
+def run_bench(args):
+    from .bench import bench
+    if not bench(args.scales, args.output, args.baseline, args.save_baseline, args.tolerance, args.keep):
+        raise SystemExit(1)
+
+def lookup(args):
+    from .lookup import customer_profile, product_orders
+    started = time.perf_counter()
+    if args.customer:
+        profile = customer_profile(args.customer, args.data_dir)
+        orders = profile['orders']
+    else:
+        orders = product_orders(args.product, args.data_dir)
+    elapsed = time.perf_counter() - started
+    
+    if orders.empty:
+        print("No orders found.")
+    else:
+        print(orders.head(args.limit).to_string(index=False))
+        if len(orders) > args.limit:
+            print(f"... {len(orders) - args.limit:,} more")
+    if args.customer:
+        rfm = profile['rfm']
+        print("\nRFM:" if rfm is not None else "\nNo RFM row.")
+        if rfm is not None:
+            print(rfm.to_string())
+        print(f"Segment: {profile['segment'] if profile['segment'] is not None else 'not assigned'}")
+    print(f"\n{len(orders):,} order lines, looked up in {elapsed * 1000:.1f} ms")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='sales_pipeline', description='Run the sales dashboard pipeline.')
+    parser.add_argument('--raw-dir', default=RAW_DIR)
+    parser.add_argument('--data-dir', default=PROCESSED_DIR)
+    parser.add_argument('--model-dir', default='models')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    preprocess_parser = commands.add_parser('preprocess', help='Clean raw data and compute RFM')
+    preprocess_parser.add_argument('--incremental', action='store_true',
+                                   help='Only process orders that arrived since the last run')
+    preprocess_parser.set_defaults(func=preprocess)
+    
+    analytics_parser = commands.add_parser('analytics', help='Segment customers and train the churn model')
+    analytics_parser.add_argument('--segmentation', choices=['exact', 'fast'], default='exact',
+                                  help='fast: sampled, warm-started elbow search')
+    analytics_parser.add_argument('--churn', choices=['default', 'tuned'], default='default',
+                                  help='tuned: parallel, early-stopped, cross-validated forest')
+    analytics_parser.set_defaults(func=analytics)
+    
+    compare_parser = commands.add_parser('compare-segmentation',
+                                         help='Compare timing and quality of the segmentation modes')
+    compare_parser.add_argument('--sample-size', type=int, default=100_000)
+    compare_parser.set_defaults(func=segmentation_report)
+    
+    score_parser = commands.add_parser('score', help='Score new or changed customers with saved models')
+    score_parser.add_argument('--version', default=None, help='Model version to use (default: latest)')
+    score_parser.add_argument('--batch-size', type=int, default=100_000)
+    score_parser.set_defaults(func=score)
+    
+    all_parser = commands.add_parser('all', help='Run preprocessing followed by analytics')
+    all_parser.add_argument('--incremental', action='store_true',
+                            help='Only preprocess orders that arrived since the last run')
+    all_parser.add_argument('--segmentation', choices=['exact', 'fast'], default='exact')
+    all_parser.add_argument('--churn', choices=['default', 'tuned'], default='default')
+    all_parser.set_defaults(func=run_all)
+    
+    run_parser = commands.add_parser('run', help='Run every stage through the cached DAG runner')
+    run_parser.add_argument('--workers', type=int, default=None, help='Maximum stages run at once')
+    run_parser.add_argument('--force', action='store_true', help='Rerun stages even when up to date')
+    run_parser.add_argument('--only', nargs='+', metavar='STAGE', help='Run only these stages')
+    run_parser.set_defaults(func=run_dag)
+    
+    bench_parser = commands.add_parser('bench', help='Benchmark every stage on synthetic datasets')
+    bench_parser.add_argument('--scales', type=int, nargs='+', default=[5_000], metavar='ORDERS',
+                              help='Dataset sizes in orders, e.g. 5000 1000000 10000000 50000000')
+    bench_parser.add_argument('--output', default='bench/latest.json')
+    bench_parser.add_argument('--baseline', help='Compare against this saved benchmark')
+    bench_parser.add_argument('--save-baseline', action='store_true',
+                              help='Also save the results as bench/baseline.json')
+    bench_parser.add_argument('--tolerance', type=float, default=0.2,
+                              help='Slowdown allowed before a stage counts as a regression')
+    bench_parser.add_argument('--keep', action='store_true', help='Keep the temporary workspaces')
+    bench_parser.set_defaults(func=run_bench)
+    
+    lookup_parser = commands.add_parser('lookup', help="Show one customer's or product's orders")
+    key = lookup_parser.add_mutually_exclusive_group(required=True)
+    key.add_argument('--customer', metavar='ID', help='Customer ID; also shows its RFM row and segment')
+    key.add_argument('--product', metavar='ID', help='Product ID')
+    lookup_parser.add_argument('--limit', type=int, default=20, help='Order lines to print')
+    lookup_parser.set_defaults(func=lookup)
+    
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
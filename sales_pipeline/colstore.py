@@ -0,0 +1,355 @@
+"""Memory-mapped column store for the sales fact table.
+
+Next to `sales_fact` the pipeline writes `sales_fact.cols/`: one raw binary
+file per column plus `meta.json` with the row count and each column's
+encoding. Numeric and date columns are stored as fixed-width arrays, and
+nullable integers as values plus a mask (`<column>.mask.bin`). Categorical
+columns, the repeated IDs and labels of the compact schema, are stored as
+integer codes (`<column>.bin`) with a dictionary of their distinct values
+(`<column>.dict.json`). Each dictionary is also stored as sorted
+fixed-width bytes (`<column>.keys.bin`), which can be searched and decoded
+through a memory map without parsing the JSON. Other string columns, such
+as the near-unique OrderID, are stored in Arrow's string layout: the UTF-8
+bytes of every value (`<column>.bin`), where each value starts
+(`<column>.starts.bin`) and a null mask, so they map without a dictionary.
+
+CustomerID and ProductID are indexed for point lookups: `<column>.rows.bin`
+holds the row positions grouped by key and `<column>.offsets.bin` where
+each key's group starts, so `index_rows` finds a key's rows with a binary
+search and two slices, and `take_colstore` reads just those rows. The
+indexes are rebuilt whenever the store is written or appended to.
+
+`read_colstore` maps the files with `np.memmap` and wraps them in a data
+frame without copying, so report processes started side by side share one
+copy of the data in the page cache. String columns become Arrow-backed
+strings over the mapped bytes and are only decoded when used, so opening
+the table costs time in proportion to the size of the categorical
+dictionaries rather than the number of rows. Pandas versions that cannot
+wrap Arrow large strings get them decoded to plain object strings instead.
+The mapped columns are read-only.
+
+Preprocessing and analytics rewrite the store with the fact table, and
+incremental runs append to it. Set SALES_COLSTORE=0 to neither write nor
+read it.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from .fact import key_positions
+from .instrument import record_rows_in
+from .schema import apply_schema
+from .storage import HAS_PARQUET, PROCESSED_DIR
+
+# String columns are mapped through pyarrow, which the Parquet backend requires too
+COLSTORE = os.environ.get('SALES_COLSTORE', '1') == '1' and HAS_PARQUET
+STORE_NAME = 'sales_fact.cols'
+META_FILE = 'meta.json'
+
+_DEFAULT_STRING_DTYPE = pd.Series(dtype='str').dtype
+
+# Columns indexed for point lookups
+INDEX_COLUMNS = ['CustomerID', 'ProductID']
+
+def store_path(data_dir=PROCESSED_DIR):
+    return os.path.join(data_dir, STORE_NAME)
+
+def has_colstore(data_dir=PROCESSED_DIR):
+    """Whether a column store exists for `data_dir` and reading it is enabled."""
+    return COLSTORE and os.path.exists(os.path.join(store_path(data_dir), META_FILE))
+
+def _code_dtype(size):
+    # The code width pandas itself picks for this many categories, so codes map without a cast
+    for dtype in (np.int8, np.int16, np.int32):
+        if size < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+def _file(path, column, suffix='bin'):
+    return os.path.join(path, f'{column}.{suffix}')
+
+def _read_meta(path):
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+def _write_meta(path, meta):
+    # Written last and replaced atomically; rows past meta['rows'] are never read
+    with open(os.path.join(path, META_FILE + '.tmp'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(os.path.join(path, META_FILE + '.tmp'), os.path.join(path, META_FILE))
+
+def _write_dictionary(path, column, dictionary, info):
+    with open(_file(path, column, 'dict.json'), 'w') as f:
+        json.dump(list(dictionary), f)
+    # UTF-8 bytes sort like the strings, so the keys stay in dictionary order
+    keys = np.array([str(value).encode('utf-8') for value in dictionary], dtype=bytes)
+    keys.tofile(_file(path, column, 'keys.bin'))
+    info['keys'] = keys.dtype.str
+
+def _read_dictionary(path, column):
+    with open(_file(path, column, 'dict.json')) as f:
+        return pd.Index(json.load(f))
+
+def _append_column(path, column, values, info):
+    """Append one column's values in the column's stored encoding."""
+    kind = info['kind']
+    if kind == 'dictionary':
+        dictionary = _read_dictionary(path, column)
+        codes = key_positions(dictionary, values)
+        new = pd.Index(pd.unique(values[(codes == -1) & values.notna().to_numpy()].astype(object)))
+        if len(new):
+            merged = dictionary.append(new).sort_values()
+            dtype = _code_dtype(len(merged)).str
+            if dtype != info['dtype'] or (len(dictionary) and new.min() < dictionary[-1]):
+                # Recode the stored codes so the dictionary stays sorted and the codes fit
+                stored = np.fromfile(_file(path, column), dtype=info['dtype'])
+                recode = merged.get_indexer(dictionary)
+                np.where(stored >= 0, recode[stored], -1).astype(dtype).tofile(_file(path, column))
+                info['dtype'] = dtype
+            dictionary = merged
+            _write_dictionary(path, column, dictionary, info)
+            codes = key_positions(dictionary, values)
+        with open(_file(path, column), 'ab') as f:
+            codes.astype(info['dtype']).tofile(f)
+    elif kind == 'string':
+        import pyarrow as pa
+        strings = pa.array(values, type=pa.large_string(), from_pandas=True)
+        if isinstance(strings, pa.ChunkedArray):
+            # Arrow-backed pandas strings come as chunks
+            strings = strings.combine_chunks()
+        _, starts, chars = strings.buffers()
+        starts = np.frombuffer(starts, dtype=np.int64)[strings.offset:strings.offset + len(strings) + 1]
+        # Value starts are stored relative to the whole column, so shift them past the stored bytes
+        stored = os.path.getsize(_file(path, column))
+        with open(_file(path, column), 'ab') as f:
+            if chars is not None:
+                np.frombuffer(chars, dtype=np.uint8)[starts[0]:starts[-1]].tofile(f)
+        with open(_file(path, column, 'starts.bin'), 'ab') as f:
+            (starts[1:] - starts[0] + stored).tofile(f)
+        with open(_file(path, column, 'mask.bin'), 'ab') as f:
+            strings.is_null().to_numpy(zero_copy_only=False).tofile(f)
+    elif kind == 'nullable':
+        with open(_file(path, column), 'ab') as f:
+            values.to_numpy(dtype=info['dtype'], na_value=0).tofile(f)
+        with open(_file(path, column, 'mask.bin'), 'ab') as f:
+            values.isna().to_numpy().tofile(f)
+    else:
+        with open(_file(path, column), 'ab') as f:
+            np.ascontiguousarray(values.to_numpy(dtype=info['dtype'])).tofile(f)
+
+def _column_info(values):
+    """How a column is encoded in the store."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return {'kind': 'dictionary', 'dtype': _code_dtype(0).str}
+    if pd.api.types.is_string_dtype(values):
+        # A dictionary of near-unique values would be as long as the column itself
+        return {'kind': 'string', 'dtype': np.dtype(np.uint8).str}
+    if pd.api.types.is_extension_array_dtype(values) and pd.api.types.is_integer_dtype(values):
+        return {'kind': 'nullable', 'dtype': values.dtype.numpy_dtype.str}
+    return {'kind': 'numeric', 'dtype': values.dtype.str}
+
+def _map(path, dtype, rows):
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(rows,))
+
+def _map_keys(path, column, info):
+    dtype = np.dtype(info['keys'])
+    file = _file(path, column, 'keys.bin')
+    return _map(file, dtype, os.path.getsize(file) // dtype.itemsize)
+
+def _map_strings(path, column, rows):
+    """A string column as an Arrow array over the mapped bytes, without copying them."""
+    import pyarrow as pa
+    starts = _map(_file(path, column, 'starts.bin'), np.int64, rows + 1)
+    chars = _map(_file(path, column), np.uint8, int(starts[-1]))
+    mask = _map(_file(path, column, 'mask.bin'), bool, rows)
+    validity = pa.array(~mask).buffers()[1] if mask.any() else None
+    return pa.Array.from_buffers(pa.large_string(), rows, [validity, pa.py_buffer(starts), pa.py_buffer(chars)])
+
+def _wrap_arrow_strings(array):
+    # Same string dtype as tables read from Parquet when pandas defaults to Arrow strings
+    if isinstance(_DEFAULT_STRING_DTYPE, pd.StringDtype):
+        return pd.array(array, dtype=_DEFAULT_STRING_DTYPE)
+    import pyarrow as pa
+    return pd.arrays.ArrowStringArray(pa.chunked_array([array]))
+
+def _as_strings(array):
+    """A mapped string column as pandas strings; decoded to objects if pandas cannot wrap large strings."""
+    try:
+        return _wrap_arrow_strings(array)
+    except (AttributeError, NotImplementedError, TypeError, ValueError):
+        strings = pd.Series(array.to_numpy(zero_copy_only=False), dtype=object)
+        # Missing values as NaN, like object string columns read from CSV
+        return strings.where(strings.notna(), np.nan)
+
+def _truncate(path, column, info, rows):
+    """Drop anything an interrupted append left past the committed rows."""
+    if info['kind'] == 'string':
+        starts = np.fromfile(_file(path, column, 'starts.bin'), dtype=np.int64, count=rows + 1)
+        sizes = {'bin': int(starts[rows]), 'starts.bin': (rows + 1) * 8, 'mask.bin': rows}
+    else:
+        sizes = {'bin': rows * np.dtype(info['dtype']).itemsize, 'mask.bin': rows}
+    for suffix, size in sizes.items():
+        if os.path.exists(_file(path, column, suffix)):
+            os.truncate(_file(path, column, suffix), size)
+
+def _write_index(path, column, info, rows):
+    """Write the row positions of a dictionary column grouped by code, and each code's offset."""
+    codes = _map(_file(path, column), info['dtype'], rows)
+    size = len(_map_keys(path, column, info))
+    counts = np.bincount(codes[codes >= 0].astype(np.intp), minlength=size)
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    
+    # A stable sort keeps each key's rows in row order; missing keys (-1) sort first and are left out
+    positions = np.argsort(codes, kind='stable')[rows - offsets[-1]:]
+    dtype = np.dtype(np.int32 if rows <= np.iinfo(np.int32).max else np.int64)
+    positions.astype(dtype).tofile(_file(path, column, 'rows.bin'))
+    offsets.tofile(_file(path, column, 'offsets.bin'))
+    return {'dtype': dtype.str, 'entries': int(offsets[-1]), 'keys': size}
+
+def _write_indexes(path, meta, rows):
+    return {
+        column: _write_index(path, column, meta['columns'][column], rows)
+        for column in INDEX_COLUMNS
+        if meta['columns'].get(column, {}).get('kind') == 'dictionary'
+    }
+
+def write_colstore(df, data_dir=PROCESSED_DIR):
+    """Write `df` as the column store of `data_dir`, replacing any previous one."""
+    if not COLSTORE:
+        return
+    # Always the compact schema, so the repeated IDs are dictionary-encoded and indexed
+    df = apply_schema(df, 'sales_fact', compact=True)
+    path = store_path(data_dir)
+    staging = path + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    
+    meta = {'rows': 0, 'columns': {}}
+    for column in df.columns:
+        info = _column_info(df[column])
+        if info['kind'] == 'dictionary':
+            _write_dictionary(staging, column, [], info)
+        open(_file(staging, column), 'wb').close()
+        if info['kind'] in ('nullable', 'string'):
+            open(_file(staging, column, 'mask.bin'), 'wb').close()
+        if info['kind'] == 'string':
+            np.zeros(1, dtype=np.int64).tofile(_file(staging, column, 'starts.bin'))
+        _append_column(staging, column, df[column], info)
+        meta['columns'][column] = info
+    meta['rows'] = len(df)
+    meta['indexes'] = _write_indexes(staging, meta, len(df))
+    _write_meta(staging, meta)
+    
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(staging, path)
+
+def append_colstore(df, data_dir=PROCESSED_DIR):
+    """Append rows to the column store; returns False when there is no store to append to."""
+    if not COLSTORE:
+        return False
+    path = store_path(data_dir)
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        return False
+    meta = _read_meta(path)
+    if list(df.columns) != list(meta['columns']):
+        return False
+    df = apply_schema(df, 'sales_fact', compact=True)
+    
+    rows = meta['rows']
+    for column, info in meta['columns'].items():
+        _truncate(path, column, info, rows)
+        _append_column(path, column, df[column], info)
+    meta['rows'] = rows + len(df)
+    # Appended rows land in every key's group, so the indexes are rebuilt rather than appended to
+    meta['indexes'] = _write_indexes(path, meta, meta['rows'])
+    _write_meta(path, meta)
+    return True
+
+def read_colstore(data_dir=PROCESSED_DIR, columns=None):
+    """Open the column store as a data frame backed by read-only memory maps."""
+    path = store_path(data_dir)
+    meta = _read_meta(path)
+    rows = meta['rows']
+    
+    data = {}
+    for column in columns or meta['columns']:
+        info = meta['columns'][column]
+        if info['kind'] == 'string':
+            data[column] = _as_strings(_map_strings(path, column, rows))
+            continue
+        values = _map(_file(path, column), info['dtype'], rows)
+        if info['kind'] == 'dictionary':
+            dtype = pd.CategoricalDtype(_read_dictionary(path, column))
+            data[column] = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+        elif info['kind'] == 'nullable':
+            data[column] = pd.arrays.IntegerArray(values, _map(_file(path, column, 'mask.bin'), bool, rows))
+        else:
+            data[column] = values
+    record_rows_in(rows)
+    return pd.DataFrame(data, copy=False)
+
+def _index_complete(path, column, index):
+    # An interrupted write can leave index files that do not match the committed meta
+    expected = {'rows.bin': index['entries'] * np.dtype(index['dtype']).itemsize,
+                'offsets.bin': (index['keys'] + 1) * 8}
+    return all(os.path.exists(_file(path, column, suffix)) and os.path.getsize(_file(path, column, suffix)) == size
+               for suffix, size in expected.items())
+
+def index_rows(column, value, data_dir=PROCESSED_DIR):
+    """Row positions holding `value` in an indexed column, in row order.
+    
+    Returns None when the store has no usable index for the column.
+    """
+    path = store_path(data_dir)
+    meta = _read_meta(path)
+    index = meta.get('indexes', {}).get(column)
+    if index is None or not _index_complete(path, column, index):
+        return None
+    
+    keys = _map_keys(path, column, meta['columns'][column])
+    key = str(value).encode('utf-8')
+    code = int(np.searchsorted(keys, key))
+    if code == len(keys) or keys[code] != key:
+        return np.empty(0, dtype=np.int64)
+    offsets = _map(_file(path, column, 'offsets.bin'), np.int64, index['keys'] + 1)
+    positions = _map(_file(path, column, 'rows.bin'), index['dtype'], index['entries'])
+    return np.array(positions[offsets[code]:offsets[code + 1]])
+
+def take_colstore(positions, data_dir=PROCESSED_DIR, columns=None):
+    """Read only the rows at `positions`, decoding strings through the keys files.
+    
+    Touches the pages holding those rows rather than mapping whole
+    dictionaries, so it suits lookups of a few rows; string columns come
+    back as plain strings rather than categoricals.
+    """
+    path = store_path(data_dir)
+    meta = _read_meta(path)
+    rows = meta['rows']
+    
+    data = {}
+    for column in columns or meta['columns']:
+        info = meta['columns'][column]
+        if info['kind'] == 'string':
+            import pyarrow as pa
+            data[column] = _as_strings(_map_strings(path, column, rows).take(pa.array(positions, type=pa.int64())))
+            continue
+        values = _map(_file(path, column), info['dtype'], rows)[positions]
+        if info['kind'] == 'dictionary':
+            # Decode each distinct code once; most columns repeat a few values
+            codes, inverse = np.unique(values, return_inverse=True)
+            keys = _map_keys(path, column, info)
+            decoded = np.char.decode(keys[np.maximum(codes, 0)], 'utf-8') if len(keys) else np.full(len(codes), None)
+            data[column] = pd.Series(decoded[inverse], dtype='str').where(values >= 0)
+        elif info['kind'] == 'nullable':
+            mask = _map(_file(path, column, 'mask.bin'), bool, rows)[positions]
+            data[column] = pd.arrays.IntegerArray(values, mask)
+        else:
+            data[column] = values
+    record_rows_in(len(positions))
+    return pd.DataFrame(data)
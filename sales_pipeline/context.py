@@ -0,0 +1,107 @@
+"""Load-once dataset context shared by the report functions.
+
+Each processed table is read at most once per process, on first access, and
+derived frames are cached alongside them. Sales are read from the
+precomputed `sales_fact` table, which already carries the product columns
+and is memory-mapped from its column store when one exists, and trends
+from the `sales_rollup` cube. With `stream_aggregates` (or
+SALES_STREAM_AGGREGATES=1) reports that only need totals read them from
+chunked, out-of-core aggregates instead of loading every sales row.
+
+A context created with a `date_range` (or SALES_LAST_DAYS=N for the last N
+days) only sees sales inside it: the month partitions of the fact table
+that overlap the range are read, and the rollup cube is rebuilt from them.
+"""
+from functools import cached_property
+import os
+
+import pandas as pd
+
+from .colstore import has_colstore, read_colstore
+from .fact import build_sales_fact
+from .rollup import build_rollup
+from .storage import PROCESSED_DIR, read_table, recent_range
+from .streaming import aggregate_sales
+
+STREAM_AGGREGATES = os.environ.get('SALES_STREAM_AGGREGATES', '0') == '1'
+LAST_DAYS = int(os.environ.get('SALES_LAST_DAYS', '0'))
+
+class DatasetContext:
+    """Lazily loaded processed tables plus cached derived frames."""
+    
+    def __init__(self, data_dir=PROCESSED_DIR, results_dir='results', stream_aggregates=None, date_range=None):
+        self.data_dir = data_dir
+        self.results_dir = results_dir
+        self.stream_aggregates = STREAM_AGGREGATES if stream_aggregates is None else stream_aggregates
+        if date_range is None and LAST_DAYS:
+            date_range = recent_range(LAST_DAYS, data_dir=data_dir)
+        self.date_range = date_range
+    
+    @cached_property
+    def fact(self):
+        try:
+            # Map the column store when present instead of parsing a private copy
+            if has_colstore(self.data_dir) and self.date_range is None:
+                fact_df = read_colstore(self.data_dir)
+            else:
+                fact_df = read_table('sales_fact', self.data_dir, date_range=self.date_range)
+        except FileNotFoundError:
+            # Processed data predates the fact table; join it here instead
+            fact_df = build_sales_fact(read_table('processed_sales', self.data_dir, date_range=self.date_range),
+                                       self.products, self.customers)
+        if not pd.api.types.is_datetime64_any_dtype(fact_df['OrderDate']):
+            fact_df['OrderDate'] = pd.to_datetime(fact_df['OrderDate'])
+        return fact_df
+    
+    @property
+    def sales(self):
+        # The fact table keeps every sales row, so it doubles as the sales table
+        return self.fact
+    
+    @cached_property
+    def aggregates(self):
+        # Chunked pass over the sales history; memory is bounded by the number of groups
+        return aggregate_sales(self.data_dir, date_range=self.date_range)
+    
+    @cached_property
+    def rollup(self):
+        if self.date_range is not None:
+            # The stored cube covers the whole history; the range's fact rows are few
+            return build_rollup(self.fact)
+        try:
+            rollup_df = read_table('sales_rollup', self.data_dir)
+        except FileNotFoundError:
+            # Processed data predates the rollup cube; build it from the fact table
+            rollup_df = build_rollup(self.fact)
+        rollup_df['Period'] = pd.to_datetime(rollup_df['Period'])
+        return rollup_df
+    
+    @cached_property
+    def products(self):
+        return read_table('processed_products', self.data_dir)
+    
+    @cached_property
+    def customers(self):
+        return read_table('processed_customers', self.data_dir)
+    
+    @cached_property
+    def rfm(self):
+        return read_table('customer_rfm', self.data_dir)
+    
+    @cached_property
+    def segments(self):
+        return read_table('customer_segments', self.data_dir)
+    
+    @cached_property
+    def marketing_segments(self):
+        # Written by extended_analysis.create_marketing_segmentation, which also
+        # assigns this attribute directly when it runs in the same process
+        return pd.read_csv(os.path.join(self.results_dir, 'extended', 'customer_segments_marketing.csv'))
+
+_contexts = {}
+
+def get_context(data_dir=PROCESSED_DIR):
+    """Return the process-wide context for `data_dir`, creating it on first use."""
+    if data_dir not in _contexts:
+        _contexts[data_dir] = DatasetContext(data_dir)
+    return _contexts[data_dir]
@@ -0,0 +1,224 @@
+"""DAG runner for the pipeline scripts with content-hash caching.
+
+Each stage declares the command that runs it plus the files it reads and
+writes. A stage depends on whichever stages produce its inputs; when two
+stages write the same file, readers depend on the later one. Before
+running, the runner fingerprints the stage's command, parameters and the
+contents of its inputs; when the fingerprint matches the last successful
+run and every output still exists, the stage is skipped. A stage that
+rewrites some of its inputs is fingerprinted again after it runs. Stages whose
+dependencies are done run concurrently.
+
+    python -m sales_pipeline run [--workers N] [--force] [--only STAGE ...]
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+from . import colstore, storage
+from .instrument import RUN_ID
+from .preprocessing import RAW_DIR
+from .storage import PROCESSED_DIR
+
+CACHE_FILE = '.pipeline_cache.json'
+
+@dataclass
+class Stage:
+    name: str
+    command: list
+    inputs: list
+    outputs: list
+    cwd: str = '.'
+    params: dict = field(default_factory=dict)
+
+def default_stages(raw_dir=RAW_DIR, data_dir=PROCESSED_DIR):
+    """The pipeline from preprocessing through the HTML report and Excel workbooks."""
+    def table(name):
+        return storage.table_path(name, data_dir)
+    
+    python = sys.executable
+    params = {'SALES_STORAGE_FORMAT': storage.DEFAULT_FORMAT, 'SALES_COLSTORE': int(colstore.COLSTORE),
+              'SALES_PARTITION_SALES': int(storage.PARTITION_SALES)}
+    # The fact table's column store, written next to it when enabled
+    fact_store = [colstore.store_path(data_dir)] if colstore.COLSTORE else []
+    # Preprocessing writes the fact table, rollup cube and column store, and
+    # analytics rewrites them with each customer's segment
+    fact_tables = [table('sales_fact'), table('sales_rollup')] + fact_store
+    raw_inputs = [os.path.join(raw_dir, name) for name in ('sales_data.csv', 'customers.csv', 'products.csv', 'sales_shards')]
+    
+    return [
+        Stage('preprocess', [python, '-m', 'sales_pipeline', 'preprocess'],
+              inputs=raw_inputs,
+              outputs=[table('processed_sales'), table('processed_customers'),
+                       table('processed_products'), table('customer_rfm')] + fact_tables,
+              params=params),
+        Stage('analytics', [python, '-m', 'sales_pipeline', 'analytics'],
+              inputs=[table('processed_sales'), table('processed_customers'),
+                      table('processed_products'), table('customer_rfm')] + fact_tables,
+              outputs=[table('customer_segments')] + fact_tables,
+              params=params),
+        Stage('charts', [python, 'visualize_results.py'],
+              inputs=[table('sales_fact'), table('sales_rollup'), table('processed_products'), table('customer_segments')],
+              outputs=['results/sales_trend.png', 'results/category_sales.png',
+                       'results/customer_segments.png', 'results/rfm_analysis.png',
+                       'results/region_sales.png', 'results/churn_analysis.png',
+                       'results/analysis_summary.txt'],
+              params=params),
+        Stage('extended', [python, 'extended_analysis.py'],
+              inputs=[table('sales_fact'), table('sales_rollup'), table('processed_products'), table('customer_segments')],
+              outputs=['results/extended/correlation_heatmap.png', 'results/extended/product_performance.html',
+                       'results/extended/customer_ltv.png', 'results/extended/sales_forecast.png',
+                       'results/extended/marketing_segments.png',
+                       'results/extended/customer_segments_marketing.csv',
+                       'results/extended/extended_analysis_summary.txt'],
+              params=params),
+        Stage('html_report', [python, 'create_html_report.py'],
+              inputs=[table('sales_fact'), table('sales_rollup'), table('processed_products'),
+                      table('customer_segments'), 'results/extended/customer_segments_marketing.csv',
+                      'results/extended/correlation_heatmap.png', 'results/extended/customer_ltv.png'],
+              outputs=['results/html/report.html'],
+              params=params),
+        Stage('excel_pivots', [python, 'create_pivot_tables.py'],
+              inputs=[table('processed_sales'), table('processed_customers'), table('processed_products')] + fact_store,
+              outputs=['excel/pivot_tables/retail_pivot_tables.xlsx'],
+              cwd='excel', params=params),
+        Stage('excel_analysis', [python, 'generate_excel_analysis.py'],
+              inputs=[table('sales_fact'), table('processed_customers'),
+                      table('processed_products'), table('customer_segments')],
+              outputs=['excel/analysis/retail_analysis.xlsx'],
+              cwd='excel', params=params),
+    ]
+
+def _file_digest(path, digests):
+    """Content hash of a file, reusing `digests` while size and mtime are unchanged."""
+    stat = os.stat(path)
+    cached = digests.get(path)
+    if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+        return cached['sha256']
+    
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    digests[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha.hexdigest()}
+    return digests[path]['sha256']
+
+def _path_digest(path, digests):
+    if os.path.isdir(path):
+        parts = []
+        for root, _, files in sorted(os.walk(path)):
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                parts.append(f'{os.path.relpath(file_path, path)}:{_file_digest(file_path, digests)}')
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+    if os.path.exists(path):
+        return _file_digest(path, digests)
+    return 'missing'
+
+def fingerprint(stage, digests):
+    """Hash of everything that determines a stage's outputs."""
+    payload = {
+        'command': [os.path.basename(part) if part == sys.executable else part for part in stage.command],
+        'cwd': stage.cwd,
+        'params': stage.params,
+        'inputs': {path: _path_digest(path, digests) for path in stage.inputs}
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def _dependencies(stages):
+    """Map each stage to the stages that produce its inputs."""
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            producers[os.path.normpath(output)] = stage.name
+    return {
+        stage.name: {producers[p] for p in map(os.path.normpath, stage.inputs)
+                     if p in producers and producers[p] != stage.name}
+        for stage in stages
+    }
+
+def _rewrites_inputs(stage):
+    return bool(set(map(os.path.normpath, stage.inputs)) & set(map(os.path.normpath, stage.outputs)))
+
+def _load_cache(path):
+    if not os.path.exists(path):
+        return {'stages': {}, 'digests': {}}
+    with open(path) as f:
+        return json.load(f)
+
+def _run_stage(stage):
+    started = time.perf_counter()
+    env = dict(os.environ, **{key: str(value) for key, value in stage.params.items()})
+    # Stages log their instrumentation records under the pipeline's run
+    env['SALES_RUN_ID'] = RUN_ID
+    result = subprocess.run(stage.command, cwd=stage.cwd, env=env, capture_output=True, text=True)
+    return result, time.perf_counter() - started
+
+def run_pipeline(stages=None, workers=None, force=False, only=None, cache_path=CACHE_FILE):
+    """Run the stages in dependency order, skipping the ones that are up to date.
+    
+    `only` limits the run to the named stages (their dependencies are not
+    pulled in). Returns a dict of stage name -> status.
+    """
+    stages = stages or default_stages()
+    if only:
+        stages = [stage for stage in stages if stage.name in only]
+    by_name = {stage.name: stage for stage in stages}
+    deps = _dependencies(stages)
+    cache = _load_cache(cache_path)
+    status = {}
+    
+    def ready(name):
+        return name not in status and all(status.get(dep) in ('ran', 'cached') for dep in deps[name])
+    
+    def blocked(name):
+        return name not in status and any(status.get(dep) in ('failed', 'blocked') for dep in deps[name])
+    
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        running = {}
+        fingerprints = {}
+        while len(status) < len(stages):
+            for name, stage in by_name.items():
+                if blocked(name):
+                    status[name] = 'blocked'
+                    print(f"[{name}] skipped: a dependency failed")
+                elif ready(name) and name not in running.values():
+                    fingerprints[name] = fingerprint(stage, cache['digests'])
+                    if (not force and cache['stages'].get(name) == fingerprints[name]
+                            and all(os.path.exists(output) for output in stage.outputs)):
+                        status[name] = 'cached'
+                        print(f"[{name}] up to date")
+                        continue
+                    print(f"[{name}] running")
+                    running[executor.submit(_run_stage, stage)] = name
+            
+            if not running:
+                if len(status) < len(stages):
+                    raise ValueError(f"Stages with unsatisfiable dependencies: {sorted(set(by_name) - set(status))}")
+                break
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                result, seconds = future.result()
+                if result.returncode == 0:
+                    status[name] = 'ran'
+                    if _rewrites_inputs(by_name[name]):
+                        # Record the inputs the stage left behind, or the next run would redo it
+                        fingerprints[name] = fingerprint(by_name[name], cache['digests'])
+                    cache['stages'][name] = fingerprints[name]
+                    print(f"[{name}] finished in {seconds:.1f}s")
+                else:
+                    status[name] = 'failed'
+                    cache['stages'].pop(name, None)
+                    print(f"[{name}] failed after {seconds:.1f}s:\n{result.stderr}")
+            
+            with open(cache_path, 'w') as f:
+                json.dump(cache, f, indent=2)
+    
+    return status
@@ -0,0 +1,52 @@
+"""Row-streaming helpers for writing the Excel workbooks.
+
+Sheets are filled strictly top to bottom with `append`, so the same code
+writes either a regular in-memory workbook or a streaming one whose
+write-only worksheets flush rows to disk as they are appended. Data frames
+are written in bulk from their column arrays rather than cell by cell, and
+header styling uses cells created up front, which both modes accept.
+"""
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+
+HEADER_FONT = Font(bold=True)
+HEADER_FILL = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
+TITLE_FONT = Font(bold=True, size=14)
+
+def create_workbook(streaming=False):
+    """Return an empty workbook; streaming workbooks use write-only worksheets."""
+    wb = Workbook(write_only=streaming)
+    if not streaming:
+        # Sheets are created explicitly, so drop the default one
+        wb.remove(wb.active)
+    return wb
+
+def styled_cell(ws, value, font=None, fill=None):
+    """Create a cell for `ws` carrying its own style, ready to append."""
+    cell = WriteOnlyCell(ws, value=value)
+    if font:
+        cell.font = font
+    if fill:
+        cell.fill = fill
+    return cell
+
+def append_header(ws, values, font=HEADER_FONT, fill=HEADER_FILL):
+    """Append one row of styled header cells."""
+    ws.append([styled_cell(ws, value, font, fill) for value in values])
+
+def _column_values(series):
+    """Convert a column to Python values in one pass, with missing values as empty cells."""
+    values = series.tolist()
+    if series.hasnans:
+        values = [None if missing else value for value, missing in zip(values, series.isna().tolist())]
+    return values
+
+def write_frame(ws, df, header=True):
+    """Append a data frame below the current rows, header first."""
+    if header:
+        append_header(ws, [str(column) for column in df.columns])
+    
+    columns = [_column_values(df[column]) for column in df.columns]
+    for row in zip(*columns):
+        ws.append(row)
@@ -0,0 +1,53 @@
+"""Denormalized sales fact table shared by all reports.
+
+Preprocessing joins sales with the product catalog once and stores the
+result as `sales_fact`; advanced analytics rewrites it with each customer's
+segment. Reports read this table instead of re-joining sales and products.
+"""
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLUMNS = ['Category', 'Region', 'ProductName']
+
+def _like(df, other, key):
+    """`df` with `key` cast to the categorical dtype of `other[key]`, if it has one.
+    
+    Merging on categoricals with equal dtypes joins on the integer codes;
+    mixed or differing key types fall back to hashing every value.
+    """
+    if isinstance(other[key].dtype, pd.CategoricalDtype) and df[key].dtype != other[key].dtype:
+        # Keys missing from `other` can never match; drop them before casting
+        known = df[key].isin(other[key].cat.categories) | df[key].isna()
+        return df[known].astype({key: other[key].dtype})
+    return df
+
+def key_positions(ids, keys):
+    """Row position of each key in `ids` (-1 when unknown), looked up once per distinct categorical key."""
+    index = pd.Index(ids)
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        codes = keys.cat.codes.to_numpy()
+        return np.where(codes >= 0, index.get_indexer(keys.cat.categories)[codes], -1)
+    return index.get_indexer(keys)
+
+def build_sales_fact(sales_df, products_df, customers_df, segments_df=None):
+    """Join sales with products (and segments when given) into one fact table.
+    
+    Every sales row is kept. CustomerKey and ProductKey are integer surrogate
+    keys giving each ID's row position in the customer and product tables
+    (-1 when unknown), so keys stay stable when facts are appended in
+    batches. The low-cardinality text columns are stored as categoricals.
+    """
+    fact_df = pd.merge(sales_df, _like(products_df, sales_df, 'ProductID'), on='ProductID', how='left')
+    
+    if segments_df is not None:
+        segments_df = _like(segments_df[['CustomerID', 'Segment']], fact_df, 'CustomerID')
+        fact_df = pd.merge(fact_df, segments_df, on='CustomerID', how='left')
+        # Nullable so customers without a segment yet keep the column's dtype
+        fact_df['Segment'] = fact_df['Segment'].astype('Int8')
+    
+    fact_df['CustomerKey'] = key_positions(customers_df['CustomerID'], fact_df['CustomerID']).astype('int32')
+    fact_df['ProductKey'] = key_positions(products_df['ProductID'], fact_df['ProductID']).astype('int32')
+    for column in CATEGORICAL_COLUMNS:
+        fact_df[column] = fact_df[column].astype('category')
+    
+    return fact_df
@@ -0,0 +1,152 @@
+"""Incremental preprocessing for newly arrived sales.
+
+Only orders past the checkpoint written by the last preprocessing run are
+cleaned and appended to the processed store, and per-customer RFM
+aggregates are updated by merging the new orders' deltas into the stored
+ones instead of regrouping the full history. Customers whose RFM values
+changed are rescored with the latest saved models.
+"""
+import os
+
+import pandas as pd
+
+from .colstore import COLSTORE, append_colstore, write_colstore
+from .fact import build_sales_fact
+from .instrument import instrumented, record_rows_in
+from .models import MODEL_DIR, load_models, update_segments
+from .preprocessing import (RAW_DIR, clean_data, read_checkpoint, read_sales_shards,
+                            run_preprocessing, sales_shard_dir, write_checkpoint)
+from .rollup import build_rollup, merge_rollup
+from .storage import PROCESSED_DIR, append_table, read_table, write_table
+
+CHUNK_SIZE = 1_000_000
+
+def _is_new(sales_df, checkpoint):
+    """Mask of rows past the checkpoint's high-water mark."""
+    order_dates = pd.to_datetime(sales_df['OrderDate'])
+    last_date = pd.Timestamp(checkpoint['last_order_date'])
+    seen_ids = set(checkpoint['order_ids_at_last_date'])
+    return (order_dates > last_date) | ((order_dates == last_date) & ~sales_df['OrderID'].isin(seen_ids))
+
+def load_new_sales(checkpoint, raw_dir=RAW_DIR, chunk_size=CHUNK_SIZE):
+    """Read only the raw orders that arrived after `checkpoint`.
+    
+    With sharded input, shards whose date range ends before the high-water
+    mark are skipped from the manifest alone. A single sales CSV is scanned
+    in chunks so memory stays bounded by the chunk and the new rows.
+    """
+    last_date = checkpoint['last_order_date']
+    shard_dir = sales_shard_dir(raw_dir)
+    
+    if shard_dir is not None:
+        shard_sales_df = read_sales_shards(shard_dir, min_date=last_date)
+        chunks = [shard_sales_df] if len(shard_sales_df) else []
+    else:
+        chunks = pd.read_csv(os.path.join(raw_dir, 'sales_data.csv'), chunksize=chunk_size)
+    
+    new_rows = []
+    for chunk in chunks:
+        record_rows_in(len(chunk))
+        new_rows.append(chunk[_is_new(chunk, checkpoint)])
+    if not new_rows:
+        return pd.DataFrame()
+    return pd.concat(new_rows, ignore_index=True)
+
+def update_rfm(rfm_df, new_sales_df, customers_df, previous_date, current_date):
+    """Fold the new orders into the stored RFM table.
+    
+    The stored Recency is turned back into each customer's last order date
+    (relative to `previous_date`), combined with the per-customer max, count
+    and sum of the new orders, and Recency is recomputed against
+    `current_date`.
+    """
+    state = rfm_df[['CustomerID', 'Recency', 'Frequency', 'Monetary']].set_index('CustomerID')
+    state['LastOrderDate'] = previous_date - pd.to_timedelta(state.pop('Recency'), unit='D')
+    
+    delta = new_sales_df.groupby('CustomerID', observed=True).agg(
+        LastOrderDate=('OrderDate', 'max'),
+        Frequency=('OrderID', 'count'),
+        Monetary=('TotalPrice', 'sum')
+    )
+    
+    merged = state.reindex(state.index.union(delta.index))
+    merged['LastOrderDate'] = pd.concat([merged['LastOrderDate'], delta['LastOrderDate']], axis=1).max(axis=1)
+    merged['Frequency'] = merged['Frequency'].add(delta['Frequency'], fill_value=0).astype('int64')
+    merged['Monetary'] = merged['Monetary'].add(delta['Monetary'], fill_value=0)
+    
+    rfm = pd.DataFrame({
+        'CustomerID': merged.index,
+        'Recency': (current_date - merged['LastOrderDate']).dt.days.to_numpy(),
+        'Frequency': merged['Frequency'].to_numpy(),
+        'Monetary': merged['Monetary'].to_numpy()
+    })
+    
+    # Merge with customer data
+    return pd.merge(rfm, customers_df, on='CustomerID', how='left')
+
+@instrumented('preprocess_incremental')
+def run_incremental(raw_dir=RAW_DIR, data_dir=PROCESSED_DIR, model_dir=MODEL_DIR):
+    """Process only the orders that arrived since the last run.
+    
+    Customers whose RFM values changed are rescored with the latest saved
+    models, so `customer_segments` stays current; fact rows already stored
+    keep the segment they were written with until analytics runs again.
+    Falls back to a full `run_preprocessing` when no checkpoint exists.
+    Orders dated before the high-water mark that arrive late are not picked
+    up; run a full rebuild to include them.
+    """
+    checkpoint = read_checkpoint(data_dir)
+    if checkpoint is None:
+        print("No preprocessing checkpoint found; running full preprocessing.")
+        return run_preprocessing(raw_dir, data_dir)
+    
+    new_sales_df = load_new_sales(checkpoint, raw_dir)
+    if new_sales_df.empty:
+        print("No new orders since the last run.")
+        return
+    
+    # Customer and product tables are small dimensions, so they are refreshed in full
+    customers_df = pd.read_csv(os.path.join(raw_dir, 'customers.csv'))
+    products_df = pd.read_csv(os.path.join(raw_dir, 'products.csv'))
+    new_sales_df, customers_df, products_df = clean_data(new_sales_df, customers_df, products_df)
+    
+    previous_date = pd.Timestamp(checkpoint['last_order_date'])
+    current_date = max(previous_date, new_sales_df['OrderDate'].max())
+    rfm_df = update_rfm(read_table('customer_rfm', data_dir), new_sales_df, customers_df,
+                        previous_date, current_date)
+    
+    try:
+        segments_df = read_table('customer_segments', data_dir)
+    except FileNotFoundError:
+        segments_df = None
+    if segments_df is not None:
+        try:
+            models = load_models(model_dir=model_dir)
+        except FileNotFoundError:
+            # Segments from before models were saved can only be refreshed by retraining
+            print("No saved models found; customer segments stay stale until analytics runs again.")
+        else:
+            # New orders change RFM values; rescore those customers with the saved models
+            segments_df, rescored = update_segments(rfm_df, segments_df, models)
+            print(f"Rescored {rescored} new or changed customers.")
+    
+    append_table(new_sales_df, 'processed_sales', data_dir)
+    new_fact_df = build_sales_fact(new_sales_df, products_df, customers_df,
+                                   None if segments_df is None else segments_df[['CustomerID', 'Segment']])
+    append_table(new_fact_df, 'sales_fact', data_dir)
+    if COLSTORE and not append_colstore(new_fact_df, data_dir):
+        # No column store yet, or its columns changed; rebuild it from the full fact table
+        write_colstore(read_table('sales_fact', data_dir), data_dir)
+    try:
+        rollup_df = merge_rollup(read_table('sales_rollup', data_dir), new_fact_df)
+    except FileNotFoundError:
+        rollup_df = build_rollup(read_table('sales_fact', data_dir))
+    write_table(rollup_df, 'sales_rollup', data_dir)
+    write_table(customers_df, 'processed_customers', data_dir)
+    write_table(products_df, 'processed_products', data_dir)
+    write_table(rfm_df, 'customer_rfm', data_dir)
+    if segments_df is not None:
+        write_table(segments_df, 'customer_segments', data_dir)
+    
+    write_checkpoint(new_sales_df, data_dir, previous=checkpoint)
+    print(f"Incremental preprocessing complete: {len(new_sales_df)} new orders processed.")
@@ -0,0 +1,144 @@
+"""Stage-level timing and memory instrumentation.
+
+Wrap a stage in `stage(name)` (or decorate it with `instrumented`) to
+record its wall time, CPU time, peak RSS, rows read and written through
+`sales_pipeline.storage`, and bytes read and written by the process. Each
+finished stage appends one JSON object to the run log, so regressions can
+be tracked as the data grows.
+
+The log defaults to `results/run_log.jsonl` in the repository root;
+set SALES_RUN_LOG to another path, or to an empty string to disable it.
+Records from one run share a `run_id`, taken from SALES_RUN_ID when set so
+that subprocesses started by the DAG runner log under their parent's run.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_LOG = os.environ.get('SALES_RUN_LOG', os.path.join(ROOT_DIR, 'results', 'run_log.jsonl'))
+RUN_ID = os.environ.get('SALES_RUN_ID') or f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+
+_local = threading.local()
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+def io_bytes():
+    """Bytes read and written by this process so far, from /proc/self/io (Linux only)."""
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def record_rows_in(count):
+    """Count rows read by the innermost active stage on this thread."""
+    stack = _stack()
+    if stack:
+        stack[-1]['rows_in'] += count
+
+def record_rows_out(count):
+    """Count rows written by the innermost active stage on this thread."""
+    stack = _stack()
+    if stack:
+        stack[-1]['rows_out'] += count
+
+def write_record(record, path=None):
+    """Append one record to the JSON-lines run log."""
+    path = RUN_LOG if path is None else path
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # One write per record keeps lines whole when processes share the log
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, default=str) + '\n')
+
+@contextmanager
+def stage(name, **fields):
+    """Measure the enclosed block and log it as stage `name`.
+    
+    Extra keyword fields are stored with the record. Rows counted in nested
+    stages also count towards their parents.
+    """
+    stack = _stack()
+    span = {'rows_in': 0, 'rows_out': 0}
+    parent = stack[-1]['stage'] if stack else None
+    span['stage'] = name
+    stack.append(span)
+    
+    read_before, written_before = io_bytes()
+    started_at = datetime.now().isoformat(timespec='seconds')
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    status = 'ok'
+    try:
+        yield span
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        wall_seconds = time.perf_counter() - wall_started
+        cpu_seconds = time.process_time() - cpu_started
+        read_after, written_after = io_bytes()
+        stack.pop()
+        if stack:
+            stack[-1]['rows_in'] += span['rows_in']
+            stack[-1]['rows_out'] += span['rows_out']
+    
+        write_record(dict(
+            fields,
+            run_id=RUN_ID,
+            stage=name,
+            parent=parent,
+            pid=os.getpid(),
+            started=started_at,
+            status=status,
+            wall_seconds=round(wall_seconds, 6),
+            cpu_seconds=round(cpu_seconds, 6),
+            peak_rss_mb=peak_rss_mb(),
+            rows_in=span['rows_in'],
+            rows_out=span['rows_out'],
+            bytes_read=None if read_before is None else read_after - read_before,
+            bytes_written=None if written_before is None else written_after - written_before
+        ))
+
+def instrumented(name=None):
+    """Decorator that runs the function inside `stage(name)` (default: its name)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def read_run_log(path=None, run_id=None):
+    """Load the run log as a list of records, optionally for one run only."""
+    path = RUN_LOG if path is None else path
+    if not path or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [record for record in records if run_id is None or record['run_id'] == run_id]
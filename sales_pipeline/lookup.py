@@ -0,0 +1,65 @@
+"""Point lookups of one customer's or one product's sales.
+
+The sales fact column store is indexed by CustomerID and ProductID (see
+`sales_pipeline.colstore`), so a lookup binary-searches the key and reads
+only that key's rows instead of scanning the table. A customer's RFM row
+and segment are read from the customer tables with a CustomerID filter,
+which skips all but one of their row groups. Without a column store the
+fact table is read with the same filter instead.
+
+    python -m sales_pipeline lookup --customer CUST01234
+    python -m sales_pipeline lookup --product PROD00042
+"""
+import pandas as pd
+
+from .colstore import has_colstore, index_rows, take_colstore
+from .storage import PROCESSED_DIR, read_table
+
+# Columns analytics adds to the customer RFM table
+SCORED_COLUMNS = ['Segment', 'Churn', 'ChurnProbability']
+
+def find_orders(column, value, data_dir=PROCESSED_DIR):
+    """Sales fact rows whose `column` equals `value`, in stored order."""
+    positions = index_rows(column, value, data_dir) if has_colstore(data_dir) else None
+    if positions is not None:
+        return take_colstore(positions, data_dir)
+    return read_table('sales_fact', data_dir, filters=[(column, '==', value)])
+
+def customer_orders(customer_id, data_dir=PROCESSED_DIR):
+    return find_orders('CustomerID', customer_id, data_dir)
+
+def product_orders(product_id, data_dir=PROCESSED_DIR):
+    return find_orders('ProductID', product_id, data_dir)
+
+def customer_rfm(customer_id, data_dir=PROCESSED_DIR):
+    """The customer's RFM row, with Segment and Churn once analytics has run; None if there is none.
+    
+    Recency, Frequency and Monetary come from `customer_rfm`, which every
+    preprocessing run refreshes; `customer_segments` only adds the columns
+    analytics scores, so a stale segments table cannot hold back the RFM values.
+    """
+    filters = [('CustomerID', '==', customer_id)]
+    try:
+        rows = read_table('customer_rfm', data_dir, filters=filters)
+    except FileNotFoundError:
+        return None
+    if not len(rows):
+        return None
+    rfm = rows.iloc[0]
+    try:
+        scored = read_table('customer_segments', data_dir, filters=filters)
+    except FileNotFoundError:
+        return rfm
+    if len(scored):
+        # Tables from older analytics runs have no ChurnProbability
+        rfm = pd.concat([rfm, scored.iloc[0][[c for c in SCORED_COLUMNS if c in scored]]])
+    return rfm
+
+def customer_profile(customer_id, data_dir=PROCESSED_DIR):
+    """A customer's orders, RFM row and segment."""
+    rfm = customer_rfm(customer_id, data_dir)
+    return {
+        'orders': customer_orders(customer_id, data_dir),
+        'rfm': rfm,
+        'segment': rfm['Segment'] if rfm is not None and 'Segment' in rfm else None
+    }
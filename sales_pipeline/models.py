@@ -0,0 +1,121 @@
+"""Versioned segmentation and churn model artifacts with batch scoring.
+
+Retraining (`run_advanced_analytics`) saves the fitted scaler, K-means model
+and churn model under `models/<version>/` and points `models/LATEST` at
+it. Scoring loads a saved version and assigns segments and churn
+probabilities to new or changed customers in batches, without retraining.
+"""
+from datetime import datetime
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+from .instrument import instrumented
+from .storage import PROCESSED_DIR, read_table, write_table
+
+MODEL_DIR = 'models'
+FEATURES = ['Recency', 'Frequency', 'Monetary']
+CHURN_DAYS_THRESHOLD = 90
+
+def churn_probability(model, features):
+    """Probability of the churn class, even if training only saw one class."""
+    classes = list(model.classes_)
+    if 1 not in classes:
+        return np.zeros(len(features))
+    return model.predict_proba(features)[:, classes.index(1)]
+
+def save_models(scaler, kmeans, churn_model, model_dir=MODEL_DIR, **metadata):
+    """Save the fitted models as a new version and mark it as the latest."""
+    version = datetime.now().strftime('%Y%m%d-%H%M%S')
+    version_dir = os.path.join(model_dir, version)
+    os.makedirs(version_dir, exist_ok=True)
+    
+    joblib.dump(scaler, os.path.join(version_dir, 'scaler.joblib'))
+    joblib.dump(kmeans, os.path.join(version_dir, 'kmeans.joblib'))
+    joblib.dump(churn_model, os.path.join(version_dir, 'churn.joblib'))
+    with open(os.path.join(version_dir, 'metadata.json'), 'w') as f:
+        json.dump(dict(metadata, version=version, features=FEATURES,
+                       churn_days_threshold=CHURN_DAYS_THRESHOLD,
+                       sklearn_version=sklearn.__version__), f, indent=2)
+    
+    with open(os.path.join(model_dir, 'LATEST'), 'w') as f:
+        f.write(version)
+    
+    return version
+
+def load_models(version=None, model_dir=MODEL_DIR):
+    """Load a saved model version (the latest one by default)."""
+    if version is None:
+        with open(os.path.join(model_dir, 'LATEST')) as f:
+            version = f.read().strip()
+    version_dir = os.path.join(model_dir, version)
+    
+    with open(os.path.join(version_dir, 'metadata.json')) as f:
+        metadata = json.load(f)
+    
+    return {
+        'scaler': joblib.load(os.path.join(version_dir, 'scaler.joblib')),
+        'kmeans': joblib.load(os.path.join(version_dir, 'kmeans.joblib')),
+        'churn': joblib.load(os.path.join(version_dir, 'churn.joblib')),
+        'metadata': metadata
+    }
+
+def score_customers(rfm_df, models, batch_size=100_000):
+    """Assign Segment, Churn and ChurnProbability to customers in batches."""
+    features = models['metadata']['features']
+    threshold = models['metadata']['churn_days_threshold']
+    parts = []
+    
+    for start in range(0, len(rfm_df), batch_size):
+        batch = rfm_df.iloc[start:start + batch_size].copy()
+        batch['Segment'] = models['kmeans'].predict(models['scaler'].transform(batch[features]))
+        batch['Churn'] = (batch['Recency'] > threshold).astype(int)
+        batch['ChurnProbability'] = churn_probability(models['churn'], batch[features])
+        parts.append(batch)
+    
+    if not parts:
+        return rfm_df.assign(Segment=pd.Series(dtype='int64'), Churn=pd.Series(dtype='int64'),
+                             ChurnProbability=pd.Series(dtype='float64'))
+    return pd.concat(parts)
+
+def update_segments(rfm_df, segments_df, models, batch_size=100_000):
+    """Rescore the customers that are new or changed since `segments_df` was scored.
+    
+    A customer is rescored when they are missing from `segments_df` or any
+    of their RFM values differ from the ones they were scored with. Returns
+    the full segments table, sorted by CustomerID, and the number of
+    customers rescored.
+    """
+    if segments_df is None:
+        changed = pd.Series(True, index=rfm_df.index)
+    else:
+        previous = rfm_df[['CustomerID']].merge(segments_df[['CustomerID'] + FEATURES], on='CustomerID', how='left')
+        changed = pd.Series(
+            (previous[FEATURES].to_numpy() != rfm_df[FEATURES].to_numpy()).any(axis=1), index=rfm_df.index
+        )
+    
+    scored = score_customers(rfm_df[changed], models, batch_size)
+    if segments_df is not None:
+        unchanged = segments_df[segments_df['CustomerID'].isin(rfm_df.loc[~changed, 'CustomerID'])]
+        scored = pd.concat([unchanged, scored], ignore_index=True)
+    return scored.sort_values('CustomerID', ignore_index=True), int(changed.sum())
+    
+@instrumented('score')
+def run_scoring(data_dir=PROCESSED_DIR, model_dir=MODEL_DIR, version=None, batch_size=100_000):
+    """Score new or changed customers with saved models and update customer_segments."""
+    models = load_models(version, model_dir)
+    rfm_df = read_table('customer_rfm', data_dir)
+    
+    try:
+        segments_df = read_table('customer_segments', data_dir)
+    except FileNotFoundError:
+        segments_df = None
+    
+    segments_df, rescored = update_segments(rfm_df, segments_df, models, batch_size)
+    write_table(segments_df, 'customer_segments', data_dir)
+    print(f"Scored {rescored} new or changed customers with model version "
+          f"{models['metadata']['version']}.")
@@ -0,0 +1,159 @@
+"""Load, clean and summarize the raw sales data.
+
+`run_preprocessing` rebuilds every processed table from the full raw
+history and records a checkpoint that `sales_pipeline.incremental` uses to
+process only newly arrived orders on later runs.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+
+import pandas as pd
+
+from .colstore import write_colstore
+from .fact import build_sales_fact
+from .instrument import instrumented, record_rows_in
+from .rfm import compute_rfm
+from .rollup import build_rollup
+from .schema import apply_schema
+from .storage import PROCESSED_DIR, write_table
+
+RAW_DIR = 'data/raw'
+CHECKPOINT_FILE = '_checkpoint.json'
+
+def sales_shard_dir(raw_dir=RAW_DIR):
+    """The sharded sales directory, or None when the single sales CSV is the newer source.
+    
+    A manifest older than `sales_data.csv` is left over from an earlier
+    sharded run and is ignored.
+    """
+    shard_dir = os.path.join(raw_dir, 'sales_shards')
+    manifest_path = os.path.join(shard_dir, 'manifest.json')
+    sales_path = os.path.join(raw_dir, 'sales_data.csv')
+    if not os.path.exists(manifest_path):
+        return None
+    if os.path.exists(sales_path) and os.path.getmtime(sales_path) > os.path.getmtime(manifest_path):
+        return None
+    return shard_dir
+
+def read_sales_shards(shard_dir, min_date=None, num_workers=None):
+    """Read the shards listed in the manifest in parallel and concatenate them in order.
+    
+    With `min_date`, shards whose orders all predate it are skipped from the
+    manifest alone.
+    """
+    with open(os.path.join(shard_dir, 'manifest.json')) as f:
+        shards = json.load(f)['shards']
+    
+    paths = [os.path.join(shard_dir, shard['file']) for shard in shards
+             if min_date is None or shard['max_date'] >= min_date]
+    if not paths:
+        return pd.DataFrame()
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        return pd.concat(executor.map(pd.read_csv, paths), ignore_index=True)
+
+def load_data(raw_dir=RAW_DIR):
+    # Load raw data, preferring sharded sales output when its manifest is the newer source
+    shard_dir = sales_shard_dir(raw_dir)
+    if shard_dir is not None:
+        sales_df = read_sales_shards(shard_dir)
+    else:
+        sales_df = pd.read_csv(os.path.join(raw_dir, 'sales_data.csv'))
+    customers_df = pd.read_csv(os.path.join(raw_dir, 'customers.csv'))
+    products_df = pd.read_csv(os.path.join(raw_dir, 'products.csv'))
+    record_rows_in(len(sales_df) + len(customers_df) + len(products_df))
+    
+    return sales_df, customers_df, products_df
+
+def clean_data(sales_df, customers_df, products_df):
+    # Convert date columns to datetime
+    sales_df['OrderDate'] = pd.to_datetime(sales_df['OrderDate'])
+    customers_df['JoinDate'] = pd.to_datetime(customers_df['JoinDate'])
+    customers_df['LastPurchaseDate'] = pd.to_datetime(customers_df['LastPurchaseDate'])
+    
+    # Handle missing values
+    sales_df = sales_df.dropna(subset=['CustomerID', 'ProductID'])
+    customers_df = customers_df.drop_duplicates(subset=['CustomerID'])
+    products_df = products_df.drop_duplicates(subset=['ProductID'])
+    
+    # Calculate total price
+    sales_df['TotalPrice'] = sales_df['Quantity'] * sales_df['UnitPrice']
+    
+    # Convert to the stored compact dtypes once, before the tables are joined and aggregated
+    sales_df = apply_schema(sales_df, 'processed_sales')
+    products_df = apply_schema(products_df, 'processed_products')
+    
+    return sales_df, customers_df, products_df
+
+@instrumented('rfm')
+def calculate_rfm(sales_df, customers_df, current_date=None):
+    # Calculate RFM metrics with native aggregations
+    rfm = compute_rfm(sales_df, current_date)
+    
+    # Merge with customer data
+    rfm = pd.merge(rfm, customers_df, on='CustomerID', how='left')
+    
+    return rfm
+
+def read_checkpoint(data_dir=PROCESSED_DIR):
+    """Return the last preprocessing checkpoint, or None if there is none."""
+    path = os.path.join(data_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def write_checkpoint(sales_df, data_dir=PROCESSED_DIR, previous=None):
+    """Record the high-water mark of the processed sales.
+    
+    The mark is the latest OrderDate plus the OrderIDs seen on that date, so
+    orders arriving later for the same day are still picked up. Pass the
+    `previous` checkpoint when `sales_df` only holds newly processed rows.
+    """
+    last_date = sales_df['OrderDate'].max()
+    order_ids = set(sales_df.loc[sales_df['OrderDate'] == last_date, 'OrderID'])
+    
+    if previous is not None:
+        previous_date = pd.Timestamp(previous['last_order_date'])
+        if previous_date > last_date:
+            return previous
+        if previous_date == last_date:
+            order_ids |= set(previous['order_ids_at_last_date'])
+    
+    checkpoint = {
+        'last_order_date': last_date.strftime('%Y-%m-%d'),
+        'order_ids_at_last_date': sorted(order_ids)
+    }
+    with open(os.path.join(data_dir, CHECKPOINT_FILE), 'w') as f:
+        json.dump(checkpoint, f)
+    
+    return checkpoint
+
+@instrumented('preprocess')
+def run_preprocessing(raw_dir=RAW_DIR, data_dir=PROCESSED_DIR):
+    """Rebuild every processed table from the full raw history."""
+    os.makedirs(data_dir, exist_ok=True)
+    
+    # Load data
+    sales_df, customers_df, products_df = load_data(raw_dir)
+    
+    # Clean data
+    sales_df, customers_df, products_df = clean_data(sales_df, customers_df, products_df)
+    
+    # Calculate RFM
+    rfm_df = calculate_rfm(sales_df, customers_df)
+    
+    # Save processed data
+    write_table(sales_df, 'processed_sales', data_dir)
+    write_table(customers_df, 'processed_customers', data_dir)
+    write_table(products_df, 'processed_products', data_dir)
+    write_table(rfm_df, 'customer_rfm', data_dir)
+    
+    # Build the denormalized sales fact table and trend rollup cube shared by all reports
+    fact_df = build_sales_fact(sales_df, products_df, customers_df)
+    write_table(fact_df, 'sales_fact', data_dir)
+    write_colstore(fact_df, data_dir)
+    write_table(build_rollup(fact_df), 'sales_rollup', data_dir)
+    
+    write_checkpoint(sales_df, data_dir)
+    print("Data processing complete!")
@@ -0,0 +1,50 @@
+"""Render independent chart functions in parallel.
+
+Chart functions are dispatched to a process pool whose workers use a
+non-interactive matplotlib backend. Each worker loads the tables it needs
+once through its own `DatasetContext`. Every chart's wall time and any
+failure are collected instead of stopping the whole run, and each chart is
+logged as an instrumented stage.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import time
+import traceback
+
+from .instrument import stage
+
+def _init_worker(backend):
+    import matplotlib
+    matplotlib.use(backend)
+
+def _render(func, ctx=None):
+    started = time.perf_counter()
+    try:
+        with stage(func.__name__, kind='chart'):
+            func(ctx) if ctx is not None else func()
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return {'chart': func.__name__, 'seconds': time.perf_counter() - started, 'error': error}
+
+def render_charts(funcs, workers=1, ctx=None, backend='Agg'):
+    """Run chart functions and return one timing/failure record per chart.
+    
+    With `workers` of 1 the charts run one after another in this process,
+    sharing `ctx`; otherwise they run on a pool of that many processes
+    (None means one per CPU).
+    """
+    if workers == 1:
+        return [_render(func, ctx) for func in funcs]
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(backend,)) as executor:
+        return list(executor.map(_render, funcs))
+
+def print_render_report(results):
+    """Print per-chart timings and any failures."""
+    print("\nChart rendering times:")
+    for result in results:
+        status = 'FAILED' if result['error'] else 'ok'
+        print(f"- {result['chart']}: {result['seconds']:.2f}s {status}")
+    for result in results:
+        if result['error']:
+            print(f"\n{result['chart']} failed:\n{result['error']}")
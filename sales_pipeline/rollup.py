@@ -0,0 +1,94 @@
+"""Multi-resolution rollup cube of the sales fact table.
+
+The cube holds revenue, quantity, distinct orders and sales lines per
+period at day, week and month grain, broken down by Region, Category and
+Segment. It is built once from the fact table and stored as
+`sales_rollup`, so trend charts and summaries aggregate a few thousand
+cells instead of every sales row.
+
+Distinct orders do not add up across cells: an order whose lines fall in
+two categories would be counted in both. Orders therefore counts each
+order once, in the cell of its first line, so summing Orders over any set
+of cells gives the number of distinct orders in them. Every order has a
+single date and customer, so day counts also add up to week and month
+counts. A breakdown by Category or Region counts a multi-line order under
+its first line's value.
+"""
+import pandas as pd
+
+# Grain name -> pandas period frequency; each period is keyed by its start date
+GRAINS = {'day': 'D', 'week': 'W', 'month': 'M'}
+DIMENSIONS = ['Region', 'Category', 'Segment']
+MEASURES = ['Revenue', 'Quantity', 'Orders', 'Lines']
+
+def first_order_lines(order_ids):
+    """Mask of the first line of every order; lines without an OrderID count as none."""
+    return order_ids.notna() & ~order_ids.duplicated()
+
+def _daily_cube(fact_df):
+    """Aggregate fact rows to one row per day and dimension cell."""
+    keys = [fact_df['OrderDate'].dt.normalize().rename('Period')]
+    keys += [fact_df[column] for column in DIMENSIONS if column in fact_df]
+    # Count each order at its first line only, so order counts add up across cells
+    first_lines = first_order_lines(fact_df['OrderID'])
+    
+    cube = fact_df.assign(FirstLine=first_lines.astype('int64')).groupby(keys, observed=True, dropna=False).agg(
+        Revenue=('TotalPrice', 'sum'),
+        Quantity=('Quantity', 'sum'),
+        Orders=('FirstLine', 'sum'),
+        Lines=('OrderID', 'size')
+    ).reset_index()
+    
+    if 'Segment' not in cube:
+        # Segments are assigned by advanced analytics; keep the column before then
+        cube['Segment'] = pd.array([pd.NA] * len(cube), dtype='Int8')
+    return cube[['Period'] + DIMENSIONS + MEASURES]
+
+def _roll_up(daily, grain):
+    """Roll the daily cube up to `grain` and tag its rows with the grain."""
+    if grain == 'day':
+        cube = daily.copy()
+    else:
+        period = daily['Period'].dt.to_period(GRAINS[grain]).dt.start_time
+        keys = [period] + [daily[column] for column in DIMENSIONS]
+        cube = daily.groupby(keys, observed=True, dropna=False)[MEASURES].sum().reset_index()
+    cube.insert(0, 'Grain', grain)
+    return cube
+
+def _all_grains(daily):
+    return pd.concat([_roll_up(daily, grain) for grain in GRAINS], ignore_index=True)
+
+def build_rollup(fact_df):
+    """Build the cube at every grain from the sales fact table."""
+    return _all_grains(_daily_cube(fact_df))
+
+def merge_rollup(rollup_df, new_fact_df):
+    """Add a batch of new fact rows to an existing cube.
+    
+    The daily cells are summed and the coarser grains re-derived from them,
+    which only touches the cube, not the stored fact rows.
+    """
+    daily = pd.concat([
+        rollup_df[rollup_df['Grain'] == 'day'].drop(columns='Grain'),
+        _daily_cube(new_fact_df)
+    ], ignore_index=True)
+    daily = daily.groupby(['Period'] + DIMENSIONS, observed=True, dropna=False)[MEASURES].sum().reset_index()
+    return _all_grains(daily)
+
+def rollup_series(rollup_df, grain='month', measure='Revenue', by=None, **filters):
+    """Return `measure` per period at `grain`, optionally one column per `by` value.
+    
+    Keyword filters select dimension values, e.g. `Region='North'`.
+    """
+    cube = rollup_df[rollup_df['Grain'] == grain]
+    for column, value in filters.items():
+        cube = cube[cube[column] == value]
+    
+    keys = ['Period'] + ([by] if by else [])
+    series = cube.groupby(keys, observed=True)[measure].sum()
+    return series.unstack(by) if by else series
+
+def rollup_totals(rollup_df, by, measure='Revenue'):
+    """Return the all-time total of `measure` per value of the dimension `by`."""
+    cube = rollup_df[rollup_df['Grain'] == 'month']
+    return cube.groupby(by, observed=True)[measure].sum()
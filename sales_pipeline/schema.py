@@ -0,0 +1,140 @@
+"""Compact column types for the processed tables.
+
+With default dtypes every ID and text column is a Python-object string and
+every count is int64, so string columns take most of a loaded table's
+memory. The schema below stores repeated IDs and low-cardinality text as
+categoricals (integer codes plus a lookup table of the distinct values) and
+counts as narrow integers. Money stays float64 so totals keep their cents.
+
+`storage.read_table` applies the schema to every table it loads, and
+`write_table`/`append_table` apply it before writing so all Parquet parts
+of a table share the same column types. Set SALES_COMPACT_DTYPES=0 to use
+the default dtypes instead. Compare the loaded size of every table with:
+
+    python -m sales_pipeline.schema
+
+and the peak RSS of every stage by benchmarking with and without it:
+
+    SALES_COMPACT_DTYPES=0 python -m sales_pipeline bench --save-baseline
+    python -m sales_pipeline bench --baseline bench/baseline.json
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from .fact import CATEGORICAL_COLUMNS
+
+COMPACT_DTYPES = os.environ.get('SALES_COMPACT_DTYPES', '1') == '1'
+
+_RFM = {'Recency': 'int16', 'Frequency': 'int16'}
+
+# Table name -> column -> compact dtype. IDs that are (nearly) unique per row,
+# such as OrderID or the customer table's CustomerID, stay strings: a lookup
+# table as long as the column saves nothing.
+SCHEMAS = {
+    'processed_sales': {
+        'CustomerID': 'category',
+        'ProductID': 'category',
+        'Region': 'category',
+        'Quantity': 'int16'
+    },
+    'processed_products': {
+        'Category': 'category',
+        'ProductName': 'category'
+    },
+    # CustomerID, Name and Email are unique per customer and the dates are already
+    # 8-byte datetimes, so nothing converts; listed so the memory report covers it
+    'processed_customers': {},
+    'customer_rfm': _RFM,
+    'customer_segments': {**_RFM, 'Segment': 'int8', 'Churn': 'int8'}
+}
+SCHEMAS['sales_fact'] = {**SCHEMAS['processed_sales'], **SCHEMAS['processed_products']}
+
+# Columns that are categorical with the default dtypes too
+DEFAULT_CATEGORICAL = {'sales_fact': CATEGORICAL_COLUMNS}
+
+def _fits(series, dtype):
+    """Whether every value of an integer column fits `dtype` (nulls do not)."""
+    if not pd.api.types.is_integer_dtype(series) or series.isna().any():
+        return False
+    limits = np.iinfo(dtype)
+    return series.empty or (limits.min <= series.min() and series.max() <= limits.max)
+
+def _default_dtypes(df, name, schema):
+    columns = {}
+    for column in schema:
+        if column not in df or column in DEFAULT_CATEGORICAL.get(name, []):
+            continue
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            columns[column] = values.astype(values.cat.categories.dtype)
+        elif pd.api.types.is_integer_dtype(values) and values.dtype != 'int64' and not values.isna().any():
+            columns[column] = values.astype('int64')
+    return df.assign(**columns) if columns else df
+
+def apply_schema(df, name, compact=None):
+    """Return `df` with its columns converted to the table's compact dtypes.
+    
+    Columns missing from the frame are skipped, and an integer column whose
+    values do not fit the narrow type keeps its current type. `compact`
+    defaults to SALES_COMPACT_DTYPES; with False the schema's columns are
+    converted back to the default string and int64 dtypes instead.
+    """
+    schema = SCHEMAS.get(name)
+    if not schema:
+        return df
+    if not (COMPACT_DTYPES if compact is None else compact):
+        return _default_dtypes(df, name, schema)
+    
+    columns = {}
+    for column, dtype in schema.items():
+        if column not in df:
+            continue
+        values = df[column]
+        if dtype == 'category' and isinstance(values.dtype, pd.CategoricalDtype):
+            # Parts appended separately come back with their categories in part order;
+            # keep them sorted so codes and sorting follow the values
+            if not values.cat.categories.is_monotonic_increasing:
+                columns[column] = values.cat.set_categories(values.cat.categories.sort_values())
+        elif dtype == 'category' or _fits(values, dtype):
+            columns[column] = values.astype(dtype)
+    return df.assign(**columns) if columns else df
+
+def memory_report(data_dir=None, tables=None):
+    """Loaded size per table with default and compact dtypes."""
+    from .storage import PROCESSED_DIR, _resolve_format, read_table
+    
+    data_dir = data_dir or PROCESSED_DIR
+    rows = []
+    for name in tables or SCHEMAS:
+        try:
+            _resolve_format(name, data_dir, None)
+        except FileNotFoundError:
+            continue
+        df = read_table(name, data_dir, compact=True)
+        rows.append({
+            'table': name,
+            'rows': len(df),
+            'default_mb': apply_schema(df, name, compact=False).memory_usage(deep=True).sum() / 1e6,
+            'compact_mb': df.memory_usage(deep=True).sum() / 1e6
+        })
+    return pd.DataFrame(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare loaded table sizes with default and compact dtypes.')
+    parser.add_argument('--data-dir', default=None)
+    parser.add_argument('--tables', nargs='+', choices=list(SCHEMAS))
+    args = parser.parse_args()
+    
+    report = memory_report(args.data_dir, args.tables)
+    if report.empty:
+        print("No processed tables found; run preprocessing first.")
+        return
+    report['saved'] = 1 - report['compact_mb'] / report['default_mb']
+    print(report.to_string(index=False, float_format=lambda value: f'{value:,.2f}'))
+    print(f"\nTotal: {report['default_mb'].sum():,.1f} MB -> {report['compact_mb'].sum():,.1f} MB")
+
+if __name__ == "__main__":
+    main()
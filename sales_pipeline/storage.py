@@ -0,0 +1,311 @@
+"""Storage backend for the processed tables.
+
+Tables are written as typed columnar Parquet files when pyarrow is installed
+and read back with optional column projection and the compact dtypes of
+`sales_pipeline.schema`. CSV is kept as an export format (Power BI imports
+the CSVs) and as the fallback when no Parquet file exists.
+
+Tables that grow incrementally are appended as extra part files: a Parquet
+table then becomes a directory of parts under the same name, which
+`read_table` loads as one dataset.
+
+The sales tables are partitioned by month of OrderDate: one subdirectory
+per month (`2024-03/part-00000.parquet`) plus `_partitions.json` with each
+partition's files, row count and first and last order date. Readers given a
+`date_range` open only the partitions that overlap it, so a report on the
+last 90 days reads three or four months instead of the whole history. Set
+SALES_PARTITION_SALES=0 to write them as single files.
+
+The customer tables are written in small row groups, so a read filtered on
+one CustomerID skips all but one of them by their min/max statistics.
+"""
+import json
+import operator
+import os
+import shutil
+
+import pandas as pd
+
+from .instrument import record_rows_in, record_rows_out
+from .schema import apply_schema
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+PROCESSED_DIR = 'data/processed'
+
+TABLES = (
+    'processed_sales',
+    'processed_customers',
+    'processed_products',
+    'customer_rfm',
+    'customer_segments',
+    'sales_fact',
+    'sales_rollup'
+)
+
+# Columns parsed as datetimes when a table is read back from CSV
+DATE_COLUMNS = {
+    'processed_sales': ['OrderDate'],
+    'sales_fact': ['OrderDate'],
+    'sales_rollup': ['Period'],
+    'processed_customers': ['JoinDate', 'LastPurchaseDate'],
+    'customer_rfm': ['JoinDate', 'LastPurchaseDate'],
+    'customer_segments': ['JoinDate', 'LastPurchaseDate']
+}
+
+# Tables partitioned by month of this date column when written as Parquet
+PARTITION_COLUMNS = {
+    'processed_sales': 'OrderDate',
+    'sales_fact': 'OrderDate'
+}
+PARTITION_MANIFEST = '_partitions.json'
+
+# Parquet row group size of the tables sorted by CustomerID, for point lookups
+ROW_GROUP_ROWS = {
+    'customer_rfm': 10_000,
+    'customer_segments': 10_000
+}
+
+# Filter operators supported on CSV reads, as in Parquet filters
+FILTER_OPERATORS = {'==': operator.eq, '>=': operator.ge, '<=': operator.le}
+
+EXTENSIONS = {'parquet': '.parquet', 'csv': '.csv'}
+
+DEFAULT_FORMAT = os.environ.get('SALES_STORAGE_FORMAT', 'parquet' if HAS_PARQUET else 'csv')
+EXPORT_CSV = os.environ.get('SALES_EXPORT_CSV', '0') == '1'
+PARTITION_SALES = os.environ.get('SALES_PARTITION_SALES', '1') == '1'
+
+def table_path(name, data_dir=PROCESSED_DIR, fmt=None):
+    """Return the file path of a table in the given format."""
+    return os.path.join(data_dir, name + EXTENSIONS[fmt or DEFAULT_FORMAT])
+
+def _resolve_format(name, data_dir, fmt):
+    """Pick the format to read: the requested one, else the default, else whatever exists."""
+    if fmt:
+        return fmt
+    for candidate in (DEFAULT_FORMAT, 'parquet', 'csv'):
+        if candidate == 'parquet' and not HAS_PARQUET:
+            continue
+        if os.path.exists(table_path(name, data_dir, candidate)):
+            return candidate
+    raise FileNotFoundError(f"No stored table named '{name}' in {data_dir}")
+
+def _date(value):
+    return None if pd.isna(value) else pd.Timestamp(value).strftime('%Y-%m-%d')
+
+def date_bounds(date_range):
+    """Normalize a (start, end) date range, either end optional, to inclusive Timestamps."""
+    start, end = date_range
+    return (None if start is None else pd.Timestamp(start),
+            None if end is None else pd.Timestamp(end))
+
+def read_partitions(name, data_dir=PROCESSED_DIR):
+    """Return the partitions of a month-partitioned table, or None if it is not partitioned."""
+    manifest = os.path.join(table_path(name, data_dir, 'parquet'), PARTITION_MANIFEST)
+    if not os.path.exists(manifest):
+        return None
+    with open(manifest) as f:
+        return json.load(f)['partitions']
+
+def _write_partitions(df, path, column, partitions=None):
+    """Write `df` into per-month part files under `path` and update the partition manifest."""
+    os.makedirs(path, exist_ok=True)
+    partitions = {p['month']: p for p in partitions or []}
+    months = pd.to_datetime(df[column]).dt.to_period('M')
+    for period, rows in df.groupby(months, sort=True, dropna=False):
+        # Rows without a date go to a 'NaT' partition, which date ranges never select
+        month = str(period)
+        partition = partitions.setdefault(month, {'month': month, 'files': [], 'rows': 0,
+                                                  'min_date': None, 'max_date': None})
+        os.makedirs(os.path.join(path, month), exist_ok=True)
+        # Store only the categories used in the month rather than the whole history's in every file
+        rows = rows.assign(**{name: values.cat.remove_unused_categories() for name, values in rows.items()
+                              if isinstance(values.dtype, pd.CategoricalDtype)})
+        file = f"{month}/part-{len(partition['files']):05d}.parquet"
+        rows.to_parquet(os.path.join(path, file), index=False)
+        partition['files'].append(file)
+        partition['rows'] += len(rows)
+        dates = [d for d in (partition['min_date'], _date(rows[column].min())) if d]
+        partition['min_date'] = min(dates, default=None)
+        dates = [d for d in (partition['max_date'], _date(rows[column].max())) if d]
+        partition['max_date'] = max(dates, default=None)
+    
+    # Written last so an interrupted write leaves the previous manifest in place
+    manifest = os.path.join(path, PARTITION_MANIFEST)
+    with open(manifest + '.tmp', 'w') as f:
+        json.dump({'column': column, 'partitions': [partitions[m] for m in sorted(partitions)]}, f, indent=2)
+    os.replace(manifest + '.tmp', manifest)
+
+def _prune(partitions, date_range):
+    """Keep the partitions whose dates overlap `date_range`."""
+    if date_range is None:
+        return partitions
+    start, end = date_bounds(date_range)
+    return [p for p in partitions if p['min_date'] is not None
+            and (start is None or pd.Timestamp(p['max_date']) >= start.normalize())
+            and (end is None or pd.Timestamp(p['min_date']) <= end)]
+
+def _date_filters(column, date_range):
+    """Parquet row filters selecting `date_range` of `column`."""
+    if date_range is None:
+        return None
+    start, end = date_bounds(date_range)
+    filters = []
+    if start is not None:
+        filters.append((column, '>=', start))
+    if end is not None:
+        filters.append((column, '<=', end))
+    return filters or None
+
+def _filter_rows(df, filters):
+    """Apply Parquet-style (column, op, value) filters to a frame read from CSV."""
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        mask &= FILTER_OPERATORS[op](df[column], value)
+    return df[mask]
+
+def recent_range(days, name='sales_fact', data_dir=PROCESSED_DIR):
+    """Date range of the last `days` days up to and including the table's latest date.
+    
+    The latest date comes from the partition manifest when there is one, so
+    no rows are read. The range is open-ended, so it also covers later rows.
+    """
+    partitions = read_partitions(name, data_dir)
+    if partitions is not None:
+        last = pd.Timestamp(max(p['max_date'] for p in partitions if p['max_date']))
+    else:
+        last = pd.to_datetime(read_table(name, data_dir, columns=[PARTITION_COLUMNS[name]]).iloc[:, 0]).max()
+    return last.normalize() - pd.Timedelta(days=days - 1), None
+
+def write_table(df, name, data_dir=PROCESSED_DIR, fmt=None, export_csv=None):
+    """Write a table in the storage format, optionally exporting a CSV copy."""
+    fmt = fmt or DEFAULT_FORMAT
+    if export_csv is None:
+        export_csv = EXPORT_CSV
+    os.makedirs(data_dir, exist_ok=True)
+    df = apply_schema(df, name)
+    
+    if fmt == 'parquet':
+        path = table_path(name, data_dir, 'parquet')
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        if PARTITION_SALES and name in PARTITION_COLUMNS:
+            _write_partitions(df, path, PARTITION_COLUMNS[name])
+        else:
+            df.to_parquet(path, index=False, row_group_size=ROW_GROUP_ROWS.get(name))
+    if fmt == 'csv' or export_csv:
+        df.to_csv(table_path(name, data_dir, 'csv'), index=False)
+    record_rows_out(len(df))
+
+def append_table(df, name, data_dir=PROCESSED_DIR, fmt=None, export_csv=None):
+    """Append rows to a stored table without rewriting the existing rows."""
+    fmt = fmt or DEFAULT_FORMAT
+    if export_csv is None:
+        export_csv = EXPORT_CSV
+    # Parts must share column types to be read back as one dataset
+    df = apply_schema(df, name)
+    
+    if fmt == 'parquet':
+        path = table_path(name, data_dir, 'parquet')
+        if not os.path.exists(path):
+            return write_table(df, name, data_dir, fmt, export_csv)
+        partitions = read_partitions(name, data_dir)
+        if partitions is not None:
+            # New rows go to their months' partitions, mostly the latest one
+            _write_partitions(df, path, PARTITION_COLUMNS[name], partitions)
+        else:
+            if os.path.isfile(path):
+                # Turn the single-file table into a directory holding it as the first part
+                os.replace(path, path + '.tmp')
+                os.makedirs(path)
+                os.replace(path + '.tmp', os.path.join(path, 'part-00000.parquet'))
+            df.to_parquet(os.path.join(path, f'part-{len(os.listdir(path)):05d}.parquet'), index=False)
+    if fmt == 'csv' or export_csv:
+        csv_path = table_path(name, data_dir, 'csv')
+        df.to_csv(csv_path, mode='a', header=not os.path.exists(csv_path), index=False)
+    record_rows_out(len(df))
+
+def _partition_files(name, data_dir, path, date_range):
+    """The Parquet files to read for `date_range`: pruned partitions, or the whole table."""
+    partitions = read_partitions(name, data_dir)
+    if partitions is None:
+        return path
+    selected = _prune(partitions, date_range)
+    if not selected:
+        # Read one partition through the date filter for an empty frame with the table's columns
+        selected = partitions[:1]
+    return [os.path.join(path, file) for partition in selected for file in partition['files']]
+
+def read_table(name, data_dir=PROCESSED_DIR, columns=None, fmt=None, compact=None, date_range=None,
+               filters=None):
+    """Read a stored table with its compact dtypes, loading only `columns` when given.
+    
+    `date_range` is an inclusive (start, end) pair of dates, either of which
+    may be None, and keeps only the rows whose date column falls inside it;
+    partitioned tables open just the months that overlap it. `filters` are
+    further (column, op, value) conditions with op one of FILTER_OPERATORS,
+    which Parquet also uses to skip row groups.
+    """
+    fmt = _resolve_format(name, data_dir, fmt)
+    path = table_path(name, data_dir, fmt)
+    filters = list(filters or [])
+    if date_range is not None and name in PARTITION_COLUMNS:
+        filters += _date_filters(PARTITION_COLUMNS[name], date_range) or []
+    # Filtered columns are loaded for filtering and dropped afterwards
+    extra = [] if columns is None else [c for c in dict.fromkeys(f[0] for f in filters) if c not in columns]
+    usecols = list(columns) + extra if extra else columns
+    
+    if fmt == 'parquet':
+        df = pd.read_parquet(_partition_files(name, data_dir, path, date_range), columns=usecols,
+                             filters=filters or None)
+    else:
+        dates = [c for c in DATE_COLUMNS.get(name, []) if usecols is None or c in usecols]
+        df = pd.read_csv(path, usecols=usecols, parse_dates=dates)
+        if filters:
+            df = _filter_rows(df, filters).reset_index(drop=True)
+    if extra:
+        df = df.drop(columns=extra)
+    record_rows_in(len(df))
+    return apply_schema(df, name, compact)
+
+def read_table_chunks(name, data_dir=PROCESSED_DIR, columns=None, chunk_rows=1_000_000, fmt=None,
+                      date_range=None):
+    """Yield a stored table as data frames of at most `chunk_rows` rows, within `date_range` when given."""
+    fmt = _resolve_format(name, data_dir, fmt)
+    path = table_path(name, data_dir, fmt)
+    column = PARTITION_COLUMNS.get(name) if date_range is not None else None
+    
+    if fmt == 'parquet':
+        import pyarrow.dataset as ds
+        # Works for single files, directories of appended parts and pruned partitions
+        dataset = ds.dataset(_partition_files(name, data_dir, path, date_range), format='parquet')
+        row_filter = None
+        for field, op, value in _date_filters(column, date_range) if column else []:
+            condition = ds.field(field) >= value if op == '>=' else ds.field(field) <= value
+            row_filter = condition if row_filter is None else row_filter & condition
+        for batch in dataset.to_batches(columns=columns, filter=row_filter, batch_size=chunk_rows):
+            chunk = batch.to_pandas()
+            record_rows_in(len(chunk))
+            yield apply_schema(chunk, name)
+        return
+    
+    extra = column and columns is not None and column not in columns
+    usecols = list(columns) + [column] if extra else columns
+    dates = [c for c in DATE_COLUMNS.get(name, []) if usecols is None or c in usecols]
+    for chunk in pd.read_csv(path, usecols=usecols, parse_dates=dates, chunksize=chunk_rows):
+        if column:
+            chunk = _filter_rows(chunk, _date_filters(column, date_range) or [])
+        if extra:
+            chunk = chunk.drop(columns=column)
+        record_rows_in(len(chunk))
+        yield apply_schema(chunk, name)
+
+def export_csv(name, data_dir=PROCESSED_DIR):
+    """Export a stored table to CSV next to its columnar file."""
+    read_table(name, data_dir).to_csv(table_path(name, data_dir, 'csv'), index=False)
@@ -0,0 +1,250 @@
+"""Out-of-core aggregation of the sales history.
+
+The sales fact table is read in chunks and each chunk is folded into
+mergeable partial aggregates: revenue, quantity and line totals, the first
+and last order date, and per-customer, per-category, per-region, per-product
+and per-day totals, plus the Category x Region x Segment cells used by the
+what-if engine. Memory grows with the number of groups rather than the
+number of rows: each chunk's group totals are folded in place into per-group
+arrays (`GroupTotals`), and distinct orders are counted at each order's
+first line, like the rollup cube's Orders, so the count adds up across
+chunks. An order's lines are stored next to each other, so an order split
+between two consecutive chunks is recognised by the previous chunk's last
+OrderID. Partial aggregates from separate chunks (or processes) combine
+with `merge`, so the result is the same however the rows are split, as long
+as no order is split between partials.
+
+Reports use these aggregates instead of the full fact table when the
+context is created with `stream_aggregates=True` or SALES_STREAM_AGGREGATES=1.
+"""
+import numpy as np
+import pandas as pd
+
+from .rollup import first_order_lines
+from .storage import PROCESSED_DIR, read_table, read_table_chunks
+from .whatif import aggregate_cells
+
+CHUNK_ROWS = 1_000_000
+
+# Aggregate name -> group keys
+GROUPINGS = {
+    'customer': ['CustomerID'],
+    'category': ['Category'],
+    'region': ['Region'],
+    'product': ['ProductID', 'ProductName'],
+    'region_product': ['Region', 'ProductID'],
+    'date': ['OrderDate']
+}
+
+# How each aggregate column combines across partial aggregates
+MERGE_FUNCTIONS = {
+    'Revenue': 'sum',
+    'Quantity': 'sum',
+    'Lines': 'sum',
+    'FirstPurchase': 'min',
+    'LastPurchase': 'max',
+    'Cost': 'sum'
+}
+
+def _group_totals(chunk, keys, with_dates=False):
+    grouped = chunk.groupby(keys, observed=True)
+    totals = pd.DataFrame({
+        'Revenue': grouped['TotalPrice'].sum(),
+        'Quantity': grouped['Quantity'].sum(),
+        'Lines': grouped.size()
+    })
+    if with_dates:
+        totals['FirstPurchase'] = grouped['OrderDate'].min()
+        totals['LastPurchase'] = grouped['OrderDate'].max()
+    return totals
+
+def _key_values(index):
+    # Chunks can carry different categories, so groups are matched on their values
+    levels = [index.get_level_values(level).astype(object) for level in range(index.nlevels)]
+    levels = [level.where(level.notna(), None) for level in levels]
+    return list(zip(*levels)) if len(levels) > 1 else list(levels[0])
+
+class GroupTotals:
+    """Per-group totals in arrays indexed by the group's position.
+    
+    Groups get positions in the order they first appear, kept in a dict that
+    only grows by the new groups. The arrays are allocated with spare room and
+    grow geometrically, so folding in a chunk's totals touches only the
+    chunk's groups instead of regrouping every group seen so far.
+    """
+    
+    def __init__(self):
+        self.names = None
+        self.keys = []
+        self.positions = {}
+        self.arrays = {}
+        self._frame = None
+    
+    @property
+    def size(self):
+        return len(self.keys)
+    
+    def _reserve(self, size, totals):
+        capacity = len(next(iter(self.arrays.values()))) if self.arrays else 0
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        for column, values in totals.items():
+            previous = self.arrays.get(column, values.to_numpy()[:0])
+            dtype = previous.dtype
+            if MERGE_FUNCTIONS[column] == 'sum':
+                # A chunk's sums of a narrow column can come back narrow; total them in 64 bits
+                dtype = np.promote_types(dtype, np.int64)
+            grown = np.zeros(capacity, dtype=dtype)
+            grown[:self.size] = previous[:self.size]
+            self.arrays[column] = grown
+    
+    def fold(self, totals):
+        """Combine a frame of per-group totals, keyed by its index, into the arrays."""
+        if totals.empty:
+            return self
+        keys = _key_values(totals.index)
+        positions = np.fromiter((self.positions.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+        new = positions < 0
+        if new.any():
+            # New groups take the next free rows; their totals are assigned as they are
+            added = [key for key, is_new in zip(keys, new) if is_new]
+            positions[new] = np.arange(self.size, self.size + len(added))
+            self._reserve(self.size + len(added), totals)
+            self.positions.update(zip(added, range(self.size, self.size + len(added))))
+            self.keys += added
+            self.names = list(totals.index.names)
+        old = ~new
+        for column, values in totals.items():
+            values = values.to_numpy()
+            array = self.arrays[column]
+            array[positions[new]] = values[new]
+            if old.any():
+                seen = positions[old]
+                function = MERGE_FUNCTIONS[column]
+                if function == 'sum':
+                    array[seen] += values[old]
+                elif function == 'min':
+                    array[seen] = np.minimum(array[seen], values[old])
+                else:
+                    array[seen] = np.maximum(array[seen], values[old])
+        self._frame = None
+        return self
+    
+    def frame(self):
+        """The totals as a frame indexed by the group keys, in sorted key order."""
+        if self._frame is None:
+            if len(self.names) > 1:
+                index = pd.MultiIndex.from_tuples(self.keys, names=self.names)
+            else:
+                index = pd.Index(self.keys, name=self.names[0])
+            self._frame = pd.DataFrame(
+                {column: values[:self.size] for column, values in self.arrays.items()},
+                index=index
+            ).sort_index()
+        return self._frame
+
+class SalesAggregates:
+    """Mergeable partial aggregates of sales rows."""
+    
+    def __init__(self):
+        self.revenue = 0.0
+        self.quantity = 0
+        self.lines = 0
+        self.orders = 0
+        self._last_order_id = None
+        self.first_date = None
+        self.last_date = None
+        self.totals_by_group = {}
+    
+    @classmethod
+    def from_chunk(cls, chunk):
+        """Aggregate one chunk of sales fact rows."""
+        return cls().update(chunk)
+    
+    def _fold(self, name, totals):
+        self.totals_by_group.setdefault(name, GroupTotals()).fold(totals)
+    
+    def merge(self, other):
+        """Fold another partial aggregate into this one and return self."""
+        self.revenue += other.revenue
+        self.quantity += other.quantity
+        self.lines += other.lines
+        self.orders += other.orders
+        self.first_date = min(filter(lambda d: d is not None, [self.first_date, other.first_date]), default=None)
+        self.last_date = max(filter(lambda d: d is not None, [self.last_date, other.last_date]), default=None)
+        for name, totals in other.groups.items():
+            self._fold(name, totals)
+        return self
+    
+    def update(self, chunk):
+        """Fold a chunk of sales fact rows into the aggregates and return self."""
+        if chunk.empty:
+            return self
+        chunk = chunk.assign(OrderDate=pd.to_datetime(chunk['OrderDate']))
+        first_date, last_date = chunk['OrderDate'].min(), chunk['OrderDate'].max()
+        
+        self.revenue += float(chunk['TotalPrice'].sum())
+        self.quantity += int(chunk['Quantity'].sum())
+        self.lines += len(chunk)
+        # Count each order at its first line; one continued from the last chunk was counted there
+        first_lines = first_order_lines(chunk['OrderID'])
+        if self._last_order_id is not None:
+            first_lines &= chunk['OrderID'] != self._last_order_id
+        self.orders += int(first_lines.sum())
+        last_order_id = chunk['OrderID'].iloc[-1]
+        self._last_order_id = last_order_id if pd.notna(last_order_id) else None
+        self.first_date = first_date if self.first_date is None else min(self.first_date, first_date)
+        self.last_date = last_date if self.last_date is None else max(self.last_date, last_date)
+        for name, keys in GROUPINGS.items():
+            self._fold(name, _group_totals(chunk, keys, with_dates=(name == 'customer')))
+        cells = aggregate_cells(chunk)
+        self._fold('cells', cells.set_index([c for c in cells.columns if c not in MERGE_FUNCTIONS]))
+        return self
+    
+    @property
+    def groups(self):
+        """Aggregate name -> per-group totals indexed by the group keys."""
+        return {name: totals.frame() for name, totals in self.totals_by_group.items()}
+    
+    def summary(self):
+        """Key metrics matching the ones computed from the full fact table."""
+        return {
+            'total_sales': self.revenue,
+            'total_quantity': self.quantity,
+            'total_orders': self.orders,
+            'avg_order_value': self.revenue / self.lines if self.lines else float('nan'),
+            'first_date': self.first_date,
+            'last_date': self.last_date
+        }
+    
+    def totals(self, name):
+        """Per-group totals for one of GROUPINGS, with the keys as columns."""
+        return self.totals_by_group[name].frame().reset_index()
+    
+    def customer_ltv(self):
+        """Revenue and first/last purchase date per customer."""
+        ltv = self.totals_by_group['customer'].frame()[['Revenue', 'FirstPurchase', 'LastPurchase']].reset_index()
+        ltv.columns = ['CustomerID', 'TotalRevenue', 'FirstPurchase', 'LastPurchase']
+        return ltv
+    
+    def what_if_cells(self):
+        """Revenue, quantity and cost per cell, as returned by `whatif.aggregate_cells`."""
+        return self.totals_by_group['cells'].frame().reset_index()
+
+def _fact_chunks(data_dir, chunk_rows, date_range=None):
+    try:
+        # The fact table is narrow, so chunks keep every column
+        yield from read_table_chunks('sales_fact', data_dir, chunk_rows=chunk_rows, date_range=date_range)
+    except FileNotFoundError:
+        # Processed data predates the fact table; join each chunk with the product catalog
+        products_df = read_table('processed_products', data_dir)
+        for chunk in read_table_chunks('processed_sales', data_dir, chunk_rows=chunk_rows, date_range=date_range):
+            yield chunk.merge(products_df, on='ProductID', how='left')
+
+def aggregate_sales(data_dir=PROCESSED_DIR, chunk_rows=CHUNK_ROWS, date_range=None):
+    """Stream the sales history, or the part inside `date_range`, in chunks and return its aggregates."""
+    aggregates = SalesAggregates()
+    for chunk in _fact_chunks(data_dir, chunk_rows, date_range):
+        aggregates.update(chunk)
+    return aggregates
@@ -0,0 +1,166 @@
+"""Vectorized what-if scenario engine.
+
+A scenario applies a price discount to the sales in its scope (optionally
+limited to one Category, Region and/or Segment) and assumes a constant
+price elasticity of demand: quantity scales by `(1 - discount) ** -elasticity`.
+
+Revenue, quantity and cost are linear in the sales rows, so the fact table
+is first summed into cells of identical Category x Region x Segment. A
+chunk of scenarios is then evaluated against every cell at once by
+broadcasting a scenarios x cells matrix, which gives the same totals as
+evaluating every row at a fraction of the memory and time.
+
+    python -m sales_pipeline.whatif --discounts 0 0.05 0.1 --elasticities 0 1.5 --by Category
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from .storage import PROCESSED_DIR
+
+DIMENSIONS = ['Category', 'Region', 'Segment']
+
+# Upper bound on scenarios x cells matrix elements evaluated per chunk
+CHUNK_ELEMENTS = 5_000_000
+
+# Scenarios shown in the Excel workbook and HTML report
+DEFAULT_DISCOUNTS = [0, 0.05, 0.10, 0.15, 0.20]
+DEFAULT_ELASTICITIES = [0, 1.5]
+
+def aggregate_cells(fact_df):
+    """Sum revenue, quantity and cost per Category x Region x Segment cell."""
+    dimensions = [column for column in DIMENSIONS if column in fact_df]
+    cells = fact_df.assign(TotalCost=fact_df['Cost'] * fact_df['Quantity']).groupby(
+        dimensions, observed=True, dropna=False
+    ).agg(Revenue=('TotalPrice', 'sum'), Quantity=('Quantity', 'sum'), Cost=('TotalCost', 'sum'))
+    return cells.reset_index()
+
+def scenario_grid(discounts, elasticities=(0,), by=None, values=None):
+    """Build the cartesian product of discounts and elasticities as a scenario table.
+    
+    With `by`, every scenario is repeated once per value of that dimension
+    (or per entry of `values`) and scoped to it; otherwise it covers all sales.
+    """
+    scopes = [None] if by is None else list(values)
+    rows = []
+    for scope, discount, elasticity in itertools.product(scopes, discounts, elasticities):
+        row = {'Discount': float(discount), 'Elasticity': float(elasticity)}
+        if by is not None:
+            row[by] = scope
+        rows.append(row)
+    
+    grid = pd.DataFrame(rows)
+    for column in DIMENSIONS:
+        if column not in grid:
+            grid[column] = None
+    grid.insert(0, 'Scenario', [_scenario_name(row) for row in grid.itertuples(index=False)])
+    return grid
+
+def _scenario_name(row):
+    name = f"{row.Discount:.0%} discount"
+    scope = [str(value) for value in (row.Category, row.Region, row.Segment) if value is not None and not pd.isna(value)]
+    if scope:
+        name += f" on {'/'.join(scope)}"
+    if row.Elasticity:
+        name += f", elasticity {row.Elasticity:g}"
+    return name
+
+def _scope_codes(cells, scenarios):
+    """Encode each dimension of the cells and scenario scopes as integers.
+    
+    Unscoped scenarios get -1 (matches every cell); scope values that do not
+    occur in the cells get -2 (matches none).
+    """
+    codes = {}
+    for column in DIMENSIONS:
+        if column not in cells:
+            continue
+        labels = pd.Index(cells[column].astype(object).unique())
+        cell_codes = labels.get_indexer(cells[column].astype(object))
+        scope = scenarios[column]
+        scenario_codes = np.where(scope.isna(), -1, labels.get_indexer(scope.astype(object)))
+        scenario_codes[(scenario_codes == -1) & scope.notna().to_numpy()] = -2
+        codes[column] = (cell_codes, scenario_codes)
+    return codes
+
+def evaluate_scenarios(fact_df, scenarios, cells=None, chunk_elements=CHUNK_ELEMENTS):
+    """Evaluate every scenario and return one tidy result row per scenario.
+    
+    `scenarios` has Discount and Elasticity columns plus optional Category,
+    Region and Segment scope columns (missing or None means all). Pass
+    precomputed `cells` from `aggregate_cells` to reuse them across calls.
+    """
+    if cells is None:
+        cells = aggregate_cells(fact_df)
+    scenarios = scenarios.reset_index(drop=True).copy()
+    for column in DIMENSIONS:
+        if column not in scenarios:
+            scenarios[column] = None
+    
+    revenue = cells['Revenue'].to_numpy(dtype=np.float64)
+    quantity = cells['Quantity'].to_numpy(dtype=np.float64)
+    cost = cells['Cost'].to_numpy(dtype=np.float64)
+    codes = _scope_codes(cells, scenarios)
+    discount = scenarios['Discount'].to_numpy(dtype=np.float64)
+    elasticity = scenarios['Elasticity'].to_numpy(dtype=np.float64)
+    
+    n_scenarios = len(scenarios)
+    changes = np.empty((n_scenarios, 3))
+    chunk = max(1, chunk_elements // max(len(cells), 1))
+    
+    for start in range(0, n_scenarios, chunk):
+        stop = min(start + chunk, n_scenarios)
+        
+        # Scenarios x cells mask of the cells each scenario applies to
+        in_scope = np.ones((stop - start, len(cells)), dtype=bool)
+        for cell_codes, scenario_codes in codes.values():
+            scope = scenario_codes[start:stop, None]
+            in_scope &= (scope == -1) | (scope == cell_codes[None, :])
+        
+        price_factor = np.where(in_scope, 1 - discount[start:stop, None], 1.0)
+        quantity_factor = price_factor ** -elasticity[start:stop, None]
+        
+        # Changes against the baseline, so unaffected cells contribute exactly zero
+        changes[start:stop, 0] = (price_factor * quantity_factor - 1) @ revenue
+        changes[start:stop, 1] = (quantity_factor - 1) @ quantity
+        changes[start:stop, 2] = (quantity_factor - 1) @ cost
+    
+    base_revenue = revenue.sum()
+    scenarios['Revenue'] = base_revenue + changes[:, 0]
+    scenarios['Quantity'] = quantity.sum() + changes[:, 1]
+    scenarios['Profit'] = base_revenue - cost.sum() + changes[:, 0] - changes[:, 2]
+    scenarios['RevenueChange'] = changes[:, 0]
+    scenarios['RevenueChangePct'] = changes[:, 0] / base_revenue
+    scenarios['ProfitChange'] = changes[:, 0] - changes[:, 2]
+    return scenarios
+
+def main():
+    from .context import get_context
+    
+    parser = argparse.ArgumentParser(description='Evaluate a grid of what-if discount scenarios.')
+    parser.add_argument('--data-dir', default=PROCESSED_DIR)
+    parser.add_argument('--discounts', type=float, nargs='+', default=DEFAULT_DISCOUNTS)
+    parser.add_argument('--elasticities', type=float, nargs='+', default=[0])
+    parser.add_argument('--by', choices=DIMENSIONS, help='Scope each scenario to one value of this dimension')
+    parser.add_argument('--output', default='results/what_if_scenarios.csv')
+    args = parser.parse_args()
+    
+    fact_df = get_context(args.data_dir).fact
+    cells = aggregate_cells(fact_df)
+    values = cells[args.by].dropna().unique() if args.by else None
+    scenarios = scenario_grid(args.discounts, args.elasticities, args.by, values)
+    
+    started = time.perf_counter()
+    results = evaluate_scenarios(fact_df, scenarios, cells)
+    seconds = time.perf_counter() - started
+    
+    results.to_csv(args.output, index=False)
+    print(f"Evaluated {len(results):,} scenarios over {len(fact_df):,} orders in {seconds:.2f}s")
+    print(results.nlargest(5, 'Profit')[['Scenario', 'Revenue', 'Profit', 'RevenueChangePct']].to_string(index=False))
+    print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
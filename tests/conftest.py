@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'data'))
+
+from generate_sample_data import generate_sample_data_vectorized
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    """A small generated raw dataset: 2,000 orders over two years."""
+    path = tmp_path / 'raw'
+    generate_sample_data_vectorized(num_customers=200, num_products=20, num_orders=2000, seed=7,
+                                    output_dir=str(path))
+    return str(path)
+
+@pytest.fixture
+def data_dir(tmp_path):
+    return str(tmp_path / 'processed')
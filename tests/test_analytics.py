@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sales_pipeline.analytics import N_SEGMENTS, fit_segmentation, warm_started_fits
+from sales_pipeline.preprocessing import run_preprocessing
+from sales_pipeline.storage import read_table
+
+def test_warm_started_inertia_never_increases_with_k():
+    sample = np.random.default_rng(0).normal(size=(2000, 3))
+    fits = warm_started_fits(sample, max_k=8)
+    assert [k for k, _, _ in fits] == list(range(1, 9))
+    inertias = [inertia for _, inertia, _ in fits]
+    # Each k starts from the previous solution plus a seed, so its inertia can only go down
+    assert all(later <= earlier for earlier, later in zip(inertias, inertias[1:]))
+    assert [len(centers) for _, _, centers in fits] == list(range(1, 9))
+
+def test_fast_segmentation_is_close_to_exact(raw_dir, data_dir):
+    run_preprocessing(raw_dir, data_dir)
+    rfm_data = read_table('customer_rfm', data_dir)[['Recency', 'Frequency', 'Monetary']]
+    _, exact, exact_sse = fit_segmentation(rfm_data, 'exact')
+    _, fast, fast_sse = fit_segmentation(rfm_data, 'fast', sample_size=100)
+    assert fast.n_clusters == N_SEGMENTS
+    assert sorted(fast_sse) == sorted(exact_sse)
+    assert fast.inertia_ <= exact.inertia_ * 1.05
+
+# Three distinct customers cannot fill N_SEGMENTS clusters; sklearn warns about that, as it should
+@pytest.mark.filterwarnings('ignore::sklearn.exceptions.ConvergenceWarning')
+def test_fast_segmentation_handles_few_distinct_customers():
+    sample = np.repeat([[0.0, 1.0, 2.0], [3.0, 4.0, 5.0]], 5, axis=0)
+    fits = warm_started_fits(sample, max_k=4)
+    assert [k for k, _, _ in fits] == [1, 2]
+    assert fits[-1][1] == pytest.approx(0)
+    
+    rfm_data = pd.DataFrame(np.repeat([[10, 1, 50.0], [200, 3, 400.0], [30, 8, 900.0]], 20, axis=0),
+                            columns=['Recency', 'Frequency', 'Monetary'])
+    _, kmeans, sse = fit_segmentation(rfm_data, 'fast', sample_size=30)
+    assert sorted(sse) == list(range(1, 11))
+    assert sse[3] == pytest.approx(0) and sse[10] == pytest.approx(0)
+    assert len(kmeans.labels_) == len(rfm_data)
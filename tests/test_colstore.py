@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sales_pipeline import colstore
+from sales_pipeline.colstore import append_colstore, index_rows, read_colstore, take_colstore, write_colstore
+from sales_pipeline.lookup import customer_orders, product_orders
+from sales_pipeline.preprocessing import run_preprocessing
+from sales_pipeline.storage import read_table
+
+pa = pytest.importorskip('pyarrow')
+pytestmark = pytest.mark.skipif(not colstore.COLSTORE, reason='column store disabled')
+
+def _fact(rows, first_order=1, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'OrderID': [f'ORD{i:06d}' for i in range(first_order, first_order + rows)],
+        'CustomerID': pd.Series([f'CUST{i:05d}' for i in rng.integers(0, 40, rows)]),
+        'OrderDate': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D'),
+        'ProductID': pd.Series([f'PROD{i:05d}' for i in rng.integers(0, 6, rows)]),
+        'Quantity': rng.integers(1, 5, rows),
+        'TotalPrice': rng.uniform(1, 100, rows).round(2),
+        'Segment': pd.array(rng.integers(0, 4, rows), dtype='Int8')
+    })
+
+def _arrow_strings(df):
+    return df.astype({'OrderID': pd.ArrowDtype(pa.large_string())})
+
+def _plain(df):
+    return df.astype({column: object for column in df.columns if column not in ('OrderDate', 'TotalPrice')})
+
+def _assert_same(stored, expected):
+    pd.testing.assert_frame_equal(_plain(stored).reset_index(drop=True), _plain(expected).reset_index(drop=True),
+                                  check_dtype=False)
+
+def test_round_trip_and_append(data_dir):
+    first = _fact(300)
+    # Unseen keys that sort before the stored ones force a recode, and missing values must survive
+    second = _fact(200, first_order=301, seed=1)
+    second.loc[::7, 'CustomerID'] = 'CUST-NEW'
+    second.loc[::11, 'OrderID'] = None
+    second.loc[::13, 'Segment'] = pd.NA
+    write_colstore(first, data_dir)
+    # Arrow-backed strings sliced from a larger frame, as read back from Parquet
+    assert append_colstore(_arrow_strings(pd.concat([first, second], ignore_index=True)).iloc[300:], data_dir)
+    
+    stored = read_colstore(data_dir)
+    _assert_same(stored, pd.concat([first, second], ignore_index=True))
+    assert stored['CustomerID'].cat.categories.is_monotonic_increasing
+    # Every column stays backed by the mapped files
+    assert not stored['TotalPrice'].to_numpy().flags.writeable
+
+def _unsupported(array):
+    raise TypeError('large_string is not supported')
+
+@pytest.mark.parametrize('arrow_strings', [True, False])
+def test_string_columns_with_and_without_arrow_strings(data_dir, monkeypatch, arrow_strings):
+    if not arrow_strings:
+        # As on a pandas that cannot wrap Arrow large strings
+        monkeypatch.setattr(colstore, '_wrap_arrow_strings', _unsupported)
+    fact = _fact(300)
+    fact.loc[::9, 'OrderID'] = None
+    write_colstore(fact, data_dir)
+    
+    stored = read_colstore(data_dir)
+    assert (stored['OrderID'].dtype == object) != arrow_strings
+    _assert_same(stored, fact)
+    positions = np.arange(0, 300, 7)
+    _assert_same(take_colstore(positions, data_dir), fact.iloc[positions])
+
+def test_index_lookups_match_scans(data_dir):
+    fact = pd.concat([_fact(400), _fact(100, first_order=401, seed=2)], ignore_index=True)
+    write_colstore(fact.iloc[:400], data_dir)
+    append_colstore(fact.iloc[400:], data_dir)
+    
+    for customer_id in fact['CustomerID'].unique():
+        _assert_same(customer_orders(customer_id, data_dir), fact[fact['CustomerID'] == customer_id])
+    for product_id in fact['ProductID'].unique():
+        _assert_same(product_orders(product_id, data_dir), fact[fact['ProductID'] == product_id])
+    assert len(index_rows('CustomerID', 'CUST99999', data_dir)) == 0
+    assert take_colstore(np.array([], dtype=np.int64), data_dir).empty
+
+def test_store_matches_the_fact_table(raw_dir, data_dir):
+    run_preprocessing(raw_dir, data_dir)
+    stored = read_colstore(data_dir).sort_values('OrderID', ignore_index=True)
+    fact = read_table('sales_fact', data_dir).sort_values('OrderID', ignore_index=True)
+    assert list(stored.columns) == list(fact.columns)
+    _assert_same(stored, fact)
+    pd.testing.assert_series_equal(stored.groupby('Category', observed=True)['TotalPrice'].sum(),
+                                   fact.groupby('Category', observed=True)['TotalPrice'].sum())
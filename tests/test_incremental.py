@@ -0,0 +1,76 @@
+import os
+
+import pandas as pd
+import pytest
+
+from sales_pipeline.analytics import run_advanced_analytics
+from sales_pipeline.incremental import run_incremental
+from sales_pipeline.preprocessing import read_checkpoint, run_preprocessing
+from sales_pipeline.storage import read_table
+
+def _write_sales(raw_dir, sales_df):
+    sales_df.to_csv(os.path.join(raw_dir, 'sales_data.csv'), index=False)
+
+def _by_key(df):
+    key = 'OrderID' if 'OrderID' in df else 'CustomerID'
+    return df.astype({c: object for c in df.columns if c != 'OrderDate'}).sort_values(key, ignore_index=True)
+
+@pytest.fixture
+def full_sales(raw_dir):
+    return pd.read_csv(os.path.join(raw_dir, 'sales_data.csv'))
+
+def test_incremental_runs_match_a_full_rebuild(raw_dir, data_dir, tmp_path, full_sales):
+    _write_sales(raw_dir, full_sales[full_sales['OrderDate'] < '2024-06-01'])
+    run_preprocessing(raw_dir, data_dir)
+    _write_sales(raw_dir, full_sales)
+    run_incremental(raw_dir, data_dir)
+    checkpoint = read_checkpoint(data_dir)
+    
+    # A second run finds nothing new and leaves the tables as they are
+    run_incremental(raw_dir, data_dir)
+    assert read_checkpoint(data_dir) == checkpoint
+    
+    rebuilt_dir = str(tmp_path / 'rebuilt')
+    run_preprocessing(raw_dir, rebuilt_dir)
+    for name in ('processed_sales', 'sales_fact', 'customer_rfm'):
+        pd.testing.assert_frame_equal(_by_key(read_table(name, data_dir)), _by_key(read_table(name, rebuilt_dir)),
+                                      check_dtype=False)
+    
+    rollup, rebuilt_rollup = read_table('sales_rollup', data_dir), read_table('sales_rollup', rebuilt_dir)
+    assert rollup['Orders'].sum() == rebuilt_rollup['Orders'].sum()
+    assert rollup['Revenue'].sum() == pytest.approx(rebuilt_rollup['Revenue'].sum())
+
+def test_orders_later_on_the_checkpoint_date_are_added_once(raw_dir, data_dir, full_sales):
+    last_date = full_sales['OrderDate'].max()
+    on_last_date = full_sales.index[full_sales['OrderDate'] == last_date]
+    assert len(on_last_date) > 1
+    _write_sales(raw_dir, full_sales.drop(on_last_date[1:]))
+    run_preprocessing(raw_dir, data_dir)
+    
+    _write_sales(raw_dir, full_sales)
+    run_incremental(raw_dir, data_dir)
+    run_incremental(raw_dir, data_dir)
+    
+    sales_df = read_table('processed_sales', data_dir)
+    assert len(sales_df) == len(full_sales)
+    assert sales_df['OrderID'].is_unique
+    checkpoint = read_checkpoint(data_dir)
+    assert checkpoint['last_order_date'] == last_date
+    assert len(checkpoint['order_ids_at_last_date']) == len(on_last_date)
+
+def test_incremental_rescores_changed_customers(raw_dir, data_dir, tmp_path, full_sales):
+    model_dir = str(tmp_path / 'models')
+    _write_sales(raw_dir, full_sales[full_sales['OrderDate'] < '2024-06-01'])
+    run_preprocessing(raw_dir, data_dir)
+    run_advanced_analytics(data_dir, model_dir=model_dir)
+    
+    _write_sales(raw_dir, full_sales)
+    run_incremental(raw_dir, data_dir, model_dir)
+    
+    rfm_df = read_table('customer_rfm', data_dir).set_index('CustomerID')
+    segments_df = read_table('customer_segments', data_dir).set_index('CustomerID')
+    assert segments_df.index.equals(rfm_df.index)
+    features = ['Recency', 'Frequency', 'Monetary']
+    pd.testing.assert_frame_equal(segments_df[features], rfm_df[features], check_dtype=False)
+    assert segments_df['Segment'].notna().all()
+
@@ -0,0 +1,19 @@
+from sales_pipeline.lookup import customer_profile, customer_rfm
+from sales_pipeline.preprocessing import run_preprocessing
+from sales_pipeline.storage import read_table, write_table
+
+def test_rfm_values_come_from_the_current_rfm_table(raw_dir, data_dir):
+    run_preprocessing(raw_dir, data_dir)
+    rfm_df = read_table('customer_rfm', data_dir)
+    customer_id = rfm_df['CustomerID'].iloc[0]
+    assert customer_rfm(customer_id, data_dir)['Monetary'] == rfm_df['Monetary'].iloc[0]
+    assert customer_profile(customer_id, data_dir)['segment'] is None
+    
+    # Segments scored before the latest preprocessing run carry old RFM values
+    stale = rfm_df.assign(Monetary=-1.0, Frequency=0, Segment='Loyal', Churn=0, ChurnProbability=0.25)
+    write_table(stale, 'customer_segments', data_dir)
+    row = customer_rfm(customer_id, data_dir)
+    assert row['Monetary'] == rfm_df['Monetary'].iloc[0]
+    assert row['Frequency'] == rfm_df['Frequency'].iloc[0]
+    assert (row['Segment'], row['Churn'], row['ChurnProbability']) == ('Loyal', 0, 0.25)
+    assert customer_rfm('CUST99999', data_dir) is None
@@ -0,0 +1,51 @@
+import os
+
+import pandas as pd
+
+from generate_sample_data import generate_sample_data_sharded, generate_sample_data_vectorized
+from sales_pipeline.preprocessing import load_data, read_sales_shards, sales_shard_dir
+
+def test_sharded_sales_are_read_in_order(tmp_path):
+    raw_dir = str(tmp_path)
+    generate_sample_data_sharded(num_customers=50, num_products=10, num_orders=900, shard_size=250,
+                                 num_workers=1, seed=3, output_dir=raw_dir)
+    shard_dir = sales_shard_dir(raw_dir)
+    assert shard_dir == os.path.join(raw_dir, 'sales_shards')
+    
+    sales_df = load_data(raw_dir)[0]
+    assert sales_df['OrderID'].tolist() == [f'ORD{i:06d}' for i in range(1, 901)]
+    
+    # Every shard spans the whole date range, so only a later mark skips them
+    assert len(read_sales_shards(shard_dir, min_date='2024-12-01')) == len(sales_df)
+    assert read_sales_shards(shard_dir, min_date='2099-01-01').empty
+
+def test_single_file_generation_replaces_old_shards(tmp_path):
+    raw_dir = str(tmp_path)
+    generate_sample_data_sharded(num_customers=50, num_products=10, num_orders=900, shard_size=250,
+                                 num_workers=1, seed=3, output_dir=raw_dir)
+    generate_sample_data_vectorized(num_customers=50, num_products=10, num_orders=120, seed=3,
+                                    output_dir=raw_dir)
+    assert sales_shard_dir(raw_dir) is None
+    assert len(load_data(raw_dir)[0]) == 120
+
+def test_generating_no_orders_replaces_old_sales(tmp_path):
+    raw_dir = str(tmp_path)
+    generate_sample_data_vectorized(num_customers=50, num_products=10, num_orders=120, seed=3,
+                                    output_dir=raw_dir)
+    generate_sample_data_vectorized(num_customers=50, num_products=10, num_orders=0, seed=3,
+                                    output_dir=raw_dir)
+    sales_df = load_data(raw_dir)[0]
+    assert sales_df.empty
+    assert 'OrderID' in sales_df.columns
+
+def test_csv_newer_than_manifest_wins(tmp_path):
+    raw_dir = str(tmp_path)
+    generate_sample_data_sharded(num_customers=50, num_products=10, num_orders=900, shard_size=250,
+                                 num_workers=1, seed=3, output_dir=raw_dir)
+    pd.read_csv(os.path.join(raw_dir, 'sales_shards', 'part-00000.csv')).to_csv(
+        os.path.join(raw_dir, 'sales_data.csv'), index=False
+    )
+    manifest_path = os.path.join(raw_dir, 'sales_shards', 'manifest.json')
+    os.utime(manifest_path, (0, 0))
+    assert sales_shard_dir(raw_dir) is None
+    assert len(load_data(raw_dir)[0]) == 250
@@ -0,0 +1,35 @@
+import pandas as pd
+
+from sales_pipeline.rollup import build_rollup, merge_rollup, rollup_series
+
+def _fact():
+    return pd.DataFrame({
+        'OrderID': ['ORD1', 'ORD1', 'ORD2', 'ORD3', 'ORD3', None],
+        'OrderDate': pd.to_datetime(['2024-01-30', '2024-01-30', '2024-01-31', '2024-02-01', '2024-02-01',
+                                     '2024-02-02']),
+        'Region': ['North', 'North', 'South', 'North', 'North', 'South'],
+        'Category': ['Books', 'Toys', 'Books', 'Toys', 'Toys', 'Books'],
+        'Quantity': [1, 2, 3, 4, 5, 6],
+        'TotalPrice': [10.0, 20.0, 30.0, 40.0, 50.0, 60.0]
+    })
+
+def test_orders_add_up_to_distinct_orders():
+    fact_df = _fact()
+    rollup_df = build_rollup(fact_df)
+    for grain in ('day', 'week', 'month'):
+        cube = rollup_df[rollup_df['Grain'] == grain]
+        assert cube['Orders'].sum() == fact_df['OrderID'].nunique()
+        assert cube['Lines'].sum() == len(fact_df)
+    
+    # ORD1 has a Books and a Toys line; it is counted once, under its first line
+    by_category = rollup_df[rollup_df['Grain'] == 'month'].groupby('Category')['Orders'].sum()
+    assert by_category.to_dict() == {'Books': 2, 'Toys': 1}
+    assert rollup_series(rollup_df, 'month', 'Orders').tolist() == [2, 1]
+
+def test_merge_matches_a_full_build():
+    fact_df = _fact()
+    merged = merge_rollup(build_rollup(fact_df.iloc[:3]), fact_df.iloc[3:])
+    expected = build_rollup(fact_df)
+    key = ['Grain', 'Period', 'Region', 'Category']
+    pd.testing.assert_frame_equal(merged.sort_values(key, ignore_index=True),
+                                  expected.sort_values(key, ignore_index=True), check_dtype=False)
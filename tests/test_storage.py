@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+import pytest
+
+from sales_pipeline import storage
+from sales_pipeline.storage import append_table, read_partitions, read_table, recent_range, write_table
+
+def _sales(start, periods, first_order=1):
+    dates = pd.date_range(start, periods=periods, freq='D')
+    return pd.DataFrame({
+        'OrderID': [f'ORD{i:06d}' for i in range(first_order, first_order + periods)],
+        'CustomerID': [f'CUST{i % 7:05d}' for i in range(periods)],
+        'OrderDate': dates,
+        'ProductID': [f'PROD{i % 3:05d}' for i in range(periods)],
+        'Quantity': 1,
+        'UnitPrice': 10.0,
+        'Region': 'North',
+        'TotalPrice': 10.0
+    })
+
+def _sorted(df):
+    return df.astype({c: object for c in df.columns if c != 'OrderDate'}).sort_values('OrderID', ignore_index=True)
+
+@pytest.mark.parametrize('partitioned', [False, True])
+def test_append_keeps_existing_and_new_rows(data_dir, monkeypatch, partitioned):
+    monkeypatch.setattr(storage, 'PARTITION_SALES', partitioned)
+    first, second = _sales('2024-01-01', 40), _sales('2024-02-05', 30, first_order=41)
+    write_table(first, 'processed_sales', data_dir, fmt='parquet')
+    append_table(second, 'processed_sales', data_dir, fmt='parquet')
+    append_table(_sales('2024-03-20', 5, first_order=71), 'processed_sales', data_dir, fmt='parquet')
+    
+    stored = read_table('processed_sales', data_dir, fmt='parquet')
+    assert len(stored) == 75
+    expected = pd.concat([first, second, _sales('2024-03-20', 5, first_order=71)], ignore_index=True)
+    pd.testing.assert_frame_equal(_sorted(stored), _sorted(expected), check_dtype=False)
+    assert (read_partitions('processed_sales', data_dir) is not None) == partitioned
+
+def test_append_to_single_file_table(data_dir):
+    # Not month-partitioned: the file becomes the first part and the rows a second one
+    rfm = pd.DataFrame({'CustomerID': ['A', 'B'], 'Recency': [1, 2], 'Frequency': [1, 1], 'Monetary': [5.0, 6.0]})
+    write_table(rfm, 'customer_rfm', data_dir, fmt='parquet')
+    append_table(rfm.assign(CustomerID=['C', 'D']), 'customer_rfm', data_dir, fmt='parquet')
+    
+    path = storage.table_path('customer_rfm', data_dir, 'parquet')
+    assert sorted(os.listdir(path)) == ['part-00000.parquet', 'part-00001.parquet']
+    assert read_table('customer_rfm', data_dir)['CustomerID'].tolist() == ['A', 'B', 'C', 'D']
+
+def test_csv_append_and_filters(data_dir):
+    sales = _sales('2024-01-01', 60)
+    write_table(sales.iloc[:30], 'processed_sales', data_dir, fmt='csv')
+    append_table(sales.iloc[30:], 'processed_sales', data_dir, fmt='csv')
+    
+    stored = read_table('processed_sales', data_dir, fmt='csv', columns=['OrderID'],
+                        date_range=('2024-01-10', '2024-01-19'), filters=[('Region', '==', 'North')])
+    assert stored['OrderID'].tolist() == sales['OrderID'].iloc[9:19].tolist()
+
+def test_date_range_prunes_partitions(data_dir, monkeypatch):
+    monkeypatch.setattr(storage, 'PARTITION_SALES', True)
+    sales = _sales('2023-01-01', 730)
+    write_table(sales, 'processed_sales', data_dir, fmt='parquet')
+    partitions = read_partitions('processed_sales', data_dir)
+    assert len(partitions) == 24
+    assert sum(p['rows'] for p in partitions) == 730
+    
+    date_range = recent_range(90, 'processed_sales', data_dir)
+    assert [p['month'] for p in storage._prune(partitions, date_range)] == ['2024-10', '2024-11', '2024-12']
+    recent = read_table('processed_sales', data_dir, date_range=date_range)
+    assert len(recent) == 90
+    assert recent['OrderDate'].min() == pd.Timestamp('2024-10-02')
+    assert read_table('processed_sales', data_dir, date_range=('2030-01-01', None)).empty
@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+
+from sales_pipeline.preprocessing import run_preprocessing
+from sales_pipeline.rollup import build_rollup
+from sales_pipeline.storage import read_table
+from sales_pipeline.streaming import GROUPINGS, SalesAggregates, aggregate_sales
+from sales_pipeline.whatif import aggregate_cells
+
+@pytest.fixture
+def fact(raw_dir, data_dir):
+    run_preprocessing(raw_dir, data_dir)
+    fact_df = read_table('sales_fact', data_dir)
+    return fact_df.assign(OrderDate=pd.to_datetime(fact_df['OrderDate']))
+
+def _plain(df):
+    # Compare values, not categorical or string-backed dtypes
+    return df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+
+def test_chunked_aggregates_match_pandas(fact, data_dir):
+    aggregates = aggregate_sales(data_dir, chunk_rows=300)
+    summary = aggregates.summary()
+    assert summary['total_sales'] == pytest.approx(fact['TotalPrice'].sum())
+    assert summary['total_quantity'] == fact['Quantity'].sum()
+    assert summary['total_orders'] == fact['OrderID'].nunique()
+    assert summary['avg_order_value'] == pytest.approx(fact['TotalPrice'].mean())
+    assert (summary['first_date'], summary['last_date']) == (fact['OrderDate'].min(), fact['OrderDate'].max())
+    
+    for name, keys in GROUPINGS.items():
+        expected = fact.groupby(keys, observed=True).agg(
+            Revenue=('TotalPrice', 'sum'), Quantity=('Quantity', 'sum'), Lines=('TotalPrice', 'size')
+        ).reset_index()
+        actual = aggregates.totals(name)[keys + ['Revenue', 'Quantity', 'Lines']]
+        pd.testing.assert_frame_equal(_plain(actual), _plain(expected), check_dtype=False, check_exact=False)
+    
+    ltv = aggregates.customer_ltv().set_index('CustomerID')
+    first = fact.groupby('CustomerID', observed=True)['OrderDate'].min()
+    assert (ltv['FirstPurchase'] == first.reindex(ltv.index.astype(str))).all()
+    
+    expected_cells = aggregate_cells(fact)
+    actual_cells = aggregates.what_if_cells()
+    pd.testing.assert_frame_equal(_plain(actual_cells), _plain(expected_cells), check_dtype=False, check_exact=False)
+
+def test_merge_is_independent_of_the_split(fact, data_dir):
+    whole = aggregate_sales(data_dir)
+    halves = SalesAggregates.from_chunk(fact.iloc[1000:]).merge(SalesAggregates.from_chunk(fact.iloc[:1000]))
+    expected = whole.summary()
+    for key, value in halves.summary().items():
+        assert value == (pytest.approx(expected[key]) if key in ('total_sales', 'avg_order_value') else expected[key])
+    for name in whole.groups:
+        pd.testing.assert_frame_equal(halves.groups[name], whole.groups[name], check_exact=False)
+
+def test_totals_of_narrow_quantities_do_not_overflow():
+    rows = 20_000
+    chunk = pd.DataFrame({
+        'OrderID': [f'ORD{i:06d}' for i in range(rows)],
+        'CustomerID': pd.Categorical(['CUST00001'] * rows),
+        'OrderDate': '2024-01-01',
+        'ProductID': pd.Categorical(['PROD00001'] * rows),
+        'ProductName': pd.Categorical(['Novel'] * rows),
+        'Category': pd.Categorical(['Books'] * rows),
+        'Region': pd.Categorical(['North'] * rows),
+        'Quantity': pd.Series(1, index=range(rows), dtype='int16'),
+        'TotalPrice': 1.0,
+        'Cost': 0.5
+    })
+    aggregates = SalesAggregates()
+    for _ in range(3):
+        aggregates.update(chunk)
+    assert aggregates.totals('category')['Quantity'].tolist() == [3 * rows]
+    assert aggregates.what_if_cells()['Quantity'].tolist() == [3 * rows]
+
+def test_multi_line_orders_are_counted_once(fact):
+    # Pair up adjacent rows into two-line orders, with a few lines missing their OrderID
+    fact = fact.assign(OrderID=fact['OrderID'].iloc[::2].repeat(2).iloc[:len(fact)].to_numpy())
+    fact.loc[fact.index[::97], 'OrderID'] = None
+    aggregates = SalesAggregates()
+    # An odd chunk size splits some orders between consecutive chunks
+    for start in range(0, len(fact), 333):
+        aggregates.update(fact.iloc[start:start + 333])
+    assert aggregates.summary()['total_orders'] == fact['OrderID'].nunique()
+    assert aggregates.summary()['total_orders'] == build_rollup(fact).query("Grain == 'month'")['Orders'].sum()
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sales_pipeline.whatif import evaluate_scenarios, scenario_grid
+
+def _fact(rows=300, seed=1):
+    rng = np.random.default_rng(seed)
+    quantity = rng.integers(1, 5, rows)
+    price = rng.uniform(5, 50, rows).round(2)
+    # Customers without a segment yet have a missing Segment
+    segment = pd.Series(rng.choice([0, 1, 2, -1], rows), dtype='Int8')
+    return pd.DataFrame({
+        'Category': pd.Categorical(rng.choice(['Books', 'Toys', 'Sports'], rows)),
+        'Region': pd.Categorical(rng.choice(['North', 'South'], rows)),
+        'Segment': segment.mask(segment < 0),
+        'Quantity': quantity,
+        'TotalPrice': quantity * price,
+        'Cost': (price * rng.uniform(0.4, 0.8, rows)).round(2)
+    })
+
+def _matches(value, scope):
+    return pd.isna(scope) or (not pd.isna(value) and value == scope)
+
+def _naive(fact_df, scenario):
+    """Apply one scenario row by row."""
+    revenue = quantity = cost = 0.0
+    for row in fact_df.itertuples(index=False):
+        in_scope = all(
+            _matches(getattr(row, column), getattr(scenario, column)) for column in ('Category', 'Region', 'Segment')
+        )
+        price_factor = 1 - scenario.Discount if in_scope else 1.0
+        quantity_factor = price_factor ** -scenario.Elasticity
+        revenue += row.TotalPrice * price_factor * quantity_factor
+        quantity += row.Quantity * quantity_factor
+        cost += row.Cost * row.Quantity * quantity_factor
+    return revenue, quantity, revenue - cost
+
+def test_broadcast_matches_a_row_by_row_loop():
+    fact_df = _fact()
+    scenarios = pd.concat([
+        scenario_grid([0, 0.1, 0.25], [0, 1.5]),
+        scenario_grid([0.2], [2], by='Category', values=['Books', 'Toys', 'Garden']),
+        scenario_grid([0.15], [1], by='Segment', values=[0, 2]),
+        pd.DataFrame({'Discount': [0.3], 'Elasticity': [0.5], 'Category': ['Sports'], 'Region': ['South'],
+                      'Segment': [1]})
+    ], ignore_index=True)
+    
+    # A small chunk bound makes the scenarios span several chunks
+    results = evaluate_scenarios(fact_df, scenarios, chunk_elements=50)
+    for scenario, result in zip(scenarios.itertuples(index=False), results.itertuples(index=False)):
+        revenue, quantity, profit = _naive(fact_df, scenario)
+        assert result.Revenue == pytest.approx(revenue)
+        assert result.Quantity == pytest.approx(quantity)
+        assert result.Profit == pytest.approx(profit)
+    
+    # A scope value that never occurs leaves the totals at the baseline
+    garden = results[results['Category'] == 'Garden'].iloc[0]
+    assert garden['RevenueChange'] == 0
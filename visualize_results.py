@@ -2,25 +2,24 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+import argparse
 import os
 from datetime import datetime
+from sales_pipeline.context import get_context
+from sales_pipeline.instrument import instrumented
+from sales_pipeline.render import print_render_report, render_charts
+from sales_pipeline.rollup import rollup_series, rollup_totals
 
 # Create results directory
 os.makedirs('results', exist_ok=True)
 
-def create_sales_trend_plot():
+def create_sales_trend_plot(ctx=None):
     """Create sales trend plot over time"""
-    # Load sales data
-    sales_df = pd.read_csv('data/processed/processed_sales.csv')
-    
-    # Convert OrderDate to datetime
-    sales_df['OrderDate'] = pd.to_datetime(sales_df['OrderDate'])
-    
-    # Group by month and calculate total sales
-    monthly_sales = sales_df.groupby(sales_df['OrderDate'].dt.to_period('M'))['TotalPrice'].sum()
+    # Monthly sales from the precomputed rollup cube
+    monthly_sales = rollup_series((ctx or get_context()).rollup, 'month')
     
     plt.figure(figsize=(12, 6))
-    plt.plot(monthly_sales.index.to_timestamp(), monthly_sales.values)
+    plt.plot(monthly_sales.index, monthly_sales.values)
     plt.title('Monthly Sales Trend')
     plt.xlabel('Date')
     plt.ylabel('Total Sales')
@@ -29,18 +28,16 @@ def create_sales_trend_plot():
     plt.savefig('results/sales_trend.png')
     plt.close()
 
-def create_category_sales_plot():
+def create_category_sales_plot(ctx=None):
     """Create bar chart of sales by category"""
-    # Load sales and products data
-    sales_df = pd.read_csv('data/processed/processed_sales.csv')
-    products_df = pd.read_csv('data/processed/processed_products.csv')
+    # Load merged sales and products data
+    category_sales = (ctx or get_context()).fact
     
-    # Merge and calculate sales by category
-    category_sales = pd.merge(sales_df, products_df, on='ProductID')
-    category_sales = category_sales.groupby('Category')['TotalPrice'].sum().sort_values(ascending=False)
+    # Calculate sales by category
+    category_sales = category_sales.groupby('Category', observed=True)['TotalPrice'].sum().sort_values(ascending=False)
     
     plt.figure(figsize=(12, 6))
-    sns.barplot(x=category_sales.values, y=category_sales.index)
+    sns.barplot(x=category_sales.values, y=category_sales.index, order=category_sales.index)
     plt.title('Sales by Product Category')
     plt.xlabel('Total Sales')
     plt.ylabel('Category')
@@ -48,10 +45,10 @@ def create_category_sales_plot():
     plt.savefig('results/category_sales.png')
     plt.close()
 
-def create_customer_segmentation_plot():
+def create_customer_segmentation_plot(ctx=None):
     """Create customer segmentation visualization"""
     # Load customer segments
-    segments_df = pd.read_csv('data/processed/customer_segments.csv')
+    segments_df = (ctx or get_context()).segments
     
     # Calculate segment distribution
     segment_dist = segments_df['Segment'].value_counts()
@@ -63,10 +60,10 @@ def create_customer_segmentation_plot():
     plt.savefig('results/customer_segments.png')
     plt.close()
 
-def create_rfm_analysis():
+def create_rfm_analysis(ctx=None):
     """Create RFM analysis scatter plot"""
     # Load customer segments
-    segments_df = pd.read_csv('data/processed/customer_segments.csv')
+    segments_df = (ctx or get_context()).segments
     
     plt.figure(figsize=(12, 8))
     sns.scatterplot(data=segments_df, x='Recency', y='Monetary', hue='Segment', size='Frequency', 
@@ -78,16 +75,16 @@ def create_rfm_analysis():
     plt.savefig('results/rfm_analysis.png')
     plt.close()
 
-def create_region_analysis():
+def create_region_analysis(ctx=None):
     """Create sales by region analysis"""
     # Load sales data
-    sales_df = pd.read_csv('data/processed/processed_sales.csv')
+    sales_df = (ctx or get_context()).sales
     
     # Calculate sales by region
-    region_sales = sales_df.groupby('Region')['TotalPrice'].sum().sort_values(ascending=False)
+    region_sales = sales_df.groupby('Region', observed=True)['TotalPrice'].sum().sort_values(ascending=False)
     
     plt.figure(figsize=(12, 6))
-    sns.barplot(x=region_sales.index, y=region_sales.values)
+    sns.barplot(x=region_sales.index, y=region_sales.values, order=region_sales.index)
     plt.title('Sales by Region')
     plt.xlabel('Region')
     plt.ylabel('Total Sales')
@@ -95,10 +92,10 @@ def create_region_analysis():
     plt.savefig('results/region_sales.png')
     plt.close()
 
-def create_churn_analysis():
+def create_churn_analysis(ctx=None):
     """Create churn analysis visualization"""
     # Load customer segments
-    segments_df = pd.read_csv('data/processed/customer_segments.csv')
+    segments_df = (ctx or get_context()).segments
     
     # Calculate churn rates by segment
     churn_rates = segments_df.groupby('Segment')['Churn'].mean() * 100
@@ -112,16 +109,18 @@ def create_churn_analysis():
     plt.savefig('results/churn_analysis.png')
     plt.close()
 
-def create_results_summary():
+def create_results_summary(ctx=None):
     """Create a summary text file with key findings"""
     # Load data
-    sales_df = pd.read_csv('data/processed/processed_sales.csv')
-    segments_df = pd.read_csv('data/processed/customer_segments.csv')
-    
-    # Calculate key metrics
-    total_sales = sales_df['TotalPrice'].sum()
-    total_orders = sales_df['OrderID'].nunique()
-    avg_order_value = sales_df['TotalPrice'].mean()
+    ctx = ctx or get_context()
+    rollup = ctx.rollup
+    segments_df = ctx.segments
+    
+    # Calculate key metrics from the rollup cube (month cells add up to the totals)
+    monthly = rollup[rollup['Grain'] == 'month']
+    total_sales = monthly['Revenue'].sum()
+    total_orders = monthly['Orders'].sum()
+    avg_order_value = total_sales / monthly['Lines'].sum()
     total_customers = segments_df['CustomerID'].nunique()
     churn_rate = segments_df['Churn'].mean()
     
@@ -143,22 +142,29 @@ def create_results_summary():
             f.write(f"- Segment {segment}: {count} customers\n")
         
         f.write("\nTop Performing Categories:\n")
-        category_sales = pd.merge(sales_df, pd.read_csv('data/processed/processed_products.csv'), on='ProductID')
-        top_categories = category_sales.groupby('Category')['TotalPrice'].sum().nlargest(5)
+        top_categories = rollup_totals(rollup, 'Category').nlargest(5)
         for category, sales in top_categories.items():
             f.write(f"- {category}: ${sales:,.2f}\n")
 
-def main():
+CHARTS = [
+    create_sales_trend_plot,
+    create_category_sales_plot,
+    create_customer_segmentation_plot,
+    create_rfm_analysis,
+    create_region_analysis,
+    create_churn_analysis,
+    create_results_summary
+]
+
+@instrumented('charts')
+def main(workers=1):
     print("Generating visualizations...")
     
-    # Create all visualizations
-    create_sales_trend_plot()
-    create_category_sales_plot()
-    create_customer_segmentation_plot()
-    create_rfm_analysis()
-    create_region_analysis()
-    create_churn_analysis()
-    create_results_summary()
+    # Create all visualizations, sharing one context when rendering serially
+    results = render_charts(CHARTS, workers=workers, ctx=get_context() if workers == 1 else None)
+    print_render_report(results)
+    if any(result['error'] for result in results):
+        raise SystemExit(1)
     
     print("\nVisualizations and results have been saved to the 'results' folder:")
     print("- sales_trend.png: Monthly sales trend")
@@ -170,4 +176,8 @@ def main():
     print("- analysis_summary.txt: Text summary of key findings")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Generate the result charts and summary.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Render charts on this many processes (0 for one per CPU)')
+    args = parser.parse_args()
+    main(workers=args.workers or None)